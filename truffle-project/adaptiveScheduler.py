@@ -0,0 +1,148 @@
+"""自适应重复次数调度：按 (test_id, mode) 单元在线维护指标均值/方差（Welford），只给置信区间仍过宽的单元追加重复"""
+import math
+from statistics import NormalDist
+
+# 跟踪的指标及其置信区间目标全宽（与指标同单位）
+DEFAULT_TARGETS = {"match_success": 0.2, "PDR": 0.02, "SDF": 0.1, "ECE": 0.1}
+
+
+def t_critical(confidence, dof):
+    """双侧Student t临界值（Cornish-Fisher展开近似，dof≥3时误差<1%，不依赖scipy）"""
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    if dof <= 0:
+        return math.inf
+    if dof == 1:
+        return math.tan(math.pi * confidence / 2)
+    if dof == 2:
+        return confidence * math.sqrt(2 / (1 - confidence ** 2))
+    return (z + (z ** 3 + z) / (4 * dof) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3))
+
+
+def ci_half_width(std, count, confidence=0.95):
+    """均值置信区间半宽：t × s / √n（样本不足2个时为NaN）"""
+    if count is None or count < 2 or std is None or math.isnan(std):
+        return math.nan
+    return t_critical(confidence, count - 1) * std / math.sqrt(count)
+
+
+class Welford:
+    """在线均值/方差（Welford算法），逐个样本更新，数值稳定"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def half_width(self, confidence=0.95):
+        return ci_half_width(self.std, self.count, confidence)
+
+
+class AdaptiveScheduler:
+    """
+    先为每个单元运行 min_repeats 次，之后每轮把 step 次重复分配给置信区间全宽超出目标最多的单元，
+    直到全部单元收敛、单元达到 max_repeats 或总重复次数用完 budget
+    """
+
+    def __init__(self, test_scenarios, modes, min_repeats=5, max_repeats=60, budget=None, step=2,
+                 targets=None, confidence=0.95):
+        self.test_scenarios = test_scenarios
+        self.modes = list(modes)
+        self.min_repeats = min_repeats
+        self.max_repeats = max_repeats
+        self.step = step
+        self.targets = targets or DEFAULT_TARGETS
+        self.confidence = confidence
+        cells = [(test_id, mode) for test_id in test_scenarios for mode in self.modes]
+        # 默认预算：平均每个单元 (最少+上限)/2 次
+        self.budget = budget if budget is not None else len(cells) * (min_repeats + max_repeats) // 2
+        self.stats = {cell: {metric: Welford() for metric in self.targets} for cell in cells}
+        self.repeats = {cell: 0 for cell in cells}
+        self.used = 0
+
+    def observe(self, result):
+        """记录一条 run_matching 结果（包括续跑时读回的历史结果）；出错的结果只计入重复次数"""
+        cell = (result.get("test_id"), result.get("mode"))
+        if cell not in self.stats:
+            return
+        self.repeats[cell] = max(self.repeats[cell], int(result.get("repeat_idx", 0)) + 1)
+        error = result.get("error")
+        if isinstance(error, str) and error:
+            return
+        for metric, welford in self.stats[cell].items():
+            value = result.get(metric)
+            if value is not None and not (isinstance(value, float) and math.isnan(value)):
+                welford.update(float(value))
+
+    def excess(self, cell):
+        """单元各指标的置信区间全宽与目标之比的最大值（≤1 即收敛；样本不足时为inf）"""
+        ratios = []
+        for metric, target in self.targets.items():
+            width = 2 * self.stats[cell][metric].half_width(self.confidence)
+            # 指标在该单元从未出现（如全部匹配失败时的PDR）不参与收敛判断
+            if self.stats[cell][metric].count == 0 and self.repeats[cell] >= self.min_repeats:
+                continue
+            ratios.append(math.inf if math.isnan(width) else width / target)
+        return max(ratios, default=0.0)
+
+    def next_cells(self):
+        """下一轮需要执行的实验单元 [(test_id, repeat_idx, mode, scenario)]，为空表示调度结束"""
+        remaining = self.budget - self.used
+        if remaining <= 0:
+            return []
+        # 先补足最小重复次数
+        allocation = {cell: self.min_repeats - n for cell, n in self.repeats.items() if n < self.min_repeats}
+        if not allocation:
+            candidates = sorted(
+                (cell for cell, n in self.repeats.items() if n < self.max_repeats and self.excess(cell) > 1),
+                key=self.excess, reverse=True,
+            )
+            allocation = {cell: min(self.step, self.max_repeats - self.repeats[cell]) for cell in candidates}
+        batch = []
+        for (test_id, mode), count in allocation.items():
+            start = self.repeats[(test_id, mode)]
+            for repeat_idx in range(start, start + count):
+                if len(batch) >= remaining:
+                    break
+                batch.append((test_id, repeat_idx, mode, self.test_scenarios[test_id]))
+        self.used += len(batch)
+        return batch
+
+    def run(self, execute):
+        """
+        循环调度直到结束。execute(cells) 执行一轮实验单元并返回结果列表
+        （顺序执行或 parallelRunner.run_parallel 均可）
+        """
+        while True:
+            cells = self.next_cells()
+            if not cells:
+                break
+            for result in execute(cells):
+                self.observe(result)
+            print(f"自适应调度: 已执行{self.used}/{self.budget}次，未收敛单元"
+                  f"{sum(1 for cell in self.stats if self.excess(cell) > 1)}/{len(self.stats)}")
+        return self.summary()
+
+    def summary(self):
+        """每个单元各指标的样本数、均值与置信区间"""
+        import pandas as pd
+        rows = []
+        for (test_id, mode), metrics in self.stats.items():
+            row = {"test_id": test_id, "mode": mode, "repeats": self.repeats[(test_id, mode)],
+                   "converged": self.excess((test_id, mode)) <= 1}
+            for metric, welford in metrics.items():
+                half = welford.half_width(self.confidence)
+                row.update({f"{metric}_n": welford.count, f"{metric}_mean": welford.mean if welford.count else math.nan,
+                            f"{metric}_ci_low": welford.mean - half, f"{metric}_ci_high": welford.mean + half})
+            rows.append(row)
+        return pd.DataFrame(rows)
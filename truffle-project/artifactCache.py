@@ -0,0 +1,63 @@
+"""编译产物精简缓存：按truffle产物文件的sha256缓存只含 abi/bytecode 的小JSON，启动时不再解析AST、sourcemap等完整产物"""
+import hashlib
+import json
+import os
+import re
+
+# 运行时用到的产物字段
+FIELDS = ("contractName", "abi", "bytecode")
+# 进程内已加载的产物（fork出的worker直接继承）
+_loaded = {}
+# 源码中的注释与 public/external 函数声明
+_COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+_FUNCTION = re.compile(r"\bfunction\s+(\w+)\s*\([^)]*\)([^{;]*)[{;]")
+
+
+def source_path(path, artifact):
+    """产物对应的合约源码：build/contracts/<名称>.json → contracts/<名称>.sol"""
+    project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(path))))
+    return os.path.join(project_dir, "contracts", f"{artifact.get('contractName', '')}.sol")
+
+
+def stale_functions(path, artifact):
+    """源码中声明为 public/external、但产物ABI中没有的函数名（产物早于源码修改，需重新 truffle compile）"""
+    try:
+        with open(source_path(path, artifact), "r", encoding="utf-8") as file:
+            source = _COMMENT.sub("", file.read())
+    except FileNotFoundError:
+        return []
+    declared = {name for name, modifiers in _FUNCTION.findall(source)
+                if re.search(r"\b(public|external)\b", modifiers)}
+    compiled = {entry["name"] for entry in artifact.get("abi", []) if entry.get("type") == "function"}
+    return sorted(declared - compiled)
+
+
+def load_artifact(path, cache_dir=os.path.join("output", "cache", "artifacts")):
+    """
+    返回产物的 {contractName, abi, bytecode}。产物内容变化（重新 truffle compile）时哈希随之变化，
+    旧缓存自动失效；写入先落临时文件再原子替换，可被多个worker共享。
+    产物早于合约源码时（ABI缺少源码中的函数）每个进程提示一次
+    """
+    with open(path, "rb") as file:
+        raw = file.read()
+    key = hashlib.sha256(raw).hexdigest()
+    if key in _loaded:
+        return _loaded[key]
+    cached = os.path.join(cache_dir, f"{key}.json")
+    try:
+        with open(cached, "r", encoding="utf-8") as file:
+            artifact = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        full = json.loads(raw)
+        artifact = {name: full[name] for name in FIELDS if name in full}
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cached}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(artifact, file, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, cached)
+    missing = stale_functions(path, artifact)
+    if missing:
+        print(f"警告: {path} 早于 {source_path(path, artifact)}，ABI缺少 {', '.join(missing)}；"
+              f"依赖这些函数的功能不可用，请先执行 truffle compile")
+    _loaded[key] = artifact
+    return artifact
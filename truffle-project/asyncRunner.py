@@ -0,0 +1,270 @@
+"""异步实验运行器：AsyncWeb3 + 共享keep-alive连接池，多个测试的交易同时在途，收据在有界信号量下并发等待"""
+import asyncio
+import time
+
+import aiohttp
+from web3 import AsyncWeb3, AsyncHTTPProvider, Web3
+
+from artifactCache import load_artifact
+from logDecoder import EventDecoder
+from phaseTimer import PhaseTimer
+from resultStore import ResultStore
+from web3DataPrice import ContractRunner, backend_identity, cell_seed, failed_result, matching_result, sample_cell
+
+
+async def connect_async_backend(backend, ganache_url=None, pool_size=32):
+    """
+    创建异步链连接：ganache 通过 AsyncHTTPProvider 连接，并预先缓存一个keep-alive连接池会话
+    （web3默认的会话每个请求后关闭连接）；eth-tester 使用进程内的 AsyncEthereumTesterProvider
+    """
+    if backend == "ganache":
+        provider = AsyncHTTPProvider(ganache_url)
+        session = aiohttp.ClientSession(
+            raise_for_status=True,
+            connector=aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=60),
+        )
+        await provider.cache_async_session(session)
+        return AsyncWeb3(provider)
+    if backend == "eth-tester":
+        from web3.providers.eth_tester import AsyncEthereumTesterProvider
+        return AsyncWeb3(AsyncEthereumTesterProvider())
+    raise ValueError(f"未知的链后端: {backend}")
+
+
+async def deploy_contract_async(w3, contract_data, account):
+    """使用编译产物中的字节码部署一个新的合约实例，返回合约地址"""
+    factory = w3.eth.contract(abi=contract_data['abi'], bytecode=contract_data['bytecode'])
+    tx_hash = await factory.constructor().transact({'from': account})
+    receipt = await w3.eth.wait_for_transaction_receipt(tx_hash)
+    return receipt['contractAddress']
+
+
+class Slot:
+    """一个并发槽位：独立部署的合约 + 独立账户及其本地nonce，同一时刻只运行一个测试"""
+
+    def __init__(self, contract, account, nonce):
+        self.contract = contract
+        self.account = account
+        self.nonce = nonce
+        self.events = EventDecoder(contract)
+
+
+class AsyncContractRunner:
+    """
+    槽位之间并发、槽位内的测试串行。一次测试的重置/建仓/撮合交易以本地nonce连续发出，
+    同一账户的交易按nonce顺序上链，因此只需轮询最后一笔（performMatching）的收据，其余收据随后并发读取。
+    evm_revert 会回滚整条链（包括其他槽位的交易），并发时固定使用重置交易隔离
+    """
+
+    def __init__(self, w3, slots, chain_id, code_hash, event_verbosity="FULL", writer=None, cache=None, timer=None,
+                 max_inflight=32, poll_latency=0.05, receipt_timeout=120, backend_id=None):
+        self.w3 = w3
+        self.chain_id = chain_id
+        self.code_hash = code_hash
+        self.backend_id = backend_id
+        self.event_verbosity = event_verbosity
+        self.writer = writer
+        self.cache = cache
+        self.timer = timer or PhaseTimer()
+        self.results = ResultStore()
+        self.poll_latency = poll_latency
+        self.receipt_timeout = receipt_timeout
+        # 空闲槽位队列；在途的收据请求数不超过连接池大小
+        self._slots = asyncio.Queue()
+        for slot in slots:
+            self._slots.put_nowait(slot)
+        self._inflight = asyncio.Semaphore(max_inflight)
+
+    @classmethod
+    async def create(cls, abi_path, ganache_url, slots=8, first_account=3, backend="ganache", max_inflight=32,
+                     event_verbosity="FULL", **kwargs):
+        """连接链后端，槽位 k 使用 accounts[first_account + k] 并发部署各自的合约"""
+        w3 = await connect_async_backend(backend, ganache_url, pool_size=max_inflight)
+        if not await w3.is_connected():
+            raise ConnectionError("无法连接到Ganache节点")
+        contract_data = load_artifact(abi_path)
+        accounts = (await w3.eth.accounts)[first_account:]
+        if slots > len(accounts):
+            raise ValueError(f"可用解锁账户不足: 需要{slots}个，仅有{len(accounts)}个")
+        accounts = accounts[:slots]
+        addresses = await asyncio.gather(*(deploy_contract_async(w3, contract_data, a) for a in accounts))
+        nonces = await asyncio.gather(*(w3.eth.get_transaction_count(a, 'pending') for a in accounts))
+        chain_id = await w3.eth.chain_id
+        code_hash = Web3.to_hex(Web3.keccak(await w3.eth.get_code(addresses[0])))
+        backend_id = backend_identity(backend, await w3.client_version, await w3.eth.get_block("latest"))
+        runner = cls(
+            w3,
+            [Slot(w3.eth.contract(address=address, abi=contract_data['abi']), account, nonce)
+             for address, account, nonce in zip(addresses, accounts, nonces)],
+            chain_id, code_hash, event_verbosity=event_verbosity, max_inflight=max_inflight, backend_id=backend_id,
+            **kwargs
+        )
+        await runner._set_event_verbosity(event_verbosity)
+        print(f"异步运行器: {slots}个槽位已部署合约，连接池上限{max_inflight}")
+        return runner
+
+    async def close(self):
+        """关闭连接池会话（进程内链无需关闭）"""
+        if isinstance(self.w3.provider, AsyncHTTPProvider):
+            await self.w3.provider.disconnect()
+
+    async def _set_event_verbosity(self, level):
+        """各槽位合约设置相同的事件详细程度（合约默认FULL）"""
+        if level == "FULL":
+            return
+        slots = [self._slots.get_nowait() for _ in range(self._slots.qsize())]
+        try:
+            if not hasattr(slots[0].contract.functions, "setEventVerbosity"):
+                raise RuntimeError("当前ABI缺少setEventVerbosity，请先执行 truffle compile 更新 build/contracts/DataPrice.json")
+            hashes = [await self._send(slot, "setEventVerbosity", (ContractRunner.verbosity_map[level],))
+                      for slot in slots]
+            await asyncio.gather(*(self._receipt("setEventVerbosity", tx_hash) for tx_hash in hashes))
+        finally:
+            for slot in slots:
+                self._slots.put_nowait(slot)
+
+    async def _send(self, slot, fn_name, args, gas=8000000):
+        """以槽位的本地nonce发送交易；构建交易只做ABI编码，不产生RPC请求"""
+        with self.timer.span(fn_name, "build"):
+            txn = {
+                'from': slot.account,
+                'to': slot.contract.address,
+                'data': slot.contract.encode_abi(fn_name, args=args),
+                'nonce': slot.nonce,
+                'gas': gas,
+                'gasPrice': Web3.to_wei('10', 'gwei'),
+                'chainId': self.chain_id,
+            }
+        with self.timer.span(fn_name, "send"):
+            try:
+                tx_hash = await self.w3.eth.send_transaction(txn)
+            except Exception as e:
+                if "exceeds block gas limit" not in str(e):
+                    raise
+                txn['gas'] = 3000000
+                tx_hash = await self.w3.eth.send_transaction(txn)
+        slot.nonce += 1
+        return tx_hash
+
+    async def _receipt(self, operation, tx_hash, poll=True):
+        """在信号量限制下取收据：poll=False 时收据应已上链，直接读取而不轮询"""
+        async with self._inflight:
+            with self.timer.span(operation, "receipt"):
+                if poll:
+                    return await self.w3.eth.wait_for_transaction_receipt(
+                        tx_hash, timeout=self.receipt_timeout, poll_latency=self.poll_latency)
+                return await self.w3.eth.get_transaction_receipt(tx_hash)
+
+    async def _submit_steps(self, slot, test_id, repeat_idx, steps):
+        """
+        连续发送一次测试的全部交易，再收取收据。
+        任一交易失败时抛出异常并注明所属测试与步骤；返回 (各步骤收据, 撮合耗时)
+        """
+        sent = []
+        start_match = time.perf_counter_ns()
+        for step, args in steps:
+            if step == "performMatching":
+                start_match = time.perf_counter_ns()
+            try:
+                sent.append((step, await self._send(slot, step, args)))
+            except Exception as e:
+                # 已发出的交易上链后再释放槽位；未进入交易池的nonce重新同步
+                if sent:
+                    await self._receipt(sent[-1][0], sent[-1][1])
+                slot.nonce = await self.w3.eth.get_transaction_count(slot.account, 'pending')
+                raise RuntimeError(f"{test_id}-{repeat_idx} {step} failed: {e}") from e
+        last_step, last_hash = sent[-1]
+        last = await self._receipt(last_step, last_hash)
+        earlier = await asyncio.gather(*(self._receipt(step, tx_hash, poll=False) for step, tx_hash in sent[:-1]))
+        match_time = (time.perf_counter_ns() - start_match) / 1e9
+        receipts = {}
+        for (step, tx_hash), receipt in zip(sent, [*earlier, last]):
+            if receipt['status'] != 1:
+                raise RuntimeError(f"{test_id}-{repeat_idx} {step} failed: Transaction reverted: {Web3.to_hex(tx_hash)}")
+            receipts[step] = receipt
+        return receipts, match_time
+
+    def _record(self, result):
+        """收集单次测试结果：写出到流式writer，未指定时保留在内存"""
+        if self.writer is not None:
+            self.writer.write(result)
+        else:
+            self.results.append(result)
+        return result
+
+    async def run_matching(self, test_id, repeat_idx, mode, scenario):
+        """执行单次匹配测试，结果字典与 ContractRunner.run_matching 相同"""
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(test_id, mode, repeat_idx, cell_seed(test_id, mode, repeat_idx, scenario),
+                                       self.code_hash, self.event_verbosity, self.backend_id)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"Test {test_id}-{repeat_idx} served from cache. Success: {cached.get('match_success')}")
+                return self._record(cached)
+        slot = await self._slots.get()
+        try:
+            return await self._run_on_slot(slot, cache_key, test_id, repeat_idx, mode, scenario)
+        finally:
+            self._slots.put_nowait(slot)
+
+    async def _run_on_slot(self, slot, cache_key, test_id, repeat_idx, mode, scenario):
+        P_off, offchain_time = 0.0, 0.0
+        start_match = time.perf_counter_ns()
+        try:
+            # 链下抽样在两次await之间完成，全局随机数种子不会被其他协程打断
+            cell = sample_cell(test_id, repeat_idx, mode, scenario, self.timer)
+            P_off, offchain_time = cell["P_off"], cell["offchain_time"]
+            product_args, seller_args, buyer_args = ContractRunner._cell_args(cell)
+            steps = [
+                ("resetAll", ()),
+                ("resetMatchingState", ("",)),  # 全局重置
+                ("setPricingMode", (ContractRunner.mode_map[mode],)),
+                ("addProduct", product_args),
+                ("addSeller", seller_args),
+                ("addBuyer", buyer_args),
+                ("performMatching", ()),
+            ]
+            receipts, match_time = await self._submit_steps(slot, test_id, repeat_idx, steps)
+            total_gas = sum(receipts[step]['gasUsed'] for step in ("addProduct", "addSeller", "addBuyer",
+                                                                    "performMatching"))
+            matched_logs, matched_detail_logs, detail_source = ContractRunner._decode_matching(
+                slot.events, self.event_verbosity, self.timer, receipts["performMatching"], mode, cell)
+            result = matching_result(test_id, repeat_idx, mode, scenario, cell, total_gas, match_time,
+                                     matched_logs, matched_detail_logs, detail_source)
+            self._record(result)
+            if cache_key is not None:
+                self.cache.put(cache_key, result)
+            print(f"Test {test_id}-{repeat_idx} completed. Success: {result['match_success']}")
+            return result
+        except Exception as e:
+            match_time = (time.perf_counter_ns() - start_match) / 1e9
+            result = failed_result(test_id, repeat_idx, mode, scenario, e, P_off, offchain_time, 0, match_time)
+            self._record(result)
+            print(f"Test {test_id}-{repeat_idx} failed: {str(e)}")
+            return result
+
+    async def run_cells(self, cells):
+        """并发执行实验单元 [(test_id, repeat_idx, mode, scenario)]，返回与cells顺序一致的结果列表"""
+        return await asyncio.gather(*(self.run_matching(*cell) for cell in cells))
+
+
+def run_async(cells, abi_path, ganache_url, slots=8, first_account=3, backend="ganache", max_inflight=32,
+              event_verbosity="FULL", writer=None, cache=None, timer=None):
+    """
+    同步入口（用法与 parallelRunner.run_parallel 相同）：在单个事件循环中并发执行实验矩阵，
+    返回与cells顺序一致的结果列表；指定 writer 时结果同时逐条写出
+    """
+    if not cells:
+        return []
+
+    async def main():
+        runner = await AsyncContractRunner.create(
+            abi_path, ganache_url, slots=min(slots, len(cells)), first_account=first_account, backend=backend,
+            max_inflight=max_inflight, event_verbosity=event_verbosity, writer=writer, cache=cache, timer=timer)
+        try:
+            return await runner.run_cells(cells)
+        finally:
+            await runner.close()
+
+    return asyncio.run(main())
@@ -0,0 +1,291 @@
+"""performMatching 规模基准：扫描 N个买家 × M个卖家 × P个产品 与 batchSize，输出可追踪回归的gas/延迟指标"""
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from web3DataPrice import (
+    ContractRunner, TEST_SCENARIOS, PERIOD_ENUM_MAP, scenario_rng, column_rows,
+    generate_quality_batch, generate_trader_params_batch, calculate_offchain_params_batch,
+)
+
+# 输出字段（CSV列顺序）
+BENCH_FIELDS = [
+    "n_buyers", "m_sellers", "p_products", "batch_size", "mode",
+    "setup_gas", "add_product_gas", "add_seller_gas", "add_buyer_gas",
+    "n_batches", "matching_gas", "gas_per_buyer", "gas_per_match",
+    "matches", "evaluated_pairs", "latency_per_batch", "max_latency_per_batch",
+    "max_batch_gas", "block_gas_limit", "hit_block_limit", "extrapolated_max_batch_size", "error",
+]
+# 已提示过“回退到逐条注册”的合约（按运行时字节码哈希），每个合约只提示一次
+_per_item_warned = set()
+# 节点/EVM 报告gas耗尽或超出区块gas上限时的错误信息片段（小写）
+GAS_LIMIT_ERRORS = ("out of gas", "outofgas", "exceeds block gas limit", "gas required exceeds", "exceeds gas limit")
+
+
+def gas_exhausted(error):
+    """错误信息是否表明交易耗尽gas或超出区块gas上限（而非普通的require回滚）"""
+    message = str(error).lower()
+    return any(fragment in message for fragment in GAS_LIMIT_ERRORS)
+
+
+def supported_batch_sizes(runner, batch_sizes):
+    """
+    合约ABI不含 setBatchSize（旧编译产物）时只能使用链上当前的 batchSize，
+    返回 (可执行的batchSize列表, 跳过的batchSize列表) 并提示跳过的取值
+    """
+    fns = runner.contract.functions
+    if hasattr(fns, "setBatchSize"):
+        return list(batch_sizes), []
+    current = fns.batchSize().call()
+    usable = [b for b in batch_sizes if b == current]
+    skipped = [b for b in batch_sizes if b != current]
+    if skipped:
+        print(f"警告: 当前ABI缺少setBatchSize，只能测试链上的 batchSize={current}，跳过 {skipped}；"
+              f"请先执行 truffle compile 更新 build/contracts/DataPrice.json")
+    return usable, skipped
+
+
+def generate_market(n_buyers, m_sellers, p_products, scenario, seed=0, max_match_count=5):
+    """
+    按场景参数生成 P个产品、M个卖家（轮流挂到各产品，各自最多成交 max_match_count 次）、N个买家，
+    返回 {"products": [...], "sellers": [...], "buyers": [...]}，元素为 add_product/add_seller/add_buyer 的参数
+    """
+    rng = scenario_rng("bench", scenario, seed)
+    period_enum = PERIOD_ENUM_MAP[scenario["market"]]
+    offchain = calculate_offchain_params_batch(scenario, generate_quality_batch(scenario["quality"], p_products, rng), rng)
+    products = [
+        (f"bench_p{k}", int(P_off * 10000), int(Q_p * 10000), period_enum)
+        for k, (P_off, Q_p) in enumerate(zip(offchain["P_off"].tolist(), offchain["Q_p"].tolist()))
+    ]
+    # 卖家/买家轮流对应各产品，按所属产品的参考价批量生成参数
+    seller_params = generate_trader_params_batch(
+        "seller", scenario["market"], offchain["P_off"][np.arange(m_sellers) % p_products], rng)
+    sellers = [(f"bench_s{j}", params, f"bench_p{j % p_products}", max_match_count)
+               for j, params in enumerate(column_rows(seller_params))]
+    buyer_params = generate_trader_params_batch(
+        "buyer", scenario["market"], offchain["P_off"][np.arange(n_buyers) % p_products], rng)
+    buyers = [(f"bench_b{i}", params) for i, params in enumerate(column_rows(buyer_params))]
+    return {"products": products, "sellers": sellers, "buyers": buyers}
+
+
+def populate_market(runner, n_buyers, m_sellers, p_products, scenario, seed=0, bulk=None, max_match_count=5,
+                    market=None):
+    """
+    将 generate_market 生成的市场（或直接传入的 market）写入合约，返回各函数的单条目平均gas。
+    bulk 为 None 时，合约ABI支持 addProducts/addSellers/addBuyers 即使用批量注册，否则提示后逐条注册
+    """
+    fns = runner.contract.functions
+    if bulk is None:
+        bulk = all(runner.has_function(name) for name in ("addProducts", "addSellers", "addBuyers"))
+        if not bulk and runner.code_hash not in _per_item_warned:
+            _per_item_warned.add(runner.code_hash)
+            print("警告: 当前ABI缺少 addProducts/addSellers/addBuyers，市场改为逐条交易注册（批量注册未生效）；"
+                  "请先执行 truffle compile 更新 build/contracts/DataPrice.json")
+    market = market or generate_market(n_buyers, m_sellers, p_products, scenario, seed, max_match_count)
+    products, sellers, buyers = market["products"], market["sellers"], market["buyers"]
+
+    if bulk:
+        groups = {
+            "addProduct": (runner.add_products(products), p_products),
+            "addSeller": (runner.add_sellers(sellers), m_sellers),
+            "addBuyer": (runner.add_buyers(buyers), n_buyers),
+        }
+    else:
+        groups = {
+            "addProduct": (runner.send_many([(fns.addProduct, runner._product_args(*p)) for p in products]),
+                           p_products),
+            "addSeller": (runner.send_many([(fns.addSeller, runner._seller_args(*s)) for s in sellers]),
+                          m_sellers),
+            "addBuyer": (runner.send_many([(fns.addBuyer, runner._buyer_args(*b)) for b in buyers]), n_buyers),
+        }
+    return {
+        name: sum(r["gasUsed"] for r in receipts) / count if count else 0
+        for name, (receipts, count) in groups.items()
+    }
+
+
+def drive_matching(runner, gas_limit):
+    """
+    反复调用 performMatching 直到其返回 false（即不再触发 BatchProcessed）。
+    返回每个批次的 (gasUsed, 耗时, Matched数, MatchedDetail数, 是否成功, 错误信息, 是否耗尽gas)。
+    失败收据的 gasUsed 等于交易gas上限时视为耗尽gas（require回滚会退还剩余gas）
+    """
+    fns = runner.contract.functions
+    events = runner.events
+    batches = []
+    while True:
+        start = time.perf_counter()
+        try:
+            receipt = runner._send_transaction(fns.performMatching, gas=gas_limit)
+        except Exception as e:
+            # 部分节点在交易回滚/耗尽gas时直接返回错误
+            batches.append((gas_limit, time.perf_counter() - start, 0, 0, False, str(e), gas_exhausted(e)))
+            break
+        latency = time.perf_counter() - start
+        if receipt["status"] != 1:
+            # _raw_send 可能已降低gas重试，以交易实际的gas上限为准
+            out_of_gas = receipt["gasUsed"] >= runner.w3.eth.get_transaction(receipt["transactionHash"])["gas"]
+            batches.append((receipt["gasUsed"], latency, 0, 0, False,
+                            "performMatching ran out of gas" if out_of_gas else "performMatching reverted", out_of_gas))
+            break
+        if events.count(receipt, "BatchProcessed") == 0:
+            # 返回false的收尾调用：重置批次索引，不计入批次统计
+            break
+        batches.append((receipt["gasUsed"], latency,
+                        events.count(receipt, "Matched"),
+                        events.count(receipt, "MatchedDetail"), True, "", False))
+    return batches
+
+
+def bench_market(runner, n_buyers, m_sellers, p_products, batch_size, mode="BASELINE", scenario=None, seed=0):
+    """单个市场规模 × batchSize 的基准测试，返回一行结果"""
+    scenario = scenario or TEST_SCENARIOS["L2"]
+    if not runner.isolate():
+        raise RuntimeError("合约状态重置失败")
+    runner.set_batch_size(batch_size)
+    runner.set_mode(mode)
+    setup = populate_market(runner, n_buyers, m_sellers, p_products, scenario, seed)
+
+    block_gas_limit = runner.w3.eth.get_block("latest")["gasLimit"]
+    batches = drive_matching(runner, block_gas_limit)
+    ok = [b for b in batches if b[4]]
+    matching_gas = sum(b[0] for b in ok)
+    matches = sum(b[2] for b in ok)
+    buyers_done = min(len(ok) * batch_size, n_buyers)
+    failed = [b for b in batches if not b[4]]
+    gas_per_buyer = matching_gas / buyers_done if buyers_done else None
+    return {
+        "n_buyers": n_buyers,
+        "m_sellers": m_sellers,
+        "p_products": p_products,
+        "batch_size": batch_size,
+        "mode": mode,
+        "setup_gas": setup["addProduct"] * p_products + setup["addSeller"] * m_sellers + setup["addBuyer"] * n_buyers,
+        "add_product_gas": setup["addProduct"],
+        "add_seller_gas": setup["addSeller"],
+        "add_buyer_gas": setup["addBuyer"],
+        "n_batches": len(ok),
+        "matching_gas": matching_gas,
+        "gas_per_buyer": gas_per_buyer,
+        "gas_per_match": matching_gas / matches if matches else None,
+        "matches": matches,
+        "evaluated_pairs": sum(b[3] for b in ok),
+        "latency_per_batch": sum(b[1] for b in ok) / len(ok) if ok else None,
+        "max_latency_per_batch": max((b[1] for b in ok), default=None),
+        "max_batch_gas": max((b[0] for b in batches), default=0),
+        "block_gas_limit": block_gas_limit,
+        # 只有失败批次确实耗尽gas/超出区块gas上限时才记为触及上限，其余回滚见 error
+        "hit_block_limit": any(b[6] for b in failed),
+        # 外推值（未实测）：区块gas上限 / 当前单买家gas
+        "extrapolated_max_batch_size": int(block_gas_limit // gas_per_buyer) if gas_per_buyer else None,
+        "error": failed[0][5] if failed else "",
+    }
+
+
+def _bench_rows(runner, sizes, batch_sizes, mode, scenario, seed):
+    """逐个规模与batchSize执行基准，单个组合失败时记录错误继续"""
+    rows = []
+    for n_buyers, m_sellers, p_products in sizes:
+        for batch_size in batch_sizes:
+            try:
+                row = bench_market(runner, n_buyers, m_sellers, p_products, batch_size, mode, scenario, seed)
+            except Exception as e:
+                row = {"n_buyers": n_buyers, "m_sellers": m_sellers, "p_products": p_products,
+                       "batch_size": batch_size, "mode": mode, "error": str(e)}
+            rows.append(row)
+            print(f"[bench] N={n_buyers} M={m_sellers} P={p_products} batch={batch_size}: "
+                  f"gas/buyer={row.get('gas_per_buyer')} gas/match={row.get('gas_per_match')} {row.get('error', '')}")
+    return rows
+
+
+def _write_outputs(rows, fields, prefix, output_dir, summary=None):
+    """写出 CSV 明细与 JSON 汇总"""
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    csv_file = os.path.join(output_dir, f"{prefix}_{timestamp}.csv")
+    with open(csv_file, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    json_file = os.path.join(output_dir, f"{prefix}_{timestamp}.json")
+    with open(json_file, "w", encoding="utf-8") as file:
+        json.dump(dict(summary or {}, timestamp=timestamp, rows=rows), file, ensure_ascii=False, indent=2)
+    print(f"基准结果保存至: {csv_file} / {json_file}")
+    return timestamp
+
+
+def run_benchmark(runner, sizes, batch_sizes, mode="BASELINE", scenario=None, seed=0, output_dir="output"):
+    """扫描规模与batchSize，写出 CSV 明细与 JSON 汇总，返回结果行列表；合约不支持的batchSize跳过并记入汇总"""
+    batch_sizes, skipped = supported_batch_sizes(runner, batch_sizes)
+    rows = _bench_rows(runner, sizes, batch_sizes, mode, scenario, seed)
+    # 首个触及区块gas上限的规模，便于回归追踪
+    first_limit = next((r for r in rows if r.get("hit_block_limit")), None)
+    timestamp = _write_outputs(rows, BENCH_FIELDS, "bench_matching", output_dir, {
+        "mode": mode,
+        "skipped_batch_sizes": skipped,
+        "extrapolated_max_batch_size": "block_gas_limit / gas_per_buyer, extrapolated rather than measured",
+        "first_block_limit_hit": first_limit and {k: first_limit[k] for k in
+                                                  ("n_buyers", "m_sellers", "p_products", "batch_size")},
+    })
+    # 各合约调用的 build / nonce / send / receipt 分阶段耗时
+    runner.timer.export(output_dir, f"bench_{timestamp}")
+    return rows
+
+
+def compare_artifacts(artifacts, sizes, batch_sizes=(1,), mode="BASELINE", scenario=None, seed=0,
+                      output_dir="output"):
+    """
+    gas回归对比：artifacts 为 {标签: 编译产物路径}，每个产物在独立的进程内链上部署，
+    以相同种子生成的市场输入执行同一组基准，结果按标签合并输出
+    """
+    rows = []
+    for label, artifact_path in artifacts.items():
+        runner = ContractRunner(None, artifact_path, None, pipelined=True, isolation="snapshot",
+                                backend="eth-tester")
+        usable, _ = supported_batch_sizes(runner, batch_sizes)
+        for row in _bench_rows(runner, sizes, usable, mode, scenario, seed):
+            rows.append(dict(row, label=label))
+    _write_outputs(rows, ["label"] + BENCH_FIELDS, "bench_compare", output_dir,
+                   {"mode": mode, "artifacts": artifacts})
+    return rows
+
+
+def compare_verbosity(artifact_path, sizes, levels=("FULL", "MATCHES", "OFF"), batch_sizes=(1,), mode="BASELINE",
+                      scenario=None, seed=0, output_dir="output"):
+    """
+    事件详细程度的gas对比：每个级别在独立的进程内链上部署同一产物，以相同种子的市场执行同一组基准。
+    产物不支持 setEventVerbosity 时只能测 FULL，其余级别提示后跳过
+    """
+    rows, skipped = [], []
+    for level in levels:
+        try:
+            runner = ContractRunner(None, artifact_path, None, pipelined=True, isolation="snapshot",
+                                    backend="eth-tester", event_verbosity=level)
+        except RuntimeError as e:
+            print(f"警告: 跳过事件级别 {level}: {str(e)}")
+            skipped.append(level)
+            continue
+        usable, _ = supported_batch_sizes(runner, batch_sizes)
+        for row in _bench_rows(runner, sizes, usable, mode, scenario, seed):
+            rows.append(dict(row, label=level))
+    _write_outputs(rows, ["label"] + BENCH_FIELDS, "bench_verbosity", output_dir,
+                   {"mode": mode, "artifact": artifact_path, "skipped_levels": skipped})
+    return rows
+
+
+if __name__ == "__main__":
+    ABI_PATH = os.path.join('build', 'contracts', 'DataPrice.json')
+    GANACHE_URL = "http://127.0.0.1:7545"
+    BACKEND = "eth-tester"  # ganache | eth-tester
+    CONTRACT_ADDRESS = None  # ganache 后端时填写合约地址，None 表示自动部署
+    # (买家数N, 卖家数M, 产品数P)
+    SIZES = [(1, 1, 1), (5, 5, 1), (10, 10, 5), (20, 20, 10), (40, 40, 20)]
+    BATCH_SIZES = [1, 5, 10]
+    EVENT_VERBOSITY = "FULL"  # FULL | MATCHES | OFF，evaluated_pairs 仅在 FULL 下有效
+    ISOLATION = "reset"  # reset | snapshot，与 web3DataPrice 的 ISOLATION 相同
+
+    runner = ContractRunner(CONTRACT_ADDRESS, ABI_PATH, GANACHE_URL,
+                            pipelined=True, isolation=ISOLATION, backend=BACKEND, event_verbosity=EVENT_VERBOSITY)
+    run_benchmark(runner, SIZES, BATCH_SIZES)
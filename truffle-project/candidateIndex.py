@@ -0,0 +1,126 @@
+"""链下候选卖家索引：按保留价排序并结合产品质量，为每个买家剪除必然不满足前置条件的买卖对，供定向撮合入口使用"""
+import time
+
+import numpy as np
+
+import priceEngine
+from web3DataPrice import ContractRunner
+
+
+class CandidateIndex:
+    """
+    以合约注册顺序的卖家为下标（与链上 sellers[] 一致）。卖家按保留价升序排序，
+    买家保留价以下的前缀即满足保留价顺序的全部卖家，再按所属产品质量与买家质量阈值过滤
+    """
+
+    def __init__(self, products, sellers):
+        """products / sellers 为 addProduct / addSeller 的定点参数元组（_product_args / _seller_args 的输出）"""
+        # 重复产品ID以首次注册为准，与合约的ID索引一致
+        product_pos = {}
+        for k, product in enumerate(products):
+            product_pos.setdefault(product[0], k)
+        benchmark = np.array([product[1] for product in products], dtype=np.int64)
+        quality = np.array([product[2] for product in products], dtype=np.int64)
+        product_idx = np.array([product_pos[seller[5]] for seller in sellers], dtype=np.int64)
+        self.seller_reserve = np.array([seller[1] for seller in sellers], dtype=np.int64)
+        self.seller_initial = np.array([seller[2] for seller in sellers], dtype=np.int64)
+        self.seller_trust = np.array([seller[3] for seller in sellers], dtype=np.int64)
+        self.seller_loss_aversion = np.array([seller[4] for seller in sellers], dtype=np.int64)
+        self.seller_benchmark = benchmark[product_idx]
+        self.seller_quality = quality[product_idx]
+        self.order = np.argsort(self.seller_reserve, kind="stable")
+        self.sorted_reserve = self.seller_reserve[self.order]
+        # 剩余可成交次数：达到 maxMatchCount 的卖家链上会被跳过，此后不再作为候选
+        self.remaining = np.array([seller[6] for seller in sellers], dtype=np.int64)
+        self.position = {}
+        for j, seller in enumerate(sellers):
+            self.position.setdefault(seller[0], j)
+
+    @classmethod
+    def from_market(cls, market):
+        """由 benchDataPrice.generate_market 的输出构建"""
+        return cls([ContractRunner._product_args(*p) for p in market["products"]],
+                   [ContractRunner._seller_args(*s) for s in market["sellers"]])
+
+    def __len__(self):
+        return self.seller_reserve.size
+
+    def record_matches(self, seller_ids):
+        """按 Matched 事件中的卖家ID扣减剩余成交次数"""
+        for seller_id in seller_ids:
+            self.remaining[self.position[seller_id]] -= 1
+
+    def feasible(self, buyer):
+        """
+        满足前置条件（卖家保留价 < 买家保留价，且产品质量 > 买家质量阈值）且未达成交上限的卖家下标，升序排列。
+        buyer 为 addBuyer 的定点参数元组
+        """
+        _, reserve, _, _, _, quality_request = buyer
+        prefix = self.order[:np.searchsorted(self.sorted_reserve, reserve, side="left")]
+        keep = (self.seller_quality[prefix] > quality_request) & (self.remaining[prefix] > 0)
+        return np.sort(prefix[keep])
+
+    def candidates(self, buyer, mode=None):
+        """
+        买家的候选卖家下标。给出 mode 时再以链下引擎按该定价模式逐对复算，只保留能成交的卖家；
+        链上可能回滚的买卖对（按FULL事件级别的判定，覆盖其余级别）同样保留，使定向撮合与全量撮合的成交结果一致。
+        任何事件级别下都会剪枝：FULL 时定向撮合只对给出的买卖对发出 MatchedDetail，被剪除的买卖对不再评估
+        """
+        sellers = self.feasible(buyer)
+        if mode is None or sellers.size == 0:
+            return sellers
+        _, reserve, initial, trust, loss_aversion, quality_request = buyer
+        out = priceEngine.calculate_match(
+            mode, self.seller_benchmark[sellers], self.seller_quality[sellers],
+            reserve, initial, trust, loss_aversion, quality_request,
+            self.seller_reserve[sellers], self.seller_initial[sellers],
+            self.seller_trust[sellers], self.seller_loss_aversion[sellers],
+            detailed_events=True,
+        )
+        return sellers[out["dealSuccess"] | out["reverted"]]
+
+    def plan(self, buyers, mode=None, start=0):
+        """
+        为一组买家（链上下标从 start 开始连续）生成定向撮合计划 [(买家下标, [卖家下标...])]。
+        没有候选卖家的买家不会成交，直接省略
+        """
+        plan = []
+        for offset, buyer in enumerate(buyers):
+            sellers = self.candidates(buyer, mode)
+            if sellers.size:
+                plan.append((start + offset, sellers.tolist()))
+        return plan
+
+
+def clear_with_candidates(runner, index, buyers, mode=None, batch_size=10, gas_limit=8000000):
+    """
+    以定向撮合清算全部买家：每笔交易处理 batch_size 个买家（与 performMatching 的批次一致），
+    每轮根据上一轮的 Matched 事件更新卖家剩余成交次数后再生成计划。
+    FULL 事件级别下 MatchedDetail 只覆盖计划中的买卖对，而非全量撮合的 N×M 对。
+    返回每一轮的 {gas, latency, prices, saturated, pairs}（与 marketSimulation.clear_market 相同的字段），以及错误信息
+    """
+    events = runner.events
+    buyer_args = [ContractRunner._buyer_args(*b) for b in buyers]
+    rounds = []
+    for i in range(0, len(buyer_args), batch_size):
+        chunk = index.plan(buyer_args[i:i + batch_size], mode, start=i)
+        if not chunk:
+            continue
+        start = time.perf_counter()
+        try:
+            receipt = runner.match_candidates(chunk, gas=gas_limit)
+        except Exception as e:
+            return rounds, str(e)
+        latency = time.perf_counter() - start
+        if receipt["status"] != 1:
+            return rounds, "performMatchingWithCandidates reverted"
+        matched = events.matched(receipt)
+        index.record_matches(event["sellerId"] for event in matched)
+        rounds.append({
+            "gas": receipt["gasUsed"],
+            "latency": latency,
+            "prices": [event["price"] for event in matched],
+            "saturated": events.count(receipt, "SellerMaxMatchesReached"),
+            "pairs": sum(len(sellers) for _, sellers in chunk),
+        })
+    return rounds, ""
@@ -0,0 +1,242 @@
+"""
+命令行入口：子命令 smoke / run / report / bench，配置取自 默认值 < 配置文件(--config, JSON) < 命令行参数。
+web3、pandas 等重量级依赖只在执行对应子命令时导入（report 不导入web3，run/smoke/bench 不导入pandas直到汇总）
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+# 默认配置：与 web3DataPrice.py 主流程的配置常量一一对应（键名为其小写形式）
+DEFAULTS = {
+    "contract_address": "0x9303001B46Fd74da139387A746e8bb798e812526",
+    "abi_path": os.path.join("build", "contracts", "DataPrice.json"),
+    "ganache_url": "http://127.0.0.1:7545",
+    "backend": "ganache",
+    "pipelined": False,
+    "workers": 1,
+    "async": False,
+    "async_slots": 6,
+    "async_inflight": 32,
+    "isolation": "reset",
+    "event_verbosity": "FULL",
+    "run_name": None,
+    "result_format": "jsonl",
+    "parquet": False,
+    # 结果缓存默认关闭（命中行不重新计时）；--cache-dir output/cache 开启
+    "cache_dir": None,
+    "adaptive": False,
+    "adaptive_min_repeats": 5,
+    "adaptive_max_repeats": 60,
+    "adaptive_budget": None,
+    "output_dir": "output",
+    # 场景子集（TEST_SCENARIOS 的键），None = 全部
+    "scenarios": None,
+    # {定价模式: 重复次数}，None = web3DataPrice.run_counts
+    "run_counts": None,
+    "skip_smoke": False,
+    "no_report": False,
+    # 基准：[(买家数N, 卖家数M, 产品数P)] 与 batchSize 列表，基准总是部署新合约
+    "bench_sizes": [[1, 1, 1], [5, 5, 1], [10, 10, 5], [20, 20, 10], [40, 40, 20]],
+    "bench_batch_sizes": [1, 5, 10],
+    "bench_mode": "BASELINE",
+}
+
+
+def load_config(path=None, overrides=None):
+    """合并默认值、JSON配置文件与命令行参数；配置文件中的未知键视为错误"""
+    config = dict(DEFAULTS)
+    if path:
+        with open(path, "r", encoding="utf-8") as file:
+            loaded = json.load(file)
+        unknown = set(loaded) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"配置文件 {path} 中存在未知配置项: {sorted(unknown)}")
+        config.update(loaded)
+    config.update(overrides or {})
+    return config
+
+
+def _counts(values):
+    """["BASELINE=5", "NASH=10"] → {"BASELINE": 5, "NASH": 10}"""
+    counts = {}
+    for value in values:
+        mode, _, count = value.partition("=")
+        if not count.isdigit():
+            raise ValueError(f"重复次数格式应为 模式=次数: {value}")
+        counts[mode.upper()] = int(count)
+    return counts
+
+
+def _size(value):
+    """"10x10x5" → [10, 10, 5]"""
+    parts = value.lower().split("x")
+    if len(parts) != 3 or not all(p.isdigit() for p in parts):
+        raise argparse.ArgumentTypeError(f"规模格式应为 NxMxP: {value}")
+    return [int(p) for p in parts]
+
+
+def build_parser():
+    # 未给出的参数不出现在解析结果中，由配置文件或默认值补齐
+    common = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    common.add_argument("--config", help="JSON配置文件，键名同 cli.DEFAULTS")
+    common.add_argument("--abi-path", dest="abi_path", help="truffle编译产物路径")
+    common.add_argument("--ganache-url", dest="ganache_url")
+    common.add_argument("--contract-address", dest="contract_address", help="ganache 后端的已部署合约地址")
+    common.add_argument("--backend", choices=["ganache", "eth-tester"])
+    common.add_argument("--event-verbosity", dest="event_verbosity", choices=["FULL", "MATCHES", "OFF"])
+    common.add_argument("--output-dir", dest="output_dir")
+
+    results = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    results.add_argument("--run-name", dest="run_name", help="流式结果文件的运行名，已有运行名则续跑/汇总该运行")
+    results.add_argument("--result-format", dest="result_format", choices=["jsonl", "csv"])
+
+    parser = argparse.ArgumentParser(prog="cli.py", description="DataPrice 定价实验")
+    sub = parser.add_subparsers(dest="command", required=True)
+    quiet = {"argument_default": argparse.SUPPRESS}
+
+    sub.add_parser("smoke", parents=[common], **quiet, help="连接链后端并执行冒烟测试")
+
+    run = sub.add_parser("run", parents=[common, results], **quiet, help="执行实验矩阵（结束后生成汇总报告）")
+    run.add_argument("--scenarios", nargs="+", help="只运行指定的 TEST_SCENARIOS 场景")
+    run.add_argument("--counts", nargs="+", type=str, dest="run_counts", metavar="MODE=N",
+                     help="各定价模式的重复次数，如 BASELINE=5 NASH=10")
+    run.add_argument("--workers", type=int)
+    run.add_argument("--pipelined", action="store_true")
+    run.add_argument("--async", action="store_true", help="使用 asyncRunner 并发执行")
+    run.add_argument("--async-slots", dest="async_slots", type=int)
+    run.add_argument("--async-inflight", dest="async_inflight", type=int)
+    run.add_argument("--isolation", choices=["snapshot", "reset"])
+    run.add_argument("--parquet", action="store_true")
+    run.add_argument("--cache-dir", dest="cache_dir")
+    run.add_argument("--no-cache", dest="cache_dir", action="store_const", const=None)
+    run.add_argument("--adaptive", action="store_true")
+    run.add_argument("--adaptive-min-repeats", dest="adaptive_min_repeats", type=int)
+    run.add_argument("--adaptive-max-repeats", dest="adaptive_max_repeats", type=int)
+    run.add_argument("--adaptive-budget", dest="adaptive_budget", type=int)
+    run.add_argument("--skip-smoke", dest="skip_smoke", action="store_true")
+    run.add_argument("--no-report", dest="no_report", action="store_true")
+
+    sub.add_parser("report", parents=[common, results], **quiet,
+                   help="由流式结果文件生成汇总报告（未指定运行名时取最近一次运行）")
+
+    bench = sub.add_parser("bench", parents=[common], **quiet, help="performMatching 规模基准")
+    bench.add_argument("--sizes", nargs="+", type=_size, dest="bench_sizes", metavar="NxMxP")
+    bench.add_argument("--batch-sizes", nargs="+", type=int, dest="bench_batch_sizes")
+    bench.add_argument("--mode", dest="bench_mode", choices=["BASELINE", "STATIC", "NASH"])
+    bench.add_argument("--isolation", choices=["snapshot", "reset"])
+    return parser
+
+
+def _runner(config, **kwargs):
+    """按配置连接链后端；eth-tester 后端总是部署新合约"""
+    from web3DataPrice import ContractRunner
+    address = config["contract_address"] if config["backend"] == "ganache" else None
+    runner = ContractRunner(address, config["abi_path"], config["ganache_url"], backend=config["backend"],
+                            event_verbosity=config["event_verbosity"], **kwargs)
+    print(f"Connected to contract at {runner.contract.address}")
+    return runner
+
+
+def cmd_smoke(config):
+    from web3DataPrice import smoke_test
+    runner = _runner(config, pipelined=config["pipelined"], isolation=config["isolation"])
+    print("\n执行冒烟测试...")
+    smoke_test(runner)
+    print("冒烟测试通过！")
+
+
+def cmd_run(config):
+    from resultCache import ResultCache
+    from resultWriter import ResultWriter
+    from web3DataPrice import TEST_SCENARIOS, run_counts, run_experiment, smoke_test
+
+    scenarios = config["scenarios"] or list(TEST_SCENARIOS)
+    unknown = set(scenarios) - set(TEST_SCENARIOS)
+    if unknown:
+        raise ValueError(f"未知场景: {sorted(unknown)}（可选: {list(TEST_SCENARIOS)}）")
+    counts = config["run_counts"] or run_counts
+    if isinstance(counts, list):
+        counts = _counts(counts)
+    unknown = set(counts) - set(run_counts)
+    if unknown:
+        raise ValueError(f"未知定价模式: {sorted(unknown)}（可选: {list(run_counts)}）")
+
+    writer = ResultWriter.for_run(config["output_dir"], config["run_name"], config["result_format"],
+                                  parquet=config["parquet"])
+    cache = ResultCache(config["cache_dir"]) if config["cache_dir"] else None
+    runner = _runner(config, pipelined=config["pipelined"], isolation=config["isolation"], writer=writer, cache=cache)
+    if not config["skip_smoke"]:
+        print("\n执行冒烟测试...")
+        smoke_test(runner)
+        print("冒烟测试通过！")
+
+    start_time = time.time()
+    run_experiment(
+        runner, writer, config["abi_path"], config["ganache_url"],
+        {test_id: TEST_SCENARIOS[test_id] for test_id in scenarios}, counts,
+        backend=config["backend"], pipelined=config["pipelined"], workers=config["workers"],
+        isolation=config["isolation"], event_verbosity=config["event_verbosity"], cache=cache,
+        use_async=config["async"], async_slots=config["async_slots"], async_inflight=config["async_inflight"],
+        adaptive=config["adaptive"], adaptive_min_repeats=config["adaptive_min_repeats"],
+        adaptive_max_repeats=config["adaptive_max_repeats"], adaptive_budget=config["adaptive_budget"],
+    )
+    print(f"\n实验耗时: {time.time() - start_time:.2f}秒，结果文件: {writer.path}")
+    if not config["no_report"]:
+        from resultReport import save_results
+        save_results(writer.load(), output_dir=config["output_dir"], timer=runner.timer)
+
+
+def latest_run(output_dir, fmt):
+    """输出目录中最近修改的流式结果文件对应的运行名（不含并行分片）"""
+    if fmt == "csv":
+        # 汇总报告同样写出 experiment_results_<时间戳>.csv，无法与流式CSV区分，需显式指定运行名
+        raise ValueError("csv 格式的运行请使用 --run-name 指定运行名")
+    paths = [p for p in glob.glob(os.path.join(output_dir, f"experiment_results_*.{fmt}"))
+             if not os.path.splitext(os.path.splitext(p)[0])[1].startswith(".w")]
+    if not paths:
+        raise FileNotFoundError(f"{output_dir} 中没有 .{fmt} 流式结果文件")
+    latest = max(paths, key=os.path.getmtime)
+    return os.path.basename(latest)[len("experiment_results_"):-len(f".{fmt}")]
+
+
+def cmd_report(config):
+    from resultWriter import ResultWriter
+    run_name = config["run_name"] or latest_run(config["output_dir"], config["result_format"])
+    writer = ResultWriter.for_run(config["output_dir"], run_name, config["result_format"])
+    if not os.path.exists(writer.path):
+        raise FileNotFoundError(f"结果文件不存在: {writer.path}")
+    print(f"汇总运行 {run_name}: {writer.path}")
+    from resultReport import save_results
+    save_results(writer.load(), output_dir=config["output_dir"])
+
+
+def cmd_bench(config):
+    from benchDataPrice import run_benchmark
+    from web3DataPrice import ContractRunner
+    runner = ContractRunner(None, config["abi_path"], config["ganache_url"], pipelined=True,
+                            isolation=config["isolation"], backend=config["backend"],
+                            event_verbosity=config["event_verbosity"])
+    run_benchmark(runner, [tuple(size) for size in config["bench_sizes"]], config["bench_batch_sizes"],
+                  mode=config["bench_mode"], output_dir=config["output_dir"])
+
+
+COMMANDS = {"smoke": cmd_smoke, "run": cmd_run, "report": cmd_report, "bench": cmd_bench}
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = vars(parser.parse_args(argv))
+    command = args.pop("command")
+    try:
+        config = load_config(args.pop("config", None), args)
+        COMMANDS[command](config)
+    except Exception as e:
+        print(f"{command} 失败: {str(e)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -19,6 +19,7 @@ contract DataPrice {
         uint256 firstBid; 
         uint256 matchCount; 
         uint256 maxMatchCount; 
+        uint256 productIndex; // Cached index of the product in products[]
     }
     // Market period enumeration
     enum MarketPeriod {HIGH_VOLATILITY, SUPPLY_SURPLUS, BALANCE}
@@ -40,9 +41,26 @@ contract DataPrice {
         uint256 buyerBehavioral;
         uint256 sellerBehavioral;
     }
+    // Quote input: one buyer-seller pair and its product, passed directly instead of read from storage
+    struct QuoteInput {
+        uint256 benchmarkPrice;
+        uint256 qualityFactor;
+        uint256 buyerReserve;
+        uint256 buyerInitial;
+        uint256 buyerTrust;
+        uint256 buyerLossAversion;
+        uint256 buyerQualityRequest;
+        uint256 sellerReserve;
+        uint256 sellerInitial;
+        uint256 sellerTrust;
+        uint256 sellerLossAversion;
+    }
     Buyer[] public buyers; // All buyers
     Seller[] public sellers; // All sellers
     Product[] public products; // All product
+    // Id hash indexes, storing array index + 1 (0 means not registered)
+    mapping(bytes32 => uint256) private productIndexById;
+    mapping(bytes32 => uint256) private sellerIndexById;
     // Batch processing of status variables
     uint256 public currentBuyerBatch = 0;
     uint256 public batchSize = 1; // The number of buyers processed in each batch can be adjusted as needed.
@@ -75,6 +93,13 @@ contract DataPrice {
     // }
     // Initialization
     function resetAll() public {
+        // Clear the id indexes before the arrays they point into
+        for (uint256 i = 0; i < products.length; i++) {
+            delete productIndexById[keccak256(bytes(products[i].productId))];
+        }
+        for (uint256 i = 0; i < sellers.length; i++) {
+            delete sellerIndexById[keccak256(bytes(sellers[i].id))];
+        }
         delete buyers;
         delete sellers;
         delete products;
@@ -87,46 +112,113 @@ contract DataPrice {
         require(_mode <= uint(PricingMode.NASH), "Invalid mode");
         currentMode = PricingMode(_mode);
     }
+    // Event verbosity: OFF emits no per-buyer events, MATCHES emits Matched/SellerMaxMatchesReached,
+    // FULL additionally emits one MatchedDetail diagnostic per evaluated buyer-seller pair
+    enum EventVerbosity { OFF, MATCHES, FULL }
+    EventVerbosity public eventVerbosity = EventVerbosity.FULL;
+
+    function setEventVerbosity(uint _level) external {
+        require(_level <= uint(EventVerbosity.FULL), "Invalid verbosity");
+        eventVerbosity = EventVerbosity(_level);
+    }
+    // Adjust the number of buyers processed per performMatching call
+    function setBatchSize(uint256 _batchSize) external {
+        require(_batchSize > 0, "Batch size must be positive");
+        batchSize = _batchSize;
+    }
     // Add product data
     function addProduct(string memory productId, uint256 benchmarkPrice, uint256 qualityFactor,  MarketPeriod period) public {
-        products.push(Product({productId: productId, benchmarkPrice: benchmarkPrice, qualityFactor: qualityFactor, period: period}));
-        emit ProductAdded(productId, benchmarkPrice, qualityFactor);
+        _addProduct(productId, benchmarkPrice, qualityFactor, period);
     }
     // Add buyer data
     function addBuyer(string memory id, uint256 reservePrice, uint256 initialPrice, uint256 trust, uint256 lossAversion, uint256 qualityRequest) public {
-        require(reservePrice > 0 && initialPrice > 0, "Prices must be positive");
-        buyers.push(Buyer({id: id, reservePrice: reservePrice, initialPrice: initialPrice, trust: trust, lossAversion: lossAversion, qualityRequest: qualityRequest}));
-        emit BuyerAdded(id, reservePrice, initialPrice, trust, lossAversion, qualityRequest);
+        _addBuyer(id, reservePrice, initialPrice, trust, lossAversion, qualityRequest);
     }
     // Add seller data
     function addSeller(string memory id, uint256 reservePrice, uint256 initialPrice, 
                       uint256 trust, uint256 lossAversion, string memory productId,
                       uint256 maxMatchCount) public {
+        _addSeller(id, reservePrice, initialPrice, trust, lossAversion, productId, maxMatchCount);
+    }
+    // Bulk registration: parallel arrays, one entry per product
+    function addProducts(string[] memory productIds, uint256[] memory benchmarkPrices,
+                         uint256[] memory qualityFactors, MarketPeriod[] memory periods) public {
+        uint256 count = productIds.length;
+        require(benchmarkPrices.length == count && qualityFactors.length == count && periods.length == count,
+                "Array length mismatch");
+        for (uint256 i = 0; i < count; i++) {
+            _addProduct(productIds[i], benchmarkPrices[i], qualityFactors[i], periods[i]);
+        }
+    }
+    // Bulk registration: parallel arrays, one entry per buyer
+    function addBuyers(string[] memory ids, uint256[] memory reservePrices, uint256[] memory initialPrices,
+                       uint256[] memory trusts, uint256[] memory lossAversions, uint256[] memory qualityRequests) public {
+        uint256 count = ids.length;
+        require(reservePrices.length == count && initialPrices.length == count && trusts.length == count
+                && lossAversions.length == count && qualityRequests.length == count, "Array length mismatch");
+        for (uint256 i = 0; i < count; i++) {
+            _addBuyer(ids[i], reservePrices[i], initialPrices[i], trusts[i], lossAversions[i], qualityRequests[i]);
+        }
+    }
+    // Bulk registration: parallel arrays, one entry per seller
+    function addSellers(string[] memory ids, uint256[] memory reservePrices, uint256[] memory initialPrices,
+                        uint256[] memory trusts, uint256[] memory lossAversions, string[] memory productIds,
+                        uint256[] memory maxMatchCounts) public {
+        require(reservePrices.length == ids.length && initialPrices.length == ids.length
+                && trusts.length == ids.length && lossAversions.length == ids.length
+                && productIds.length == ids.length && maxMatchCounts.length == ids.length, "Array length mismatch");
+        for (uint256 i = 0; i < ids.length; i++) {
+            _addSeller(ids[i], reservePrices[i], initialPrices[i], trusts[i], lossAversions[i], productIds[i], maxMatchCounts[i]);
+        }
+    }
+    // Shared by addProduct/addProducts
+    function _addProduct(string memory productId, uint256 benchmarkPrice, uint256 qualityFactor, MarketPeriod period) internal {
+        // Keep the first registration for duplicate ids, as the linear scan did
+        bytes32 key = keccak256(bytes(productId));
+        if (productIndexById[key] == 0) {
+            productIndexById[key] = products.length + 1;
+        }
+        products.push(Product({productId: productId, benchmarkPrice: benchmarkPrice, qualityFactor: qualityFactor, period: period}));
+        emit ProductAdded(productId, benchmarkPrice, qualityFactor);
+    }
+    // Shared by addBuyer/addBuyers
+    function _addBuyer(string memory id, uint256 reservePrice, uint256 initialPrice, uint256 trust, uint256 lossAversion, uint256 qualityRequest) internal {
         require(reservePrice > 0 && initialPrice > 0, "Prices must be positive");
-        uint256 benchmarkPrice = getBenchmark(productId);
-        require(benchmarkPrice > 0, "Product not found");
-        uint256 computedPrice = calculateSellerPrice(initialPrice, benchmarkPrice, trust);        
-        sellers.push(Seller({
-            id: id,
-            reservePrice: reservePrice,
-            initialPrice: initialPrice,
-            trust: trust,
-            lossAversion: lossAversion,
-            productId: productId,
-            firstBid: computedPrice,
-            matchCount: 0,
-            maxMatchCount: maxMatchCount
-        }));        
+        buyers.push(Buyer({id: id, reservePrice: reservePrice, initialPrice: initialPrice, trust: trust, lossAversion: lossAversion, qualityRequest: qualityRequest}));
+        emit BuyerAdded(id, reservePrice, initialPrice, trust, lossAversion, qualityRequest);
+    }
+    // Shared by addSeller/addSellers
+    function _addSeller(string memory id, uint256 reservePrice, uint256 initialPrice, 
+                        uint256 trust, uint256 lossAversion, string memory productId,
+                        uint256 maxMatchCount) internal {
+        require(reservePrice > 0 && initialPrice > 0, "Prices must be positive");
+        // Scoped block keeps the extra locals off the stack for the emit below
+        {
+            (bool found, uint256 productIdx) = _findProduct(productId);
+            require(found && products[productIdx].benchmarkPrice > 0, "Product not found");
+            bytes32 key = keccak256(bytes(id));
+            if (sellerIndexById[key] == 0) {
+                sellerIndexById[key] = sellers.length + 1;
+            }
+            // Fill the new slot field by field instead of building a memory struct
+            Seller storage seller = sellers.push();
+            seller.id = id;
+            seller.reservePrice = reservePrice;
+            seller.initialPrice = initialPrice;
+            seller.trust = trust;
+            seller.lossAversion = lossAversion;
+            seller.productId = productId;
+            seller.firstBid = calculateSellerPrice(initialPrice, products[productIdx].benchmarkPrice, trust);
+            seller.maxMatchCount = maxMatchCount;
+            seller.productIndex = productIdx;
+        }
         emit SellerAdded(id, reservePrice, initialPrice, trust, lossAversion, productId, maxMatchCount);
     }    
     // Obtain the number of times the seller was matched
     function getSellerMatchCount(string memory sellerId) public view returns (uint256) {
-        for (uint256 i = 0; i < sellers.length; i++) {
-            if (compareStrings(sellers[i].id, sellerId)) {
-                return sellers[i].matchCount;
-            }
-        }
-        revert("Seller not found");
+        int256 index = getSellerIndex(sellerId);
+        require(index >= 0, "Seller not found");
+        return sellers[uint256(index)].matchCount;
     }    
     // Obtain all the information of the sellers
     function getAllSellers() public view returns (Seller[] memory) {
@@ -134,12 +226,11 @@ contract DataPrice {
     }
     // Obtain the seller index
     function getSellerIndex(string memory sellerId) internal view returns (int256) {
-        for (uint256 i = 0; i < sellers.length; i++) {
-            if (compareStrings(sellers[i].id, sellerId)) {
-                return int256(i);
-            }
+        uint256 slot = sellerIndexById[keccak256(bytes(sellerId))];
+        if (slot == 0) {
+            return -1;
         }
-        return -1;
+        return int256(slot - 1);
     }    
     // Status reset
     function resetMatchingState(string memory specificSeller) public {
@@ -161,25 +252,24 @@ contract DataPrice {
     }
     // Obtain the benchmark price of the product
     function getBenchmark(string memory productId) internal view returns (uint256) {
-        for (uint256 i = 0; i < products.length; i++) {
-            if (compareStrings(products[i].productId, productId)) {
-                return (products[i].benchmarkPrice);
-            }
-        }
-        return 0;
+        (bool found, uint256 index) = _findProduct(productId);
+        return found ? products[index].benchmarkPrice : 0;
     }
     // Obtain the benchmark price of the product
     function getProduct(string memory productId) internal view returns (uint256, uint256) {
-        for (uint256 i = 0; i < products.length; i++) {
-            if (compareStrings(products[i].productId, productId)) {
-                return (products[i].benchmarkPrice, products[i].qualityFactor);
-            }
+        (bool found, uint256 index) = _findProduct(productId);
+        if (!found) {
+            return (0,0);
         }
-        return (0,0);
+        return (products[index].benchmarkPrice, products[index].qualityFactor);
     }
-    // Compare strings
-    function compareStrings(string memory a, string memory b) internal pure returns (bool) {
-        return keccak256(bytes(a)) == keccak256(bytes(b));
+    // Look up the product index by id hash
+    function _findProduct(string memory productId) internal view returns (bool, uint256) {
+        uint256 slot = productIndexById[keccak256(bytes(productId))];
+        if (slot == 0) {
+            return (false, 0);
+        }
+        return (true, slot - 1);
     }
     // Process buyers in batches
     function performMatching() public returns (bool) {
@@ -206,66 +296,111 @@ contract DataPrice {
         emit BatchProcessed(currentBuyerBatch - 1, processedCount);
         return true; // Indicating that there are still more batches that need to be processed
     }
+    // Pair-targeted matching: buyer buyerIndices[i] is evaluated only against candidates[i], a strictly
+    // increasing list of seller indices (typically pre-filtered off chain). Every pair is re-validated on chain
+    // exactly as in performMatching, so leaving out sellers that fail the preconditions does not change the
+    // Matched results, while gas scales with the candidates instead of the whole seller set.
+    // Under FULL verbosity MatchedDetail is emitted for the supplied pairs only; pairs that were not supplied
+    // are neither evaluated nor reported. The batch index used by performMatching is not touched.
+    function performMatchingWithCandidates(uint256[] calldata buyerIndices, uint256[][] calldata candidates) external {
+        require(candidates.length == buyerIndices.length, "Array length mismatch");
+        for (uint256 i = 0; i < buyerIndices.length; i++) {
+            require(buyerIndices[i] < buyers.length, "Buyer not found");
+            _processBuyerCandidates(buyerIndices[i], candidates[i]);
+        }
+    }
     //Single batch processing of buyers
     function _processSingleBuyer(uint256 buyerIndex) internal {
         Buyer storage buyer = buyers[buyerIndex];
-        string memory bestSellerId = "";
         uint256 bestMatchPrice = type(uint256).max;
         uint256 bestSellerIndex = type(uint256).max;
+        bool detailed = eventVerbosity == EventVerbosity.FULL;
         
         // Traverse the sellers
         for (uint256 j = 0; j < sellers.length; j++) {
-            // Check whether the seller has reached the maximum matching limit.
-            if (sellers[j].matchCount >= sellers[j].maxMatchCount) {
-                continue;
+            uint256 matchPrice = _evaluatePair(buyer, j, detailed);
+            // Update the best match
+            if (matchPrice > 0 && matchPrice < bestMatchPrice) {
+                bestMatchPrice = matchPrice;
+                bestSellerIndex = j;
             }
-            (uint256 benchmarkPrice, uint256 qualityFactor) = getProduct(sellers[j].productId);    
-            // Create a context object
-            NegotiationContext memory context = NegotiationContext({
-                benchmarkPrice: benchmarkPrice,
-                qualityFactor: qualityFactor,
-                buyerFirstOffer: 0,
-                adjustedSellerFirstBid: 0,
-                diff: 0,
-                buyerMinProfit: 0,
-                sellerMinProfit: 0,
-                buyerBehavioral: 0,
-                sellerBehavioral: 0
-            });
-            
-            // Calculate the matching results
-            uint256 matchPrice = _calculateMatch(buyer, sellers[j], context);
-            // Record the matching details into the event.
+        }
+        _settleBestMatch(buyer, bestSellerIndex, bestMatchPrice);
+    }
+    // Same as _processSingleBuyer, restricted to the given seller indices
+    function _processBuyerCandidates(uint256 buyerIndex, uint256[] calldata sellerIndices) internal {
+        Buyer storage buyer = buyers[buyerIndex];
+        uint256 bestMatchPrice = type(uint256).max;
+        uint256 bestSellerIndex = type(uint256).max;
+        bool detailed = eventVerbosity == EventVerbosity.FULL;
+
+        for (uint256 k = 0; k < sellerIndices.length; k++) {
+            uint256 j = sellerIndices[k];
+            // Increasing order keeps the tie-break (first seller wins) and rules out duplicates
+            require(j < sellers.length && (k == 0 || j > sellerIndices[k - 1]), "Invalid seller indices");
+            uint256 matchPrice = _evaluatePair(buyer, j, detailed);
+            if (matchPrice > 0 && matchPrice < bestMatchPrice) {
+                bestMatchPrice = matchPrice;
+                bestSellerIndex = j;
+            }
+        }
+        _settleBestMatch(buyer, bestSellerIndex, bestMatchPrice);
+    }
+    // Evaluate one buyer-seller pair; returns 0 for sellers at their match limit and for failed pairs
+    function _evaluatePair(Buyer storage buyer, uint256 sellerIndex, bool detailed) internal returns (uint256 matchPrice) {
+        Seller storage seller = sellers[sellerIndex];
+        // Check whether the seller has reached the maximum matching limit.
+        if (seller.matchCount >= seller.maxMatchCount) {
+            return 0;
+        }
+        // Product index is cached on the seller at registration
+        Product storage product = products[seller.productIndex];
+        // Create a context object
+        NegotiationContext memory context = NegotiationContext({
+            benchmarkPrice: product.benchmarkPrice,
+            qualityFactor: product.qualityFactor,
+            buyerFirstOffer: 0,
+            adjustedSellerFirstBid: 0,
+            diff: 0,
+            buyerMinProfit: 0,
+            sellerMinProfit: 0,
+            buyerBehavioral: 0,
+            sellerBehavioral: 0
+        });
+        
+        // Calculate the matching results
+        matchPrice = _calculateMatch(buyer, seller, context);
+        // Record the matching details into the event.
+        if (detailed) {
             emit MatchedDetail(
                 buyer.id,
-                sellers[j].id,
+                seller.id,
                 context.qualityFactor > buyer.qualityRequest, //qualityPassed
-                buyer.reservePrice > sellers[j].reservePrice,   //  reserveValid
+                buyer.reservePrice > seller.reservePrice,   //  reserveValid
                 //priceRange
-                (matchPrice > sellers[j].reservePrice - sellers[j].reservePrice * sellers[j].lossAversion/50000) 
+                (matchPrice > seller.reservePrice - seller.reservePrice * seller.lossAversion/50000) 
                 && (matchPrice < buyer.reservePrice + buyer.reservePrice * buyer.lossAversion/50000),
                 matchPrice > 0,                              // dealSuccess
                 matchPrice,                                  // dealPrice
-                sellers[j].productId,                        // productId
+                seller.productId,                            // productId
                 context.benchmarkPrice                       // benchmarkPrice
             );
-            
-            // Update the best match
-            if (matchPrice > 0 && matchPrice < bestMatchPrice) {
-                bestMatchPrice = matchPrice;
-                bestSellerId = sellers[j].id;
-                bestSellerIndex = j;
-            }
         }
+    }
+    // Trigger the matching event and update the number of times the seller has been matched.
+    function _settleBestMatch(Buyer storage buyer, uint256 bestSellerIndex, uint256 bestMatchPrice) internal {
+        if (bestMatchPrice == type(uint256).max) {
+            return;
+        }
+        Seller storage best = sellers[bestSellerIndex];
+        bool announce = eventVerbosity != EventVerbosity.OFF;
+        if (announce) {
+            emit Matched(buyer.id, best.id, bestMatchPrice);
+        }
+        best.matchCount++;
         
-        // Trigger the matching event and update the number of times the seller has been matched.
-        if (bestMatchPrice != type(uint256).max) {
-            emit Matched(buyer.id, bestSellerId, bestMatchPrice);
-            sellers[bestSellerIndex].matchCount++;
-            
-            if (sellers[bestSellerIndex].matchCount >= sellers[bestSellerIndex].maxMatchCount) {
-                emit SellerMaxMatchesReached(bestSellerId);
-            }
+        if (announce && best.matchCount >= best.maxMatchCount) {
+            emit SellerMaxMatchesReached(best.id);
         }
     }
     //The internal calculation of the perfomMatching function
@@ -281,6 +416,58 @@ contract DataPrice {
         return _validatePostConditions(candidatePrice, seller.reservePrice, buyer.reservePrice, seller.lossAversion, buyer.lossAversion) ? candidatePrice : 0;
     }
 
+    // Read-only quote: evaluates one pair under the given pricing mode without touching storage,
+    // returning the same fields as MatchedDetail (dealSuccess is dealPrice > 0)
+    function quote(uint _mode, QuoteInput calldata q) external pure returns (
+        uint256 dealPrice,
+        bool qualityPassed,
+        bool reservePriceValid,
+        bool priceRange
+    ) {
+        require(_mode <= uint(PricingMode.NASH), "Invalid mode");
+        // Same checks as addBuyer/addSeller, so a pair that cannot be registered cannot be quoted either
+        require(q.buyerReserve > 0 && q.buyerInitial > 0 && q.sellerReserve > 0 && q.sellerInitial > 0,
+            "Prices must be positive");
+        require(q.benchmarkPrice > 0, "Product not found");
+        // Same first bid as addSeller stores
+        uint256 sellerFirstBid = calculateSellerPrice(q.sellerInitial, q.benchmarkPrice, q.sellerTrust);
+        qualityPassed = q.qualityFactor > q.buyerQualityRequest;
+        reservePriceValid = q.buyerReserve > q.sellerReserve;
+        if (_validatePreConditions(q.qualityFactor, q.buyerQualityRequest, q.sellerReserve, q.buyerReserve)) {
+            uint256 candidatePrice = _candidatePrice(PricingMode(_mode), q, sellerFirstBid);
+            if (_validatePostConditions(candidatePrice, q.sellerReserve, q.buyerReserve, q.sellerLossAversion, q.buyerLossAversion)) {
+                dealPrice = candidatePrice;
+            }
+        }
+        priceRange = (dealPrice > q.sellerReserve - q.sellerReserve * q.sellerLossAversion/50000)
+            && (dealPrice < q.buyerReserve + q.buyerReserve * q.buyerLossAversion/50000);
+    }
+    // Candidate price of one pair under the given mode (mode branching). performMatching (via
+    // _calculateCandidatePrice) and quote() both price through this function, so the two cannot drift apart
+    function _candidatePrice(
+        PricingMode mode,
+        QuoteInput memory q,
+        uint256 sellerFirstBid
+    ) private pure returns (uint256) {
+        if (mode == PricingMode.STATIC) {
+            return q.benchmarkPrice;
+        } else if (mode == PricingMode.NASH) {
+            return (q.sellerReserve + q.buyerReserve) / 2;
+        }
+        uint256 buyerFirstOffer = boundValue(calculateBuyerPrice(q.buyerInitial, q.benchmarkPrice, q.buyerTrust), q.sellerReserve, q.buyerReserve);
+        uint256 sellerBid = boundValue(sellerFirstBid, q.sellerReserve, q.buyerReserve);
+        if (sellerBid <= buyerFirstOffer) {
+            return (sellerBid + buyerFirstOffer) / 2;
+        }
+        uint256 diff = abs(q.buyerReserve, q.sellerReserve);
+        return calculateEquilibriumPrice(
+            buyerFirstOffer,
+            sellerBid,
+            calculateBehavioralCoefficient(q.buyerReserve, buyerFirstOffer, q.buyerLossAversion, diff),
+            calculateBehavioralCoefficient(q.sellerReserve, sellerBid, q.sellerLossAversion, diff)
+        );
+    }
+
     // Auxiliary function: Precondition verification (quality + reserve price)
     function _validatePreConditions(
         uint256 qualityFactor,
@@ -305,31 +492,16 @@ contract DataPrice {
         Seller storage seller,
         NegotiationContext memory context
     ) private view returns (uint256) {
-        if (currentMode == PricingMode.STATIC) {
-            return context.benchmarkPrice;
-        } else if (currentMode == PricingMode.NASH) {
-            return (seller.reservePrice + buyer.reservePrice) / 2;
-        } else if (currentMode == PricingMode.BASELINE) {
-            // Calculate the buyer's initial offer
-            context.buyerFirstOffer = calculateBuyerPrice(buyer.initialPrice, context.benchmarkPrice, buyer.trust);
-            // Boundary protection
-            context.adjustedSellerFirstBid = boundValue(seller.firstBid, seller.reservePrice, buyer.reservePrice);
-            context.buyerFirstOffer = boundValue(context.buyerFirstOffer, seller.reservePrice, buyer.reservePrice);
-            // Boundary scope
-            context.diff = abs(uint256(buyer.reservePrice), uint256(seller.reservePrice));
-            // Direct matching check
-            if (context.adjustedSellerFirstBid <= context.buyerFirstOffer) {
-                return (context.adjustedSellerFirstBid + context.buyerFirstOffer) / 2;
-            }
-            // Calculate the equilibrium price
-            return calculateEquilibriumPrice(
-                context.buyerFirstOffer,
-                context.adjustedSellerFirstBid,
-                calculateBehavioralCoefficient(buyer.reservePrice, context.buyerFirstOffer, buyer.lossAversion, context.diff),
-                calculateBehavioralCoefficient(seller.reservePrice, context.adjustedSellerFirstBid, seller.lossAversion, context.diff)
-            );
-        }
-        return 0;
+        // Only the fields read by _candidatePrice are filled in
+        QuoteInput memory q;
+        q.benchmarkPrice = context.benchmarkPrice;
+        q.buyerReserve = buyer.reservePrice;
+        q.buyerInitial = buyer.initialPrice;
+        q.buyerTrust = buyer.trust;
+        q.buyerLossAversion = buyer.lossAversion;
+        q.sellerReserve = seller.reservePrice;
+        q.sellerLossAversion = seller.lossAversion;
+        return _candidatePrice(currentMode, q, seller.firstBid);
     }
     // Auxiliary function: Postcondition verification (price range + meets threshold)
     function _validatePostConditions(
@@ -0,0 +1,645 @@
+// SPDX-License-Identifier: GPL-3.0
+pragma solidity ^0.8.0;
+// Same transactions, events and matching arithmetic as DataPrice, with packed storage:
+// ids are stored as left-aligned bytes32, prices scaled by 10000 as uint64,
+// trust/lossAversion/quality and the count fields as uint32. All arithmetic is still done in uint256.
+// Ids longer than 32 bytes (UTF-8) revert with "Id longer than 32 bytes"; ContractRunner rejects them
+// before sending. DataPrice keeps string ids and has no such limit.
+// The one ABI difference: getAllSellers returns the packed Seller struct (bytes32 id, uint64/uint32 fields,
+// productIndex instead of the product id string), so its tuple type differs from DataPrice.getAllSellers.
+contract DataPriceCompact {
+    struct Buyer {
+        bytes32 id; // Buyer ID
+        uint64 reservePrice; // Reserve price(P_res)
+        uint64 initialPrice; // Initial quote(p_0)
+        uint32 trust; // Platform trust index(λ_cre)
+        uint32 lossAversion; // Loss aversion index(ρ)
+        uint32 qualityRequest;// Quality acceptance threshold(Q_re)
+    }
+    struct Seller {
+        bytes32 id; // Seller ID
+        // Slot 1: pricing fields read by every evaluated pair
+        uint64 reservePrice; // Reserve price(P_res)
+        uint64 initialPrice; // Initial quote(p_0)
+        uint64 firstBid;
+        uint32 trust; // Platform trust index(λ_cre)
+        uint32 lossAversion; // Loss aversion index(ρ)
+        // Slot 2: matching limit and product reference (the product id is read from products[productIndex])
+        uint32 matchCount;
+        uint32 maxMatchCount;
+        uint32 productIndex; // Cached index of the product in products[]
+    }
+    // Market period enumeration
+    enum MarketPeriod {HIGH_VOLATILITY, SUPPLY_SURPLUS, BALANCE}
+    struct Product {
+        bytes32 productId; // Product ID
+        uint64 benchmarkPrice; // Benchmark price(P_off)
+        uint32 qualityFactor; // Data quality(Q_p)
+        MarketPeriod period;  // Mark market period
+    }
+    // Interactive structure, reduce parameter transmission
+    struct NegotiationContext {
+        uint256 benchmarkPrice;
+        uint256 qualityFactor;
+        uint256 buyerFirstOffer;
+        uint256 adjustedSellerFirstBid; // Adjusted quote(p_1)
+        uint256 diff;
+        uint256 buyerMinProfit;
+        uint256 sellerMinProfit;
+        uint256 buyerBehavioral;
+        uint256 sellerBehavioral;
+    }
+    // Quote input: one buyer-seller pair and its product, passed directly instead of read from storage
+    struct QuoteInput {
+        uint256 benchmarkPrice;
+        uint256 qualityFactor;
+        uint256 buyerReserve;
+        uint256 buyerInitial;
+        uint256 buyerTrust;
+        uint256 buyerLossAversion;
+        uint256 buyerQualityRequest;
+        uint256 sellerReserve;
+        uint256 sellerInitial;
+        uint256 sellerTrust;
+        uint256 sellerLossAversion;
+    }
+    Buyer[] public buyers; // All buyers
+    Seller[] public sellers; // All sellers
+    Product[] public products; // All product
+    // Id indexes keyed by the packed id, storing array index + 1 (0 means not registered)
+    mapping(bytes32 => uint256) private productIndexById;
+    mapping(bytes32 => uint256) private sellerIndexById;
+    // Batch processing of status variables
+    uint256 public currentBuyerBatch = 0;
+    uint256 public batchSize = 1; // The number of buyers processed in each batch can be adjusted as needed.
+    // Pricing model enumeration
+    enum PricingMode { BASELINE, STATIC, NASH }
+    // Event verbosity: OFF emits no per-buyer events, MATCHES emits Matched/SellerMaxMatchesReached,
+    // FULL additionally emits one MatchedDetail diagnostic per evaluated buyer-seller pair
+    enum EventVerbosity { OFF, MATCHES, FULL }
+    // Both enums share one slot
+    PricingMode public currentMode = PricingMode.BASELINE;
+    EventVerbosity public eventVerbosity = EventVerbosity.FULL;
+
+    event BatchProcessed(uint256 batchIndex, uint256 processedCount);
+    event BuyerAdded(string id, uint256 reservePrice, uint256 initialPrice, uint256 trust, uint256 lossAversion, uint256 qualityRequest);
+    event SellerAdded(string id, uint256 reservePrice, uint256 initialPrice, uint256 trust, uint256 lossAversion, string productId, uint256 maxMatchCount);
+    event ProductAdded(string productId, uint256 benchmarkPrice, uint256 qualityFactor);
+    event Matched(string buyerId, string sellerId, uint256 price);
+    event SellerMaxMatchesReached(string sellerId);
+    event MatchedDetail(
+        string indexed buyerId,
+        string indexed sellerId,
+        bool qualityPassed,       // Does the product quality meet the buyer's threshold?
+        bool reservePriceValid,   // Is the buyer's reserve price higher than the seller's?
+        bool priceRange,          // Is the reference price within the acceptable range for the traders?
+        bool dealSuccess,         // Was the match successful?
+        uint256 dealPrice,        // The matching price when the match is successful
+        string productId,         // The matched product ID
+        uint256 benchmarkPrice    //
+    );
+    // Initialization
+    function resetAll() public {
+        // Clear the id indexes before the arrays they point into
+        for (uint256 i = 0; i < products.length; i++) {
+            delete productIndexById[products[i].productId];
+        }
+        for (uint256 i = 0; i < sellers.length; i++) {
+            delete sellerIndexById[sellers[i].id];
+        }
+        delete buyers;
+        delete sellers;
+        delete products;
+    }
+
+    function setPricingMode(uint _mode) external {
+        require(_mode <= uint(PricingMode.NASH), "Invalid mode");
+        currentMode = PricingMode(_mode);
+    }
+
+    function setEventVerbosity(uint _level) external {
+        require(_level <= uint(EventVerbosity.FULL), "Invalid verbosity");
+        eventVerbosity = EventVerbosity(_level);
+    }
+    // Adjust the number of buyers processed per performMatching call
+    function setBatchSize(uint256 _batchSize) external {
+        require(_batchSize > 0, "Batch size must be positive");
+        batchSize = _batchSize;
+    }
+    // Add product data
+    function addProduct(string memory productId, uint256 benchmarkPrice, uint256 qualityFactor,  MarketPeriod period) public {
+        _addProduct(productId, benchmarkPrice, qualityFactor, period);
+    }
+    // Add buyer data
+    function addBuyer(string memory id, uint256 reservePrice, uint256 initialPrice, uint256 trust, uint256 lossAversion, uint256 qualityRequest) public {
+        _addBuyer(id, reservePrice, initialPrice, trust, lossAversion, qualityRequest);
+    }
+    // Add seller data
+    function addSeller(string memory id, uint256 reservePrice, uint256 initialPrice,
+                      uint256 trust, uint256 lossAversion, string memory productId,
+                      uint256 maxMatchCount) public {
+        _addSeller(id, reservePrice, initialPrice, trust, lossAversion, productId, maxMatchCount);
+    }
+    // Bulk registration: parallel arrays, one entry per product
+    function addProducts(string[] memory productIds, uint256[] memory benchmarkPrices,
+                         uint256[] memory qualityFactors, MarketPeriod[] memory periods) public {
+        uint256 count = productIds.length;
+        require(benchmarkPrices.length == count && qualityFactors.length == count && periods.length == count,
+                "Array length mismatch");
+        for (uint256 i = 0; i < count; i++) {
+            _addProduct(productIds[i], benchmarkPrices[i], qualityFactors[i], periods[i]);
+        }
+    }
+    // Bulk registration: parallel arrays, one entry per buyer
+    function addBuyers(string[] memory ids, uint256[] memory reservePrices, uint256[] memory initialPrices,
+                       uint256[] memory trusts, uint256[] memory lossAversions, uint256[] memory qualityRequests) public {
+        uint256 count = ids.length;
+        require(reservePrices.length == count && initialPrices.length == count && trusts.length == count
+                && lossAversions.length == count && qualityRequests.length == count, "Array length mismatch");
+        for (uint256 i = 0; i < count; i++) {
+            _addBuyer(ids[i], reservePrices[i], initialPrices[i], trusts[i], lossAversions[i], qualityRequests[i]);
+        }
+    }
+    // Bulk registration: parallel arrays, one entry per seller
+    function addSellers(string[] memory ids, uint256[] memory reservePrices, uint256[] memory initialPrices,
+                        uint256[] memory trusts, uint256[] memory lossAversions, string[] memory productIds,
+                        uint256[] memory maxMatchCounts) public {
+        require(reservePrices.length == ids.length && initialPrices.length == ids.length
+                && trusts.length == ids.length && lossAversions.length == ids.length
+                && productIds.length == ids.length && maxMatchCounts.length == ids.length, "Array length mismatch");
+        for (uint256 i = 0; i < ids.length; i++) {
+            _addSeller(ids[i], reservePrices[i], initialPrices[i], trusts[i], lossAversions[i], productIds[i], maxMatchCounts[i]);
+        }
+    }
+    // Shared by addProduct/addProducts
+    function _addProduct(string memory productId, uint256 benchmarkPrice, uint256 qualityFactor, MarketPeriod period) internal {
+        // Keep the first registration for duplicate ids, as the linear scan did
+        bytes32 key = _toBytes32(productId);
+        if (productIndexById[key] == 0) {
+            productIndexById[key] = products.length + 1;
+        }
+        products.push(Product({
+            productId: key,
+            benchmarkPrice: _toUint64(benchmarkPrice),
+            qualityFactor: _toUint32(qualityFactor),
+            period: period
+        }));
+        emit ProductAdded(productId, benchmarkPrice, qualityFactor);
+    }
+    // Shared by addBuyer/addBuyers
+    function _addBuyer(string memory id, uint256 reservePrice, uint256 initialPrice, uint256 trust, uint256 lossAversion, uint256 qualityRequest) internal {
+        require(reservePrice > 0 && initialPrice > 0, "Prices must be positive");
+        buyers.push(Buyer({
+            id: _toBytes32(id),
+            reservePrice: _toUint64(reservePrice),
+            initialPrice: _toUint64(initialPrice),
+            trust: _toUint32(trust),
+            lossAversion: _toUint32(lossAversion),
+            qualityRequest: _toUint32(qualityRequest)
+        }));
+        emit BuyerAdded(id, reservePrice, initialPrice, trust, lossAversion, qualityRequest);
+    }
+    // Shared by addSeller/addSellers
+    function _addSeller(string memory id, uint256 reservePrice, uint256 initialPrice,
+                        uint256 trust, uint256 lossAversion, string memory productId,
+                        uint256 maxMatchCount) internal {
+        require(reservePrice > 0 && initialPrice > 0, "Prices must be positive");
+        // Scoped block keeps the extra locals off the stack for the emit below
+        {
+            (bool found, uint256 productIdx) = _findProduct(productId);
+            require(found && products[productIdx].benchmarkPrice > 0, "Product not found");
+            bytes32 key = _toBytes32(id);
+            if (sellerIndexById[key] == 0) {
+                sellerIndexById[key] = sellers.length + 1;
+            }
+            // Fill the new slot field by field instead of building a memory struct
+            Seller storage seller = sellers.push();
+            seller.id = key;
+            seller.reservePrice = _toUint64(reservePrice);
+            seller.initialPrice = _toUint64(initialPrice);
+            seller.firstBid = _toUint64(calculateSellerPrice(initialPrice, products[productIdx].benchmarkPrice, trust));
+            seller.trust = _toUint32(trust);
+            seller.lossAversion = _toUint32(lossAversion);
+            seller.maxMatchCount = _toUint32(maxMatchCount);
+            seller.productIndex = _toUint32(productIdx);
+        }
+        emit SellerAdded(id, reservePrice, initialPrice, trust, lossAversion, productId, maxMatchCount);
+    }
+    // Obtain the number of times the seller was matched
+    function getSellerMatchCount(string memory sellerId) public view returns (uint256) {
+        int256 index = getSellerIndex(sellerId);
+        require(index >= 0, "Seller not found");
+        return sellers[uint256(index)].matchCount;
+    }
+    // Obtain all the information of the sellers
+    function getAllSellers() public view returns (Seller[] memory) {
+        return sellers;
+    }
+    // Obtain the seller index
+    function getSellerIndex(string memory sellerId) internal view returns (int256) {
+        uint256 slot = sellerIndexById[_toBytes32(sellerId)];
+        if (slot == 0) {
+            return -1;
+        }
+        return int256(slot - 1);
+    }
+    // Status reset
+    function resetMatchingState(string memory specificSeller) public {
+        // Reset batch index
+        currentBuyerBatch = 0;
+
+        if(bytes(specificSeller).length == 0) {
+            // Global Reset Mode: Reset all sellers
+            for(uint i = 0; i < sellers.length; i++) {
+                sellers[i].matchCount = 0;
+            }
+        } else {
+            // Specify the seller to reset the mode
+            int256 index = getSellerIndex(specificSeller);
+            if(index >= 0) {
+                sellers[uint256(index)].matchCount = 0;
+            }
+        }
+    }
+    // Look up the product index by packed id
+    function _findProduct(string memory productId) internal view returns (bool, uint256) {
+        uint256 slot = productIndexById[_toBytes32(productId)];
+        if (slot == 0) {
+            return (false, 0);
+        }
+        return (true, slot - 1);
+    }
+    // Pack a string id into a left-aligned bytes32 (ids longer than 32 bytes are rejected)
+    function _toBytes32(string memory id) internal pure returns (bytes32 packed) {
+        bytes memory raw = bytes(id);
+        require(raw.length <= 32, "Id longer than 32 bytes");
+        if (raw.length == 0) {
+            return bytes32(0);
+        }
+        assembly {
+            packed := mload(add(raw, 32))
+        }
+        // Clear whatever follows the id in memory
+        if (raw.length < 32) {
+            packed &= ~bytes32(type(uint256).max >> (raw.length * 8));
+        }
+    }
+    // Unpack a bytes32 id back into the original string for events
+    function _toString(bytes32 packed) internal pure returns (string memory id) {
+        uint256 length = 0;
+        while (length < 32 && packed[length] != 0) {
+            length++;
+        }
+        id = new string(length);
+        if (length > 0) {
+            assembly {
+                mstore(add(id, 32), packed)
+            }
+        }
+    }
+    // Checked narrowing for the packed fields
+    function _toUint64(uint256 value) internal pure returns (uint64) {
+        require(value <= type(uint64).max, "Value exceeds uint64");
+        return uint64(value);
+    }
+    function _toUint32(uint256 value) internal pure returns (uint32) {
+        require(value <= type(uint32).max, "Value exceeds uint32");
+        return uint32(value);
+    }
+    // Process buyers in batches
+    function performMatching() public returns (bool) {
+        uint256 startIndex = currentBuyerBatch * batchSize;
+        uint256 endIndex = (currentBuyerBatch + 1) * batchSize;
+        // Prevent going beyond the array boundaries
+        if (endIndex > buyers.length) {
+            endIndex = buyers.length;
+        }
+        // If there are no batches to process, reset and return.
+        if (startIndex >= endIndex) {
+            currentBuyerBatch = 0;
+            return false; // Indicates processing completion
+        }
+        uint256 processedCount = 0;
+        // One negotiation context reused for every pair in this call instead of allocating one per pair
+        NegotiationContext memory context;
+        // Handle the buyers of the current batch
+        for (uint256 i = startIndex; i < endIndex; i++) {
+            _processSingleBuyer(i, context);
+            processedCount++;
+        }
+        // Update batch index
+        currentBuyerBatch++;
+
+        emit BatchProcessed(currentBuyerBatch - 1, processedCount);
+        return true; // Indicating that there are still more batches that need to be processed
+    }
+    // Pair-targeted matching: buyer buyerIndices[i] is evaluated only against candidates[i], a strictly
+    // increasing list of seller indices (typically pre-filtered off chain). Every pair is re-validated on chain
+    // exactly as in performMatching. Under FULL verbosity MatchedDetail is emitted for the supplied pairs only;
+    // pairs that were not supplied are neither evaluated nor reported. The batch index used by performMatching
+    // is not touched.
+    function performMatchingWithCandidates(uint256[] calldata buyerIndices, uint256[][] calldata candidates) external {
+        require(candidates.length == buyerIndices.length, "Array length mismatch");
+        NegotiationContext memory context;
+        for (uint256 i = 0; i < buyerIndices.length; i++) {
+            require(buyerIndices[i] < buyers.length, "Buyer not found");
+            _processBuyerCandidates(buyerIndices[i], candidates[i], context);
+        }
+    }
+    //Single batch processing of buyers
+    function _processSingleBuyer(uint256 buyerIndex, NegotiationContext memory context) internal {
+        // The packed buyer is two slots; copy it once instead of re-reading fields for every seller
+        Buyer memory buyer = buyers[buyerIndex];
+        uint256 bestMatchPrice = type(uint256).max;
+        uint256 bestSellerIndex = type(uint256).max;
+        // The buyer id is only unpacked when MatchedDetail is emitted
+        string memory detailBuyerId;
+        bool detailed = eventVerbosity == EventVerbosity.FULL;
+        if (detailed) {
+            detailBuyerId = _toString(buyer.id);
+        }
+
+        // Traverse the sellers
+        for (uint256 j = 0; j < sellers.length; j++) {
+            uint256 matchPrice = _evaluatePair(detailBuyerId, buyer, j, detailed, context);
+            // Update the best match
+            if (matchPrice > 0 && matchPrice < bestMatchPrice) {
+                bestMatchPrice = matchPrice;
+                bestSellerIndex = j;
+            }
+        }
+        _settleBestMatch(buyer, bestSellerIndex, bestMatchPrice);
+    }
+    // Same as _processSingleBuyer, restricted to the given seller indices
+    function _processBuyerCandidates(uint256 buyerIndex, uint256[] calldata sellerIndices, NegotiationContext memory context) internal {
+        Buyer memory buyer = buyers[buyerIndex];
+        uint256 bestMatchPrice = type(uint256).max;
+        uint256 bestSellerIndex = type(uint256).max;
+        string memory detailBuyerId;
+        bool detailed = eventVerbosity == EventVerbosity.FULL;
+        if (detailed) {
+            detailBuyerId = _toString(buyer.id);
+        }
+
+        for (uint256 k = 0; k < sellerIndices.length; k++) {
+            uint256 j = sellerIndices[k];
+            // Increasing order keeps the tie-break (first seller wins) and rules out duplicates
+            require(j < sellers.length && (k == 0 || j > sellerIndices[k - 1]), "Invalid seller indices");
+            uint256 matchPrice = _evaluatePair(detailBuyerId, buyer, j, detailed, context);
+            if (matchPrice > 0 && matchPrice < bestMatchPrice) {
+                bestMatchPrice = matchPrice;
+                bestSellerIndex = j;
+            }
+        }
+        _settleBestMatch(buyer, bestSellerIndex, bestMatchPrice);
+    }
+    // Evaluate one buyer-seller pair; returns 0 for sellers at their match limit and for failed pairs
+    function _evaluatePair(
+        string memory detailBuyerId,
+        Buyer memory buyer,
+        uint256 sellerIndex,
+        bool detailed,
+        NegotiationContext memory context
+    ) internal returns (uint256 matchPrice) {
+        Seller storage seller = sellers[sellerIndex];
+        // Check whether the seller has reached the maximum matching limit.
+        if (seller.matchCount >= seller.maxMatchCount) {
+            return 0;
+        }
+        // Product index is cached on the seller at registration
+        {
+            Product storage product = products[seller.productIndex];
+            context.benchmarkPrice = product.benchmarkPrice;
+            context.qualityFactor = product.qualityFactor;
+        }
+
+        // Calculate the matching results
+        matchPrice = _calculateMatch(buyer, seller, context);
+        // Record the matching details into the event.
+        if (detailed) {
+            _emitMatchedDetail(detailBuyerId, buyer, seller, matchPrice, context);
+        }
+    }
+    // Trigger the matching event and update the number of times the seller has been matched.
+    function _settleBestMatch(Buyer memory buyer, uint256 bestSellerIndex, uint256 bestMatchPrice) internal {
+        if (bestMatchPrice == type(uint256).max) {
+            return;
+        }
+        Seller storage best = sellers[bestSellerIndex];
+        best.matchCount++;
+        if (eventVerbosity != EventVerbosity.OFF) {
+            string memory bestSellerId = _toString(best.id);
+            emit Matched(_toString(buyer.id), bestSellerId, bestMatchPrice);
+            if (best.matchCount >= best.maxMatchCount) {
+                emit SellerMaxMatchesReached(bestSellerId);
+            }
+        }
+    }
+    // MatchedDetail for one evaluated pair, same fields as DataPrice.
+    // The ids are converted and the range check is done in _inPriceRange before/while emitting, so only the
+    // five parameters and two locals are live during the emit - fewer than the per-seller loop of the
+    // original DataPrice.performMatching, which emitted the same event without hitting "stack too deep".
+    function _emitMatchedDetail(
+        string memory buyerId,
+        Buyer memory buyer,
+        Seller storage seller,
+        uint256 matchPrice,
+        NegotiationContext memory context
+    ) private {
+        string memory sellerId = _toString(seller.id);
+        string memory productId = _toString(products[seller.productIndex].productId);
+        emit MatchedDetail(
+            buyerId,
+            sellerId,
+            context.qualityFactor > buyer.qualityRequest,                       //qualityPassed
+            buyer.reservePrice > seller.reservePrice,                           //  reserveValid
+            _inPriceRange(matchPrice, buyer, seller),                           //priceRange
+            matchPrice > 0,                                                     // dealSuccess
+            matchPrice,                                                         // dealPrice
+            productId,                                                          // productId
+            context.benchmarkPrice                                              // benchmarkPrice
+        );
+    }
+    // priceRange field of MatchedDetail
+    function _inPriceRange(uint256 matchPrice, Buyer memory buyer, Seller storage seller) private view returns (bool) {
+        uint256 sellerReserve = seller.reservePrice;
+        uint256 buyerReserve = buyer.reservePrice;
+        return (matchPrice > sellerReserve - sellerReserve * seller.lossAversion/50000)
+            && (matchPrice < buyerReserve + buyerReserve * buyer.lossAversion/50000);
+    }
+    //The internal calculation of the perfomMatching function
+    // Verification Phase
+    function _calculateMatch(Buyer memory buyer, Seller storage seller, NegotiationContext memory context) internal view returns (uint256) {
+        uint256 sellerReserve = seller.reservePrice;
+        // Quality verification and reserve price verification
+        if (!_validatePreConditions(context.qualityFactor, buyer.qualityRequest, sellerReserve, buyer.reservePrice)) {
+            return 0; // Early termination
+        }
+        // Mode branching calculation of candidate prices
+        uint256 candidatePrice = _calculateCandidatePrice(buyer, seller, context);
+        // Price range and satisfaction threshold verification
+        return _validatePostConditions(candidatePrice, sellerReserve, buyer.reservePrice, seller.lossAversion, buyer.lossAversion) ? candidatePrice : 0;
+    }
+
+    // Read-only quote: evaluates one pair under the given pricing mode without touching storage,
+    // returning the same fields as MatchedDetail (dealSuccess is dealPrice > 0)
+    function quote(uint _mode, QuoteInput calldata q) external pure returns (
+        uint256 dealPrice,
+        bool qualityPassed,
+        bool reservePriceValid,
+        bool priceRange
+    ) {
+        require(_mode <= uint(PricingMode.NASH), "Invalid mode");
+        // Same checks as addBuyer/addSeller, so a pair that cannot be registered cannot be quoted either
+        require(q.buyerReserve > 0 && q.buyerInitial > 0 && q.sellerReserve > 0 && q.sellerInitial > 0,
+            "Prices must be positive");
+        require(q.benchmarkPrice > 0, "Product not found");
+        // Same first bid as addSeller stores
+        uint256 sellerFirstBid = calculateSellerPrice(q.sellerInitial, q.benchmarkPrice, q.sellerTrust);
+        qualityPassed = q.qualityFactor > q.buyerQualityRequest;
+        reservePriceValid = q.buyerReserve > q.sellerReserve;
+        if (_validatePreConditions(q.qualityFactor, q.buyerQualityRequest, q.sellerReserve, q.buyerReserve)) {
+            uint256 candidatePrice = _candidatePrice(PricingMode(_mode), q, sellerFirstBid);
+            if (_validatePostConditions(candidatePrice, q.sellerReserve, q.buyerReserve, q.sellerLossAversion, q.buyerLossAversion)) {
+                dealPrice = candidatePrice;
+            }
+        }
+        priceRange = (dealPrice > q.sellerReserve - q.sellerReserve * q.sellerLossAversion/50000)
+            && (dealPrice < q.buyerReserve + q.buyerReserve * q.buyerLossAversion/50000);
+    }
+    // Candidate price of one pair under the given mode (mode branching). performMatching (via
+    // _calculateCandidatePrice) and quote() both price through this function, so the two cannot drift apart
+    function _candidatePrice(
+        PricingMode mode,
+        QuoteInput memory q,
+        uint256 sellerFirstBid
+    ) private pure returns (uint256) {
+        if (mode == PricingMode.STATIC) {
+            return q.benchmarkPrice;
+        } else if (mode == PricingMode.NASH) {
+            return (q.sellerReserve + q.buyerReserve) / 2;
+        }
+        uint256 buyerFirstOffer = boundValue(calculateBuyerPrice(q.buyerInitial, q.benchmarkPrice, q.buyerTrust), q.sellerReserve, q.buyerReserve);
+        uint256 sellerBid = boundValue(sellerFirstBid, q.sellerReserve, q.buyerReserve);
+        if (sellerBid <= buyerFirstOffer) {
+            return (sellerBid + buyerFirstOffer) / 2;
+        }
+        uint256 diff = abs(q.buyerReserve, q.sellerReserve);
+        return calculateEquilibriumPrice(
+            buyerFirstOffer,
+            sellerBid,
+            calculateBehavioralCoefficient(q.buyerReserve, buyerFirstOffer, q.buyerLossAversion, diff),
+            calculateBehavioralCoefficient(q.sellerReserve, sellerBid, q.sellerLossAversion, diff)
+        );
+    }
+
+    // Auxiliary function: Precondition verification (quality + reserve price)
+    function _validatePreConditions(
+        uint256 qualityFactor,
+        uint256 buyerQualityReq,
+        uint256 sellerReserve,
+        uint256 buyerReserve
+    ) private pure returns (bool) {
+        // Quality verification (Q_p > Q_re)
+        if (qualityFactor <= buyerQualityReq) {
+            return false;
+        }
+        // Verification of reserve price (P_res^b > P_res^s)
+        if (buyerReserve <= sellerReserve) {
+            return false;
+        }
+        return true;
+    }
+
+    // Auxiliary function: Candidate price calculation (mode branching)
+    function _calculateCandidatePrice(
+        Buyer memory buyer,
+        Seller storage seller,
+        NegotiationContext memory context
+    ) private view returns (uint256) {
+        // Only the fields read by _candidatePrice are filled in
+        QuoteInput memory q;
+        q.benchmarkPrice = context.benchmarkPrice;
+        q.buyerReserve = buyer.reservePrice;
+        q.buyerInitial = buyer.initialPrice;
+        q.buyerTrust = buyer.trust;
+        q.buyerLossAversion = buyer.lossAversion;
+        q.sellerReserve = seller.reservePrice;
+        q.sellerLossAversion = seller.lossAversion;
+        return _candidatePrice(currentMode, q, seller.firstBid);
+    }
+    // Auxiliary function: Postcondition verification (price range + meets threshold)
+    function _validatePostConditions(
+        uint256 candidatePrice,
+        uint256 sellerReserve,
+        uint256 buyerReserve,
+        uint256 sellerlossAversion,
+        uint256 buyerlossAversion
+    ) private pure returns (bool) {
+        // Price range verification
+        if (candidatePrice <= sellerReserve - sellerReserve* sellerlossAversion/50000 || candidatePrice >= buyerReserve + buyerReserve* buyerlossAversion/50000) {
+            return false;
+        }
+        return true;
+    }
+    // Auxiliary function: Boundary protection
+    function boundValue(
+        uint256 value,
+        uint256 minBound,
+        uint256 maxBound
+    ) private pure returns (uint256) {
+        if (value < minBound) return minBound + (maxBound - minBound)/10;
+        if (value > maxBound) return maxBound - (maxBound - minBound)/10;
+        return value;
+    }
+    // Auxiliary: Calculate the buyer's offer price
+    function calculateBuyerPrice(uint256 initialPrice, uint256 benchmarkPrice, uint256 trust) internal pure returns (uint256) {
+        if (benchmarkPrice >= initialPrice) {
+            return initialPrice + (trust * (benchmarkPrice - initialPrice)) / 10000;
+        } else {
+            return initialPrice - (trust * (initialPrice - benchmarkPrice)) / 10000;
+        }
+    }
+    // Auxiliary: Calculate the seller's bid
+    function calculateSellerPrice(uint256 initialPrice, uint256 benchmarkPrice, uint256 trust) internal pure returns (uint256) {
+        if (benchmarkPrice >= initialPrice) {
+            return initialPrice + (trust * (benchmarkPrice - initialPrice)) / 10000;
+        } else {
+            return initialPrice - (trust * (initialPrice - benchmarkPrice)) / 10000;
+        }
+    }
+    // Auxiliary: Calculate Behavioral Adjustment Factor
+    function calculateBehavioralCoefficient(uint256 reservePrice, uint256 firstPrice, uint256 lossAversion, uint256 diff) internal pure returns (uint256) {
+        uint256 priceDiff = abs(uint256(reservePrice), uint256(firstPrice));
+        uint256 denominator = priceDiff + diff;
+        if (denominator == 0) {
+            return 1; // Extremely un-deviated situation
+        }
+        return lossAversion * diff / denominator;
+    }
+    // Auxiliary: Calculate the equilibrium price
+    function calculateEquilibriumPrice(uint256 buyerFirstOffer, uint256 sellerFirstBid, uint256 buyerBehavioral, uint256 sellerBehavioral) internal pure returns (uint256) {
+        // Auxiliary: Add minimum coefficient protection
+        if (buyerBehavioral < 1) buyerBehavioral = 1; // 1% minimum value
+        if (sellerBehavioral < 1) sellerBehavioral = 1;
+
+        uint256 priceDiff = sellerFirstBid - buyerFirstOffer;
+        uint256 numerator = priceDiff * (10000 - buyerBehavioral) * 10000;
+        uint256 denominator = 100000000 - (buyerBehavioral * sellerBehavioral);
+        if (denominator <= 0) {
+            return 1;
+            }
+        uint256 adjustment = numerator / denominator;
+        return buyerFirstOffer + adjustment;
+    }
+    // Auxiliary: Calculate the absolute value
+    function abs(uint256 a, uint256 b) internal pure returns (uint256) {
+        if (a >= b){
+            return uint256(a - b);
+        }
+        else {
+            return uint256(b - a);
+        }
+    }
+
+}
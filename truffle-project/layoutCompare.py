@@ -0,0 +1,111 @@
+"""存储布局gas对比：DataPrice（uint256/string字段）与 DataPriceCompact（bytes32 id + uint64/uint32紧凑字段）在相同种子输入下的逐函数gas"""
+import os
+import time
+
+import pandas as pd
+
+from benchDataPrice import compare_artifacts
+from phaseTimer import PhaseTimer
+from web3DataPrice import ContractRunner, TEST_SCENARIOS, run_counts, build_test_cells, sample_cell
+
+# 对比的合约函数（单个实验单元依次调用）
+FUNCTIONS = ("addProduct", "addSeller", "addBuyer", "performMatching")
+
+
+def cell_inputs(test_id, repeat_idx, mode, scenario):
+    """
+    由 sample_cell 按与 run_matching 相同的种子与抽样顺序生成单个实验单元，
+    返回 (addProduct, addSeller, addBuyer) 的合约参数
+    """
+    return ContractRunner._cell_args(sample_cell(test_id, repeat_idx, mode, scenario, PhaseTimer()))
+
+
+def cell_gas(runner, test_id, repeat_idx, mode, scenario):
+    """在干净状态下逐笔发送单元的四个交易，返回各函数的gasUsed与成交价（未成交为None）"""
+    if not runner.isolate():
+        raise RuntimeError("合约状态重置失败")
+    runner.set_mode(mode)
+    fns = runner.contract.functions
+    product, seller, buyer = cell_inputs(test_id, repeat_idx, mode, scenario)
+    receipts = {
+        "addProduct": runner._send_transaction(fns.addProduct, *product),
+        "addSeller": runner._send_transaction(fns.addSeller, *seller),
+        "addBuyer": runner._send_transaction(fns.addBuyer, *buyer),
+        "performMatching": runner._send_transaction(fns.performMatching),
+    }
+    matched = runner.events.matched(receipts["performMatching"])
+    row = {f"{name}_gas": receipt["gasUsed"] for name, receipt in receipts.items()}
+    row["price"] = matched[0]["price"] if matched else None
+    return row
+
+
+def compare_layouts(artifacts, cells, event_verbosity="FULL"):
+    """
+    artifacts 为 {标签: 编译产物路径}，每个产物在独立的进程内链上部署，对同一组实验单元逐函数记录gas。
+    返回明细表（每个 (标签, 单元) 一行）
+    """
+    missing = [path for path in artifacts.values() if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"缺少编译产物 {missing}，请先执行 truffle compile")
+    rows = []
+    for label, artifact_path in artifacts.items():
+        runner = ContractRunner(None, artifact_path, None, pipelined=True, isolation="snapshot",
+                                backend="eth-tester", event_verbosity=event_verbosity)
+        for test_id, repeat_idx, mode, scenario in cells:
+            row = {"label": label, "test_id": test_id, "mode": mode, "repeat_idx": repeat_idx}
+            try:
+                row.update(cell_gas(runner, test_id, repeat_idx, mode, scenario))
+            except Exception as e:
+                row["error"] = str(e)
+            rows.append(row)
+        print(f"[layout] {label}: {len(cells)}个实验单元完成")
+    return pd.DataFrame(rows)
+
+
+def summarize(detail, baseline):
+    """各函数平均gas（列为标签），以及相对 baseline 标签的节省比例；同时统计各布局成交价不一致的单元数"""
+    ok = detail[detail["error"].fillna("") == ""] if "error" in detail else detail
+    gas = ok.groupby("label")[[f"{name}_gas" for name in FUNCTIONS]].mean().T
+    gas.index = list(FUNCTIONS)
+    for label in gas.columns:
+        if label != baseline:
+            gas[f"{label}_saving"] = 1 - gas[label] / gas[baseline]
+    prices = ok.pivot_table(index=["test_id", "mode", "repeat_idx"], columns="label", values="price", aggfunc="first")
+    mismatches = int((prices.nunique(axis=1, dropna=False) > 1).sum()) if prices.shape[1] > 1 else 0
+    return gas, mismatches
+
+
+def run_layout_comparison(artifacts, test_scenarios, counts, sizes=(), batch_sizes=(1,), event_verbosity="FULL",
+                          output_dir="output"):
+    """
+    单元级对比写出 layout_gas_<时间戳>.csv（明细）与 layout_gas_summary_<时间戳>.csv（逐函数均值与节省比例）；
+    sizes 非空时另以 benchDataPrice.compare_artifacts 对比 N×M×P 规模下的撮合gas
+    """
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    baseline = next(iter(artifacts))
+    detail = compare_layouts(artifacts, build_test_cells(test_scenarios, counts), event_verbosity)
+    detail.to_csv(os.path.join(output_dir, f"layout_gas_{timestamp}.csv"), index=False)
+    gas, mismatches = summarize(detail, baseline)
+    summary_file = os.path.join(output_dir, f"layout_gas_summary_{timestamp}.csv")
+    gas.to_csv(summary_file, index_label="function")
+    print(f"\n逐函数平均gas（基准: {baseline}）:")
+    print(gas.round(3))
+    print(f"成交价不一致的单元: {mismatches}")
+    print(f"存储布局对比结果保存至: {summary_file}")
+    if sizes:
+        compare_artifacts(artifacts, sizes, batch_sizes, output_dir=output_dir)
+    return gas
+
+
+if __name__ == "__main__":
+    # 第一个为基准布局
+    ARTIFACTS = {
+        "DataPrice": os.path.join('build', 'contracts', 'DataPrice.json'),
+        "DataPriceCompact": os.path.join('build', 'contracts', 'DataPriceCompact.json'),
+    }
+    EVENT_VERBOSITY = "FULL"  # 两个布局使用相同的事件级别
+    # 规模对比 (买家数N, 卖家数M, 产品数P)，为空则只做单元级对比
+    SIZES = [(10, 10, 5), (40, 40, 20)]
+    BATCH_SIZES = [1, 10]
+
+    run_layout_comparison(ARTIFACTS, TEST_SCENARIOS, run_counts, SIZES, BATCH_SIZES, EVENT_VERBOSITY)
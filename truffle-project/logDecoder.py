@@ -0,0 +1,74 @@
+"""匹配结果事件的快速解码：按合约地址与topic0预过滤日志，直接按32字节字切分data，跳过web3的逐事件ABI解码"""
+from web3 import Web3
+
+WORD = 32
+
+
+def event_topic(contract, event_name):
+    """根据ABI计算事件签名的topic0"""
+    for entry in contract.abi:
+        if entry.get("type") == "event" and entry["name"] == event_name:
+            signature = f"{event_name}({','.join(i['type'] for i in entry['inputs'])})"
+            return Web3.keccak(text=signature)
+    raise KeyError(f"ABI中不存在事件: {event_name}")
+
+
+def _word(data, index):
+    """读取data中第index个32字节字（uint256/bool/偏移量）"""
+    return int.from_bytes(data[index * WORD:(index + 1) * WORD], "big")
+
+
+def _string(data, index):
+    """读取第index个字处偏移量指向的动态string"""
+    offset = _word(data, index)
+    length = int.from_bytes(data[offset:offset + WORD], "big")
+    return bytes(data[offset + WORD:offset + WORD + length]).decode("utf-8", errors="replace")
+
+
+class EventDecoder:
+    """DataPrice 事件解码器：topic0 在构造时一次性计算，每个收据只做字节切分"""
+
+    EVENTS = ("Matched", "MatchedDetail", "BatchProcessed", "SellerMaxMatchesReached")
+
+    def __init__(self, contract):
+        self.address = contract.address.lower()
+        self.topics = {name: bytes(event_topic(contract, name)) for name in self.EVENTS}
+
+    def logs(self, receipt, event_name):
+        """本合约发出的指定事件日志"""
+        topic = self.topics[event_name]
+        return [
+            log for log in receipt["logs"]
+            if log["topics"] and bytes(log["topics"][0]) == topic and log["address"].lower() == self.address
+        ]
+
+    def count(self, receipt, event_name):
+        """统计收据中指定事件的数量（不解码data）"""
+        return len(self.logs(receipt, event_name))
+
+    def matched(self, receipt):
+        """Matched(string buyerId, string sellerId, uint256 price)"""
+        decoded = []
+        for log in self.logs(receipt, "Matched"):
+            data = bytes(log["data"])
+            decoded.append({"buyerId": _string(data, 0), "sellerId": _string(data, 1), "price": _word(data, 2)})
+        return decoded
+
+    def matched_detail(self, receipt):
+        """
+        MatchedDetail：buyerId/sellerId 为indexed string，日志中只保留其keccak哈希（取自topics[1]/topics[2]）；
+        data 依次为 4个bool、dealPrice、productId偏移量、benchmarkPrice，只解码结果处理用到的前5个字
+        """
+        decoded = []
+        for log in self.logs(receipt, "MatchedDetail"):
+            data = bytes(log["data"])
+            decoded.append({
+                "buyerId": Web3.to_hex(log["topics"][1]),
+                "sellerId": Web3.to_hex(log["topics"][2]),
+                "qualityPassed": bool(_word(data, 0)),
+                "reservePriceValid": bool(_word(data, 1)),
+                "priceRange": bool(_word(data, 2)),
+                "dealSuccess": bool(_word(data, 3)),
+                "dealPrice": _word(data, 4),
+            })
+        return decoded
@@ -0,0 +1,185 @@
+"""市场规模仿真：按 TEST_SCENARIOS 向合约写入买卖家群体，循环 performMatching 直到全部买家处理完毕，统计吞吐、每轮gas与卖家饱和度"""
+import json
+import os
+import time
+
+import pandas as pd
+
+from artifactCache import load_artifact
+from benchDataPrice import generate_market, populate_market
+from candidateIndex import CandidateIndex, clear_with_candidates
+from web3DataPrice import ContractRunner, TEST_SCENARIOS, cell_seed, run_counts
+
+# 明细字段（CSV列顺序）
+MARKET_FIELDS = [
+    "test_id", "repeat_idx", "mode", "scenario", "n_buyers", "m_sellers", "p_products", "batch_size",
+    "max_match_count", "setup_gas", "rounds", "matching_gas", "gas_per_round", "max_round_gas",
+    "matches", "success_rate", "clearing_time", "matches_per_sec", "avg_price",
+    "saturated_sellers", "saturation_rate", "prefilter", "candidate_pairs", "error",
+]
+# 撮合方式：None 全量 performMatching；"preconditions" 只剪除不满足前置条件的买卖对；"engine" 再剪除链下引擎判定必然失败的买卖对
+PREFILTERS = (None, "preconditions", "engine")
+
+
+def clear_market(runner, gas_limit):
+    """
+    循环调用 performMatching 直到其返回 false（不再触发 BatchProcessed）。
+    返回每一轮的 {gas, latency, prices, saturated}，以及回滚时的错误信息
+    """
+    fns = runner.contract.functions
+    events = runner.events
+    rounds = []
+    while True:
+        start = time.perf_counter()
+        try:
+            receipt = runner._send_transaction(fns.performMatching, gas=gas_limit)
+        except Exception as e:
+            return rounds, str(e)
+        latency = time.perf_counter() - start
+        if receipt["status"] != 1:
+            return rounds, "performMatching reverted"
+        if events.count(receipt, "BatchProcessed") == 0:
+            # 返回false的收尾调用：重置批次索引，不计入撮合轮次
+            return rounds, ""
+        rounds.append({
+            "gas": receipt["gasUsed"],
+            "latency": latency,
+            "prices": [event["price"] for event in events.matched(receipt)],
+            "saturated": events.count(receipt, "SellerMaxMatchesReached"),
+        })
+
+
+def run_market(runner, test_id, repeat_idx, mode, scenario, n_buyers, m_sellers, p_products=1,
+               batch_size=10, max_match_count=5, prefilter=None):
+    """
+    单个实验单元的市场仿真：写入 N个买家 × M个卖家 × P个产品 后撮合至结束，返回一行结果。
+    prefilter 非空时用 CandidateIndex 剪枝后经 performMatchingWithCandidates 定向撮合（见 PREFILTERS）
+    """
+    if prefilter not in PREFILTERS:
+        raise ValueError(f"未知的撮合方式: {prefilter}")
+    row = {
+        "test_id": test_id, "repeat_idx": repeat_idx, "mode": mode, "scenario": json.dumps(scenario),
+        "n_buyers": n_buyers, "m_sellers": m_sellers, "p_products": p_products,
+        "batch_size": batch_size, "max_match_count": max_match_count, "prefilter": prefilter or "",
+    }
+    if runner.event_verbosity == "OFF":
+        return dict(row, error="市场模式依赖 Matched 事件统计成交，事件级别需为 MATCHES 或 FULL")
+    try:
+        if not runner.isolate():
+            raise RuntimeError("合约状态重置失败")
+        runner.set_batch_size(batch_size)
+        runner.set_mode(mode)
+        market = generate_market(n_buyers, m_sellers, p_products, scenario,
+                                 seed=cell_seed(test_id, mode, repeat_idx, scenario), max_match_count=max_match_count)
+        setup = populate_market(runner, n_buyers, m_sellers, p_products, scenario, market=market)
+        block_gas_limit = runner.w3.eth.get_block("latest")["gasLimit"]
+        if prefilter:
+            index = CandidateIndex.from_market(market)
+            rounds, error = clear_with_candidates(runner, index, market["buyers"],
+                                                  mode if prefilter == "engine" else None, batch_size, block_gas_limit)
+        else:
+            rounds, error = clear_market(runner, block_gas_limit)
+    except Exception as e:
+        return dict(row, error=str(e))
+
+    prices = [price for r in rounds for price in r["prices"]]
+    matching_gas = sum(r["gas"] for r in rounds)
+    clearing_time = sum(r["latency"] for r in rounds)
+    saturated = sum(r["saturated"] for r in rounds)
+    row.update({
+        "setup_gas": setup["addProduct"] * p_products + setup["addSeller"] * m_sellers + setup["addBuyer"] * n_buyers,
+        "rounds": len(rounds),
+        "matching_gas": matching_gas,
+        "gas_per_round": matching_gas / len(rounds) if rounds else None,
+        "max_round_gas": max((r["gas"] for r in rounds), default=None),
+        "matches": len(prices),
+        "success_rate": len(prices) / n_buyers if n_buyers else None,
+        "clearing_time": clearing_time,
+        "matches_per_sec": len(prices) / clearing_time if clearing_time else None,
+        "avg_price": sum(prices) / len(prices) / 10000 if prices else None,
+        "saturated_sellers": saturated,
+        "saturation_rate": saturated / m_sellers if m_sellers else None,
+        # 定向撮合时链上实际评估的买卖对数（全量撮合为 N×M，不单独统计）
+        "candidate_pairs": sum(r["pairs"] for r in rounds) if prefilter else None,
+        "error": error,
+    })
+    print(f"Market {test_id}-{mode}-{repeat_idx}: {len(rounds)}轮, 成交{len(prices)}/{n_buyers}, "
+          f"饱和卖家{saturated}/{m_sellers} {error}")
+    return row
+
+
+def save_market_results(rows, output_dir="output", timestamp=None):
+    """保存市场仿真明细，并按场景与定价模式聚合成功率、吞吐、每轮gas与卖家饱和率"""
+    df = pd.DataFrame(rows, columns=MARKET_FIELDS)
+    timestamp = timestamp or time.strftime("%Y%m%d-%H%M%S")
+    results_file = os.path.join(output_dir, f"market_results_{timestamp}.csv")
+    df.to_csv(results_file, index=False)
+
+    ok = df[df["error"].fillna("") == ""]
+    if ok.empty:
+        print("市场仿真完成，但未收集到有效结果")
+        return df
+    stats = ok.groupby(["test_id", "mode", "prefilter"]).agg({
+        "success_rate": ["mean", "count"],
+        "matches_per_sec": "mean",
+        "matching_gas": "mean",
+        "gas_per_round": "mean",
+        "rounds": "mean",
+        "saturation_rate": "mean",
+    }).reset_index()
+    stats.columns = [
+        '场景ID',
+        '定价模式',
+        '撮合方式',
+        '平均成功率',
+        '测试次数',
+        '平均撮合吞吐(次/秒)',
+        '平均撮合总Gas',
+        '平均每轮Gas',
+        '平均撮合轮数',
+        '平均卖家饱和率',
+    ]
+    stats_file = os.path.join(output_dir, f"market_performance_{timestamp}.csv")
+    stats.to_csv(stats_file, index=False)
+    print(f"\n市场仿真报告保存至: {stats_file}")
+    print(stats.round(3))
+    return df
+
+
+def run_market_experiment(runner, test_scenarios, counts, n_buyers, m_sellers, p_products=1, batch_size=10,
+                          max_match_count=5, output_dir="output", prefilters=(None,)):
+    """按实验矩阵逐单元执行市场仿真并保存结果；prefilters 中的每种撮合方式对同一单元各运行一次"""
+    rows = [
+        run_market(runner, test_id, i, mode, scenario, n_buyers, m_sellers, p_products, batch_size, max_match_count,
+                   prefilter)
+        for test_id, scenario in test_scenarios.items()
+        for mode, count in counts.items()
+        for i in range(count)
+        for prefilter in prefilters
+    ]
+    return save_market_results(rows, output_dir)
+
+
+if __name__ == "__main__":
+    ABI_PATH = os.path.join('build', 'contracts', 'DataPrice.json')
+    GANACHE_URL = "http://127.0.0.1:7545"
+    BACKEND = "eth-tester"  # ganache | eth-tester
+    CONTRACT_ADDRESS = None  # ganache 后端时填写合约地址，None 表示自动部署
+    # 市场规模：买家数N、卖家数M、产品数P
+    N_BUYERS, M_SELLERS, P_PRODUCTS = 50, 20, 5
+    BATCH_SIZE = 10  # 每轮 performMatching 处理的买家数（≠1 时需要包含 setBatchSize 的编译产物）
+    MAX_MATCH_COUNT = 5  # 每个卖家的最大成交次数 N_limit
+    # 撮合方式（见 PREFILTERS）；定向撮合需要包含 performMatchingWithCandidates 的编译产物
+    PREFILTERS_RUN = (None,)
+    # 市场模式只需要 Matched 事件；不含 setEventVerbosity 的编译产物只能使用 FULL
+    EVENT_VERBOSITY = "MATCHES"
+
+    if EVENT_VERBOSITY != "FULL" and not any(
+            entry.get("name") == "setEventVerbosity" for entry in load_artifact(ABI_PATH)["abi"]):
+        print(f"警告: 当前ABI缺少setEventVerbosity，事件级别由 {EVENT_VERBOSITY} 改为 FULL（撮合gas包含逐对 MatchedDetail）；"
+              f"请先执行 truffle compile 更新 {ABI_PATH}")
+        EVENT_VERBOSITY = "FULL"
+    runner = ContractRunner(CONTRACT_ADDRESS, ABI_PATH, GANACHE_URL, pipelined=True,
+                            isolation="snapshot", backend=BACKEND, event_verbosity=EVENT_VERBOSITY)
+    run_market_experiment(runner, TEST_SCENARIOS, run_counts, N_BUYERS, M_SELLERS, P_PRODUCTS,
+                          BATCH_SIZE, MAX_MATCH_COUNT, prefilters=PREFILTERS_RUN)
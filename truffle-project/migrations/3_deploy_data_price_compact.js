@@ -0,0 +1,5 @@
+const DataPriceCompact = artifacts.require("DataPriceCompact");
+
+module.exports = function (deployer) {
+    deployer.deploy(DataPriceCompact);
+};
@@ -0,0 +1,72 @@
+"""并行实验运行器：每个worker独立部署DataPrice并使用独立解锁账户，结果合并后沿用原有CSV输出"""
+from concurrent.futures import ProcessPoolExecutor
+
+from web3 import Web3, HTTPProvider
+
+from web3DataPrice import ContractRunner, deploy_contract
+
+
+def _run_shard(shard, account, abi_path, ganache_url, pipelined, backend, isolation, event_verbosity, writer, cache):
+    """
+    worker进程：部署专属合约后顺序执行分配到的测试。
+    返回 ([(cell序号, 结果)], 分阶段计时器)，结果已写入分片文件时为None
+    """
+    if backend == "ganache":
+        w3 = Web3(HTTPProvider(ganache_url))
+        contract_address = deploy_contract(w3, abi_path, account)
+    else:
+        # 进程内链由 ContractRunner 自行创建并部署
+        contract_address = None
+    runner = ContractRunner(contract_address, abi_path, ganache_url, pipelined=pipelined, account=account,
+                            isolation=isolation, backend=backend, event_verbosity=event_verbosity, writer=writer,
+                            cache=cache)
+    print(f"Worker {runner.account} 部署合约: {runner.contract.address}，分配{len(shard)}组测试")
+    collected = []
+    for index, (test_id, repeat_idx, mode, scenario) in shard:
+        result = runner.run_matching(test_id, repeat_idx, mode, scenario)
+        collected.append((index, None if writer else result))
+    if writer:
+        writer.close()
+    return collected, runner.timer
+
+
+def run_parallel(cells, abi_path, ganache_url, workers=4, pipelined=False, first_account=3,
+                 backend="ganache", isolation="reset", event_verbosity="FULL", writer=None,
+                 cache=None, timer=None):
+    """
+    并行执行实验矩阵。
+    cells 为 build_test_cells 生成的 [(test_id, repeat_idx, mode, scenario)]；
+    ganache 后端下 worker k 使用 accounts[first_account + k]，各自的合约互不共享buyers/sellers数组。
+    evm_revert 会回滚整条链（包括其他worker的交易），因此共享节点时worker固定使用重置交易隔离；
+    eth-tester 后端每个worker拥有独立的进程内链，可使用快照隔离。
+    指定 writer 时 worker k 将结果逐条写入 writer.shard(k)，返回列表中对应位置为None；
+    指定 timer 时合并各worker的分阶段耗时样本。
+    返回与cells顺序一致的结果列表。
+    """
+    if not cells:
+        return []
+    workers = min(workers, len(cells))
+    if backend == "ganache":
+        accounts = Web3(HTTPProvider(ganache_url)).eth.accounts[first_account:]
+        if workers > len(accounts):
+            raise ValueError(f"可用解锁账户不足: 需要{workers}个，仅有{len(accounts)}个")
+        isolation = "reset"
+    else:
+        accounts = [None] * workers
+
+    indexed = list(enumerate(cells))
+    shards = [indexed[k::workers] for k in range(workers)]
+    results = [None] * len(cells)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_run_shard, shard, accounts[k], abi_path, ganache_url, pipelined, backend, isolation,
+                        event_verbosity, writer and writer.shard(k), cache)
+            for k, shard in enumerate(shards)
+        ]
+        for future in futures:
+            collected, worker_timer = future.result()
+            for index, result in collected:
+                results[index] = result
+            if timer is not None:
+                timer.merge(worker_timer)
+    return results
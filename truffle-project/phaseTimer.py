@@ -0,0 +1,85 @@
+"""分阶段耗时统计：以 perf_counter_ns 记录每次合约调用/链下计算各阶段的耗时，导出分位数与直方图"""
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+# 导出的分位数
+PERCENTILES = (50, 90, 95, 99)
+# 直方图桶上界（毫秒），最后一个桶收集其余全部样本
+HISTOGRAM_BOUNDS_MS = (0.01, 0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class PhaseTimer:
+    """按 (操作, 阶段) 累积耗时样本（纳秒）。合约调用的阶段为 build / nonce / send / receipt / decode"""
+
+    def __init__(self):
+        self._spans = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, operation, phase):
+        """计时上下文：with timer.span("performMatching", "send"): ..."""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(operation, phase, time.perf_counter_ns() - start)
+
+    def record(self, operation, phase, elapsed_ns):
+        with self._lock:
+            self._spans[(operation, phase)].append(elapsed_ns)
+
+    def merge(self, other):
+        """合并其他计时器（如并行worker返回的计时器）的样本"""
+        with self._lock:
+            for key, samples in other._spans.items():
+                self._spans[key].extend(samples)
+
+    def __getstate__(self):
+        # 锁不可序列化，跨进程传递时只携带样本
+        return {"_spans": dict(self._spans)}
+
+    def __setstate__(self, state):
+        self._spans = defaultdict(list, state["_spans"])
+        self._lock = threading.Lock()
+
+    def summary(self):
+        """每个 (操作, 阶段) 的样本数、均值、分位数与最大值（毫秒）"""
+        import pandas as pd  # 只在导出阶段需要
+        rows = []
+        for (operation, phase), samples in sorted(self._spans.items()):
+            ms = np.asarray(samples, dtype=np.float64) / 1e6
+            row = {"operation": operation, "phase": phase, "count": ms.size,
+                   "total_ms": ms.sum(), "mean_ms": ms.mean()}
+            row.update({f"p{q}_ms": v for q, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES))})
+            row["max_ms"] = ms.max()
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def histogram(self):
+        """每个 (操作, 阶段) 在各耗时桶中的样本数（宽表，列名为桶上界）"""
+        import pandas as pd
+        edges = np.array(HISTOGRAM_BOUNDS_MS + (np.inf,))
+        labels = [f"<={b}ms" for b in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        rows = []
+        for (operation, phase), samples in sorted(self._spans.items()):
+            ms = np.asarray(samples, dtype=np.float64) / 1e6
+            counts = np.bincount(np.searchsorted(edges, ms), minlength=len(edges))
+            rows.append({"operation": operation, "phase": phase, **dict(zip(labels, counts.tolist()))})
+        return pd.DataFrame(rows)
+
+    def export(self, output_dir="output", timestamp=None):
+        """写出 phase_timing_<时间戳>.csv（分位数）与 phase_histogram_<时间戳>.csv，返回汇总表"""
+        timestamp = timestamp or time.strftime("%Y%m%d-%H%M%S")
+        summary = self.summary()
+        if summary.empty:
+            return summary
+        summary_file = os.path.join(output_dir, f"phase_timing_{timestamp}.csv")
+        summary.to_csv(summary_file, index=False)
+        self.histogram().to_csv(os.path.join(output_dir, f"phase_histogram_{timestamp}.csv"), index=False)
+        print(f"分阶段耗时统计保存至: {summary_file}")
+        return summary
@@ -0,0 +1,190 @@
+"""DataPrice 链下参考引擎：用 NumPy 整型向量逐位复现合约 _calculateMatch 的定点运算"""
+import numpy as np
+
+# ========================= 常量定义 =========================
+# 与合约一致的定点缩放系数（×10000）
+SCALE = 10000
+# 定价模式（与合约 PricingMode 枚举顺序一致）
+PRICING_MODES = {"BASELINE": 0, "STATIC": 1, "NASH": 2}
+# 合约 QuoteInput 结构体字段顺序（与 calculate_match 的定点参数顺序一致）
+QUOTE_FIELDS = (
+    "benchmarkPrice", "qualityFactor",
+    "buyerReserve", "buyerInitial", "buyerTrust", "buyerLossAversion", "buyerQualityRequest",
+    "sellerReserve", "sellerInitial", "sellerTrust", "sellerLossAversion",
+)
+# int64 安全上界：所有输入小于 2**31 时，合约中的任意中间乘积都不会溢出 int64
+_SAFE_BOUND = 2 ** 31
+
+
+def _as_int(value):
+    """转换为 int64 数组并检查取值范围（合约中为 uint256）"""
+    arr = np.asarray(value, dtype=np.int64)
+    if arr.size and (arr.min() < 0 or arr.max() >= _SAFE_BOUND):
+        raise ValueError("定点参数必须位于 [0, 2**31) 区间内")
+    return arr
+
+
+def to_fixed(value):
+    """浮点参数按 ×10000 截断为整数，等价于 ContractRunner 中的 int(x * 10000)"""
+    return np.trunc(np.asarray(value, dtype=np.float64) * SCALE).astype(np.int64)
+
+
+def _mode_code(mode):
+    """定价模式名称/编号统一为编号"""
+    if isinstance(mode, str):
+        return PRICING_MODES[mode]
+    if mode not in PRICING_MODES.values():
+        raise ValueError(f"Invalid mode: {mode}")
+    return int(mode)
+
+# ======================= 合约函数镜像 =======================
+# 以下函数与 DataPrice.sol 中的同名函数一一对应，输入输出均为整型数组。
+# uint256 下溢在合约中会导致交易回滚，这里表现为负值，由 calculate_match 统一标记。
+def validate_pre_conditions(quality_factor, buyer_quality_req, seller_reserve, buyer_reserve):
+    """前置条件：Q_p > Q_re 且 P_res^b > P_res^s"""
+    return (quality_factor > buyer_quality_req) & (buyer_reserve > seller_reserve)
+
+
+def calculate_buyer_price(initial_price, benchmark_price, trust):
+    """买家首轮报价"""
+    return np.where(
+        benchmark_price >= initial_price,
+        initial_price + (trust * (benchmark_price - initial_price)) // SCALE,
+        initial_price - (trust * (initial_price - benchmark_price)) // SCALE,
+    )
+
+
+def calculate_seller_price(initial_price, benchmark_price, trust):
+    """卖家首轮报价（addSeller 时写入 firstBid）"""
+    return np.where(
+        benchmark_price >= initial_price,
+        initial_price + (trust * (benchmark_price - initial_price)) // SCALE,
+        initial_price - (trust * (initial_price - benchmark_price)) // SCALE,
+    )
+
+
+def bound_value(value, min_bound, max_bound):
+    """边界保护"""
+    margin = (max_bound - min_bound) // 10
+    return np.where(value < min_bound, min_bound + margin,
+                    np.where(value > max_bound, max_bound - margin, value))
+
+
+def calculate_behavioral_coefficient(reserve_price, first_price, loss_aversion, diff):
+    """行为调整系数"""
+    denominator = np.abs(reserve_price - first_price) + diff
+    safe = np.where(denominator == 0, 1, denominator)
+    return np.where(denominator == 0, 1, loss_aversion * diff // safe)
+
+
+def calculate_equilibrium_price(buyer_first_offer, seller_first_bid, buyer_behavioral, seller_behavioral):
+    """均衡价格"""
+    buyer_behavioral = np.maximum(buyer_behavioral, 1)
+    seller_behavioral = np.maximum(seller_behavioral, 1)
+    numerator = (seller_first_bid - buyer_first_offer) * (SCALE - buyer_behavioral) * SCALE
+    denominator = SCALE * SCALE - buyer_behavioral * seller_behavioral
+    safe = np.where(denominator == 0, 1, denominator)
+    return np.where(denominator == 0, 1, buyer_first_offer + numerator // safe)
+
+
+def validate_post_conditions(candidate_price, seller_reserve, buyer_reserve, seller_loss_aversion, buyer_loss_aversion):
+    """后置条件：候选价格位于损失厌恶放宽后的保留价区间内"""
+    lower = seller_reserve - seller_reserve * seller_loss_aversion // 50000
+    upper = buyer_reserve + buyer_reserve * buyer_loss_aversion // 50000
+    return (candidate_price > lower) & (candidate_price < upper)
+
+# ======================= 向量化撮合入口 =======================
+def calculate_match(mode, benchmark_price, quality_factor,
+                    buyer_reserve, buyer_initial, buyer_trust, buyer_loss_aversion, buyer_quality_req,
+                    seller_reserve, seller_initial, seller_trust, seller_loss_aversion, detailed_events=True):
+    """
+    逐对复现 addSeller + _calculateMatch + MatchedDetail 事件字段。
+    所有参数为 ×10000 定点整数（标量或等长数组），返回与 MatchedDetail 同名字段的数组字典，
+    另含 reverted：该组参数在链上会回滚（uint256 下溢，或 addBuyer/addSeller 的 require 不满足）。
+    detailed_events 对应合约 eventVerbosity 是否为 FULL（只有此时才计算事件中的 priceRange）
+    """
+    mode = _mode_code(mode)
+    bench = _as_int(benchmark_price)
+    quality = _as_int(quality_factor)
+    b_res, b_init, b_trust, b_la, b_qre = (_as_int(v) for v in (
+        buyer_reserve, buyer_initial, buyer_trust, buyer_loss_aversion, buyer_quality_req))
+    s_res, s_init, s_trust, s_la = (_as_int(v) for v in (
+        seller_reserve, seller_initial, seller_trust, seller_loss_aversion))
+    (bench, quality, b_res, b_init, b_trust, b_la, b_qre,
+     s_res, s_init, s_trust, s_la) = np.broadcast_arrays(
+        bench, quality, b_res, b_init, b_trust, b_la, b_qre, s_res, s_init, s_trust, s_la)
+
+    # addBuyer/addSeller 的 require：保留价与初始价必须为正（"Prices must be positive"），
+    # 基准价为0的产品视为不存在（"Product not found"）
+    reverted = (b_res == 0) | (b_init == 0) | (s_res == 0) | (s_init == 0) | (bench == 0)
+    # addSeller：卖家首轮报价
+    first_bid = calculate_seller_price(s_init, bench, s_trust)
+    reverted |= first_bid < 0
+    pre_ok = validate_pre_conditions(quality, b_qre, s_res, b_res)
+    # priceRange 下界：FULL 级别下 MatchedDetail 对每一对都会计算，否则仅在后置条件校验时计算
+    lower_underflow = s_res - s_res * s_la // 50000 < 0
+    reverted |= lower_underflow if detailed_events else pre_ok & lower_underflow
+
+    # 按模式计算候选价格
+    if mode == PRICING_MODES["STATIC"]:
+        candidate = bench.copy()
+    elif mode == PRICING_MODES["NASH"]:
+        candidate = (s_res + b_res) // 2
+    else:
+        buyer_offer = calculate_buyer_price(b_init, bench, b_trust)
+        reverted |= pre_ok & (buyer_offer < 0)
+        seller_bid = bound_value(first_bid, s_res, b_res)
+        buyer_offer = bound_value(buyer_offer, s_res, b_res)
+        diff = np.abs(b_res - s_res)
+        direct = seller_bid <= buyer_offer
+        buyer_behavioral = calculate_behavioral_coefficient(b_res, buyer_offer, b_la, diff)
+        seller_behavioral = calculate_behavioral_coefficient(s_res, seller_bid, s_la, diff)
+        # calculateEquilibriumPrice 中的两处减法同样可能下溢
+        bb = np.maximum(buyer_behavioral, 1)
+        sb = np.maximum(seller_behavioral, 1)
+        reverted |= pre_ok & ~direct & ((bb > SCALE) | (bb * sb > SCALE * SCALE))
+        candidate = np.where(
+            direct,
+            (seller_bid + buyer_offer) // 2,
+            calculate_equilibrium_price(buyer_offer, seller_bid, buyer_behavioral, seller_behavioral),
+        )
+
+    post_ok = validate_post_conditions(candidate, s_res, b_res, s_la, b_la)
+    deal_price = np.where(pre_ok & post_ok, candidate, 0)
+    deal_price = np.where(reverted, 0, deal_price)
+    return {
+        "qualityPassed": quality > b_qre,
+        "reservePriceValid": b_res > s_res,
+        "priceRange": validate_post_conditions(deal_price, s_res, b_res, s_la, b_la),
+        "dealSuccess": deal_price > 0,
+        "dealPrice": deal_price,
+        "benchmarkPrice": bench,
+        "reverted": reverted,
+    }
+
+
+def fixed_inputs(P_off, Q_p, seller_params, buyer_params):
+    """
+    run_matching 使用的浮点参数（generate_trader_params 的字段名，标量或数组）按 ContractRunner 的缩放方式
+    转为定点，返回以 QUOTE_FIELDS 为键的字典。
+    注意：add_seller/add_buyer 将 ρ 传入合约的 trust 参数、λ_cre 传入 lossAversion 参数，这里保持一致
+    """
+    return dict(zip(QUOTE_FIELDS, (
+        to_fixed(P_off),
+        to_fixed(Q_p),
+        to_fixed(buyer_params["P_res_b"]),
+        to_fixed(buyer_params["p0_b"]),
+        to_fixed(buyer_params["ρ_b"]),
+        to_fixed(buyer_params["λ_cre_b"]),
+        to_fixed(buyer_params.get("Q_re", 0.3)),
+        to_fixed(seller_params["P_res_s"]),
+        to_fixed(seller_params["p0_s"]),
+        to_fixed(seller_params["ρ_s"]),
+        to_fixed(seller_params["λ_cre_s"]),
+    )))
+
+
+def match_from_params(mode, P_off, Q_p, seller_params, buyer_params, detailed_events=True):
+    """以浮点参数计算撮合结果，定点转换见 fixed_inputs"""
+    inputs = fixed_inputs(P_off, Q_p, seller_params, buyer_params)
+    return calculate_match(mode, *(inputs[name] for name in QUOTE_FIELDS), detailed_events=detailed_events)
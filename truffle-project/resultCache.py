@@ -0,0 +1,55 @@
+"""实验结果缓存：以 (实验单元, 种子, 合约字节码哈希, 定价模式, 事件级别, 链后端) 的摘要为键，未变化的单元直接复用已有结果"""
+import hashlib
+import json
+import os
+
+# 计时列只在实际执行时有意义，缓存命中时置空，不把旧的耗时当作本次测量
+TIMING_FIELDS = ("offchain_time", "match_time")
+
+
+def digest(payload):
+    """对可JSON序列化的对象计算稳定的sha256摘要（键排序，不受进程哈希随机化影响）"""
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """每个键一个JSON文件（按键前两位分目录），写入先落临时文件再原子替换，可被多个worker共享"""
+
+    def __init__(self, cache_dir=os.path.join("output", "cache")):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def key(test_id, mode, repeat_idx, seed, code_hash, event_verbosity, backend):
+        """backend 为 backend_identity() 返回的链后端标识（后端类型、客户端版本、硬分叉）"""
+        return digest({
+            "cell": [test_id, mode, repeat_idx],
+            "seed": seed,
+            "code_hash": code_hash,
+            "mode": mode,
+            # 事件级别影响 performMatching 的gas消耗
+            "event_verbosity": event_verbosity,
+            # 不同客户端/硬分叉的gas计价不同（如 ganache 与 eth-tester）
+            "backend": backend,
+        })
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """命中时返回缓存的结果字典（计时列置为None），否则返回None"""
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as file:
+                result = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        result.update({name: None for name in TIMING_FIELDS if name in result})
+        return result
+
+    def put(self, key, result):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(result, file, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
@@ -0,0 +1,61 @@
+"""结果汇总报告：明细结果 → 场景维度聚合统计（含置信区间半宽）与分阶段耗时导出。依赖pandas，实验流程只在汇总阶段导入本模块"""
+import os
+import time
+
+import pandas as pd
+
+from adaptiveScheduler import ci_half_width
+from resultStore import ResultStore
+
+
+def save_results(all_results, output_dir="output", timestamp=None, timer=None):
+    """
+    保存明细结果并生成场景维度聚合报告；传入timer时同时导出分阶段耗时统计。
+    all_results 可为 ResultStore、DataFrame 或结果字典列表
+    """
+    df = all_results.to_frame() if isinstance(all_results, ResultStore) else pd.DataFrame(all_results)
+    timestamp = timestamp or time.strftime("%Y%m%d-%H%M%S")
+    results_file = os.path.join(output_dir, f"experiment_results_{timestamp}.csv")
+    df.to_csv(results_file, index=False)
+    if timer is not None:
+        timer.export(output_dir, timestamp)
+    
+    # 生成分析报告
+    if not df.empty and 'match_success' in df.columns:
+        # 场景维度聚合统计（按test_id和mode分组）
+        scenario_stats = df.groupby(['test_id', 'mode'], observed=True).agg({
+            'match_success': ['mean', 'count'],
+            'PDR': 'mean',
+            'SDF':'mean',
+            'ECE': 'mean',
+            'total_gas': 'mean',
+            'match_time': 'mean'
+        }).reset_index()   
+        # 重命名列（多层索引展平）
+        scenario_stats.columns = [
+            '场景ID', 
+            '定价模式', 
+            '平均成功率', 
+            '测试次数', 
+            '平均价格偏离率', 
+            '平均剩余分配公平度',
+            '平均期望收敛效率',
+            '平均Gas消耗', 
+            '平均匹配时间'
+        ]
+        # 各指标均值的95%置信区间半宽（t分布，缺失值不计入样本数）
+        grouped = df.groupby(['test_id', 'mode'], observed=True)
+        for metric, label in [('match_success', '成功率'), ('PDR', '价格偏离率'),
+                              ('SDF', '剩余分配公平度'), ('ECE', '期望收敛效率')]:
+            std, count = grouped[metric].std().values, grouped[metric].count().values
+            scenario_stats[f'{label}95%CI半宽'] = [ci_half_width(s, n) for s, n in zip(std, count)]
+        # 保存场景分析结果
+        scenario_file = os.path.join(output_dir, f"scenario_performance_{timestamp}.csv")
+        scenario_stats.to_csv(scenario_file, index=False)
+        print(f"\n场景分析报告保存至: {scenario_file}")
+        print("\n场景性能摘要:")
+        print(scenario_stats.round(2))
+        # ===========================================
+    else:
+        print("实验完成，但未收集到有效结果")
+    return df
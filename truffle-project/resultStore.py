@@ -0,0 +1,182 @@
+"""列式结果存储：数值字段写入预分配的numpy数组（按倍增扩容），字符串字段按字典编码为整数codes，转DataFrame时数值列不复制"""
+import math
+
+import numpy as np
+
+from resultWriter import RESULT_FIELDS, STRING_FIELDS
+
+# 整数字段（int64 + 缺失掩码）；没有缺失值时以int64交给pandas，有缺失时与 pd.to_numeric 一样转为带NaN的float64
+INT_FIELDS = ("repeat_idx", "total_gas", "match_success")
+FLOAT_FIELDS = tuple(name for name in RESULT_FIELDS if name not in STRING_FIELDS and name not in INT_FIELDS)
+CATEGORY_FIELDS = tuple(name for name in RESULT_FIELDS if name in STRING_FIELDS)
+
+
+def _missing(value):
+    return value is None or value == "" or (isinstance(value, float) and math.isnan(value))
+
+
+def _float(value):
+    """数值或CSV读回的数值字符串 → float，缺失或无法解析时为NaN（与 pd.to_numeric(errors="coerce") 一致）"""
+    if _missing(value):
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _read_only(view):
+    """存储数组的只读视图（存储本身仍可继续追加写入）"""
+    view = view.view()
+    view.flags.writeable = False
+    return view
+
+
+class ResultStore:
+    """
+    run_matching 结果的列式容器，按行追加（append/extend），to_frame() 得到可直接 groupby 的DataFrame。
+    追加的字典先暂存，每 chunk_size 行整列转换写入数组；只保存 RESULT_FIELDS 中的字段，
+    scenario、mode、failure_reason 等重复字符串每个取值只存一次
+    """
+
+    def __init__(self, capacity=1024, chunk_size=4096):
+        capacity = max(int(capacity), 1)
+        self.chunk_size = chunk_size
+        self._size = 0
+        self._pending = []
+        self._ints = {name: np.zeros(capacity, dtype=np.int64) for name in INT_FIELDS}
+        self._int_missing = {name: np.zeros(capacity, dtype=bool) for name in INT_FIELDS}
+        self._floats = {name: np.empty(capacity, dtype=np.float64) for name in FLOAT_FIELDS}
+        self._codes = {name: np.empty(capacity, dtype=np.int32) for name in CATEGORY_FIELDS}
+        # 取值 → code（插入顺序），以及 code → 取值
+        self._categories = {name: {} for name in CATEGORY_FIELDS}
+        self._values = {name: [] for name in CATEGORY_FIELDS}
+
+    def __len__(self):
+        return self._size + len(self._pending)
+
+    @property
+    def capacity(self):
+        return self._codes[CATEGORY_FIELDS[0]].size
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for columns in (self._ints, self._int_missing, self._floats, self._codes):
+            for name, array in columns.items():
+                grown = np.zeros(capacity, dtype=array.dtype)
+                grown[:self._size] = array[:self._size]
+                columns[name] = grown
+
+    def append(self, result):
+        """追加一条结果（字典），返回原字典"""
+        self._pending.append(result)
+        if len(self._pending) >= self.chunk_size:
+            self._flush()
+        return result
+
+    def extend(self, results):
+        results = list(results)
+        if self._size + len(self._pending) + len(results) > self.capacity:
+            self._grow(self._size + len(self._pending) + len(results))
+        for result in results:
+            self.append(result)
+        return self
+
+    @staticmethod
+    def _float_column(values):
+        """整列转为float64：数值、数值字符串与None一次转换；含空串或无法解析的值时逐个按 _float 处理"""
+        try:
+            return np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            return np.array([_float(value) for value in values], dtype=np.float64)
+
+    def _flush(self):
+        """暂存的行整列写入数组"""
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        start, end = self._size, self._size + len(rows)
+        if end > self.capacity:
+            self._grow(end)
+        for name in INT_FIELDS:
+            values = self._float_column([row.get(name) for row in rows])
+            missing = np.isnan(values)
+            self._int_missing[name][start:end] = missing
+            self._ints[name][start:end] = np.where(missing, 0, values).astype(np.int64)
+        for name in FLOAT_FIELDS:
+            self._floats[name][start:end] = self._float_column([row.get(name) for row in rows])
+        for name in CATEGORY_FIELDS:
+            categories, values = self._categories[name], self._values[name]
+            codes = []
+            for row in rows:
+                value = row.get(name)
+                if _missing(value):
+                    codes.append(-1)
+                    continue
+                value = str(value)
+                code = categories.get(value)
+                if code is None:
+                    code = categories[value] = len(values)
+                    values.append(value)
+                codes.append(code)
+            self._codes[name][start:end] = codes
+        self._size = end
+
+    def row(self, i):
+        """第i行还原为结果字典（缺失字段省略）"""
+        self._flush()
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        row = {}
+        for name in RESULT_FIELDS:
+            if name in self._codes:
+                code = self._codes[name][i]
+                if code >= 0:
+                    row[name] = self._values[name][code]
+            elif name in self._ints:
+                if not self._int_missing[name][i]:
+                    row[name] = int(self._ints[name][i])
+            elif not math.isnan(self._floats[name][i]):
+                row[name] = float(self._floats[name][i])
+        return row
+
+    def __getitem__(self, i):
+        return self.row(i + len(self) if i < 0 else i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def _categorical(self, name):
+        """codes → pd.Categorical；类别按字典序重排，使 groupby 的分组顺序与普通字符串列一致"""
+        import pandas as pd
+        categories = self._values[name]
+        codes = self._codes[name][:self._size]
+        order = sorted(range(len(categories)), key=categories.__getitem__)
+        # 末位对应缺失值code -1
+        remap = np.empty(len(categories) + 1, dtype=np.int32)
+        remap[order] = np.arange(len(categories), dtype=np.int32)
+        remap[-1] = -1
+        return pd.Categorical.from_codes(remap[codes], categories=[categories[k] for k in order])
+
+    def to_frame(self):
+        """
+        列顺序同 RESULT_FIELDS 的DataFrame：浮点列与无缺失的整数列直接引用存储数组的前n行（不复制），
+        这些列为只读视图，原地修改（df.loc[...] = ...）抛出 ValueError 而不会改写存储；替换整列不受影响。
+        字符串列为 category 类型
+        """
+        import pandas as pd
+        self._flush()
+        n = self._size
+        data = {}
+        for name in RESULT_FIELDS:
+            if name in self._codes:
+                data[name] = self._categorical(name)
+            elif name in self._ints:
+                values, missing = self._ints[name][:n], self._int_missing[name][:n]
+                data[name] = np.where(missing, np.nan, values) if missing.any() else _read_only(values)
+            else:
+                data[name] = _read_only(self._floats[name][:n])
+        return pd.DataFrame(data, copy=False)
@@ -0,0 +1,155 @@
+"""流式结果写出：每个 run_matching 结果完成即追加落盘（JSONL/CSV，可选Parquet行组），支持按实验单元断点续跑"""
+import csv
+import glob
+import json
+import os
+import time
+
+# 明细结果字段（CSV表头顺序，与 run_matching 返回的字典一致；新增列追加在末尾，旧CSV续跑时已有列不错位）
+RESULT_FIELDS = [
+    "test_id", "repeat_idx", "mode", "scenario", "P_off", "P_res_s", "P_res_b", "p_0_s", "p_0_b",
+    "offchain_time", "total_gas", "match_time", "match_success", "failure_reason",
+    "P_on", "PDR", "SDF", "ECE", "buyer_addr", "seller_addr", "error", "source",
+]
+# 实验单元键：同一键的多条记录以最后写入的为准
+CELL_KEY = ("test_id", "mode", "repeat_idx")
+# Parquet 中按字符串存储的列，其余列统一为float64，保证各行组schema一致
+STRING_FIELDS = {"test_id", "mode", "scenario", "failure_reason", "buyer_addr", "seller_addr", "source", "error"}
+
+
+def cell_key(test_id, mode, repeat_idx):
+    """实验单元键（统一为字符串，CSV读回的值与内存中的值可直接比较）"""
+    return str(test_id), str(mode), str(repeat_idx)
+
+
+def _row_key(row):
+    return cell_key(*(row.get(name) for name in CELL_KEY))
+
+
+class ResultWriter:
+    """
+    追加写出实验结果。path 以 .jsonl 或 .csv 结尾；并行运行时每个worker通过 shard(k) 写入各自的分片文件，
+    completed()/load() 会同时读取主文件与全部分片。parquet=True 时另按 row_group_size 条写出一个Parquet行组
+    """
+
+    def __init__(self, path, parquet=False, row_group_size=500):
+        self.path = path
+        self.fmt = os.path.splitext(path)[1].lstrip(".")
+        if self.fmt not in ("jsonl", "csv"):
+            raise ValueError(f"不支持的结果格式: {path}（仅支持 .jsonl / .csv）")
+        self.parquet = parquet
+        self.row_group_size = row_group_size
+        self._buffer = []
+        self._parquet_writer = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._terminate_partial_line()
+
+    def _terminate_partial_line(self):
+        """上次运行中断在行中间时补上换行，避免续跑写入的第一条结果与残行拼接"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb+") as file:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b"\n":
+                file.write(b"\n")
+
+    @classmethod
+    def for_run(cls, output_dir="output", run_name=None, fmt="jsonl", **kwargs):
+        """按运行名定位结果文件：同名运行再次打开即为续跑"""
+        run_name = run_name or time.strftime("%Y%m%d-%H%M%S")
+        return cls(os.path.join(output_dir, f"experiment_results_{run_name}.{fmt}"), **kwargs)
+
+    def shard(self, index):
+        """并行worker使用的分片写出器（与主文件同目录、同格式）"""
+        stem, ext = os.path.splitext(self.path)
+        return ResultWriter(f"{stem}.w{index}{ext}", parquet=self.parquet, row_group_size=self.row_group_size)
+
+    def _files(self):
+        stem, ext = os.path.splitext(self.path)
+        return [p for p in [self.path] + sorted(glob.glob(f"{glob.escape(stem)}.w*{ext}")) if os.path.exists(p)]
+
+    @staticmethod
+    def _read_jsonl(path):
+        rows = []
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 中断时写了一半的末行
+                    continue
+        return rows
+
+    @staticmethod
+    def _read_csv(path):
+        with open(path, "r", newline="", encoding="utf-8") as file:
+            return [
+                {k: v for k, v in row.items() if v != ""}
+                for row in csv.DictReader(file)
+                if None not in row.values()  # 中断时写了一半的末行列数不足
+            ]
+
+    def _read_rows(self):
+        reader = self._read_jsonl if self.fmt == "jsonl" else self._read_csv
+        latest = {}
+        for path in self._files():
+            for row in reader(path):
+                latest[_row_key(row)] = row
+        return list(latest.values())
+
+    def completed(self):
+        """已成功完成（无error字段）的实验单元键集合，续跑时据此跳过"""
+        return {_row_key(row) for row in self._read_rows() if not row.get("error")}
+
+    def load(self):
+        """读取全部已写出的结果（同一单元取最后一条）为列式DataFrame，用于最终汇总"""
+        from resultStore import ResultStore  # 只在汇总阶段需要，写出与续跑判断不依赖pandas
+        rows = self._read_rows()
+        return ResultStore(capacity=len(rows)).extend(rows).to_frame()
+
+    def write(self, result):
+        """追加一条结果并立即刷盘"""
+        if self.fmt == "jsonl":
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        else:
+            new_file = not os.path.exists(self.path)
+            with open(self.path, "a", newline="", encoding="utf-8") as file:
+                writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(result)
+        if self.parquet:
+            self._buffer.append(result)
+            if len(self._buffer) >= self.row_group_size:
+                self._flush_parquet()
+
+    def _flush_parquet(self):
+        if not self._buffer:
+            return
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([
+            (name, pa.string() if name in STRING_FIELDS else pa.float64()) for name in RESULT_FIELDS
+        ])
+        df = pd.DataFrame(self._buffer, columns=RESULT_FIELDS)
+        for name in RESULT_FIELDS:
+            df[name] = (df[name].map(lambda v: None if pd.isna(v) else str(v)) if name in STRING_FIELDS
+                        else pd.to_numeric(df[name], errors="coerce").astype("float64"))
+        if self._parquet_writer is None:
+            # Parquet文件不可追加，每次打开写出器（含续跑）生成一个新文件
+            stem = os.path.splitext(self.path)[0]
+            self._parquet_writer = pq.ParquetWriter(f"{stem}.{time.strftime('%Y%m%d-%H%M%S')}.parquet", schema)
+        self._parquet_writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+        self._buffer = []
+
+    def close(self):
+        """写出剩余的Parquet行组并关闭文件"""
+        if self.parquet:
+            self._flush_parquet()
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+                self._parquet_writer = None
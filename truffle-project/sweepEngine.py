@@ -0,0 +1,197 @@
+"""参数扫描/敏感性分析：按网格或拉丁超立方展开市场与质量参数，在进程池中用链下引擎批量撮合，输出整洁结果表"""
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import priceEngine
+from adaptiveScheduler import ci_half_width
+from resultCache import digest
+from web3DataPrice import (MARKET_SCENARIOS, QUALITY_PROFILES, TEST_SCENARIOS, run_counts,
+                           calculate_offchain_params_batch, generate_quality_batch, generate_trader_params_batch)
+
+# 可扫描的市场参数（MARKET_SCENARIOS 的字段）
+MARKET_PARAMS = ("D", "S", "ζ_p", "λ_p", "P̄")
+# 可扫描的质量参数：quality_scale 整体缩放 QUALITY_PROFILES 的 base，quality_range 替换扰动幅度 range
+QUALITY_PARAMS = ("quality_scale", "quality_range")
+SWEEP_PARAMS = MARKET_PARAMS + QUALITY_PARAMS
+# 每个 (参数点, 定价模式) 汇总的指标
+METRICS = ("match_success", "PDR", "SDF", "ECE")
+
+
+def _check_params(names):
+    unknown = set(names) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"不支持扫描的参数: {sorted(unknown)}（可选: {SWEEP_PARAMS}）")
+
+
+def base_point(test_id, scenario):
+    """基准场景对应的参数点：未扫描的参数取 MARKET_SCENARIOS / QUALITY_PROFILES 中的原值"""
+    market = MARKET_SCENARIOS[scenario["market"]]
+    return {
+        "test_id": test_id, "market": scenario["market"], "quality": scenario["quality"],
+        **{name: market[name] for name in MARKET_PARAMS},
+        "quality_scale": 1.0, "quality_range": QUALITY_PROFILES[scenario["quality"]]["range"],
+    }
+
+
+def grid_points(grid, test_scenarios=TEST_SCENARIOS):
+    """网格展开：grid 为 {参数名: 取值列表}，每个基准场景 × 全部取值组合各得一个参数点"""
+    _check_params(grid)
+    names = list(grid)
+    return [
+        dict(base_point(test_id, scenario), **dict(zip(names, values)))
+        for test_id, scenario in test_scenarios.items()
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+
+def lhs_points(ranges, n, test_scenarios=TEST_SCENARIOS, seed=0):
+    """
+    拉丁超立方展开：ranges 为 {参数名: (下限, 上限)}，每一维的n个等分层各恰好落一个样本。
+    所有基准场景共用同一组设计点，便于场景之间对比
+    """
+    _check_params(ranges)
+    rng = np.random.default_rng(np.random.SeedSequence(int(digest({"ranges": ranges, "n": n, "seed": seed}), 16)))
+    design = {
+        name: (low + (rng.permutation(n) + rng.uniform(size=n)) / n * (high - low)).tolist()
+        for name, (low, high) in ranges.items()
+    }
+    return [
+        dict(base_point(test_id, scenario), **{name: values[i] for name, values in design.items()})
+        for test_id, scenario in test_scenarios.items()
+        for i in range(n)
+    ]
+
+
+@lru_cache(maxsize=256)
+def _sample_point(point_json, draws, seed):
+    """
+    参数点的链下参数（质量 → M_d/Q_p/P_off → 买卖家参数），与定价模式无关，按参数点缓存，各模式共用。
+    公共随机数：同一基准场景的全部参数点使用同一条随机流，点与点之间的差异只来自参数本身
+    """
+    point = json.loads(point_json)
+    base = QUALITY_PROFILES[point["quality"]]
+    profile = {"base": {k: v * point["quality_scale"] for k, v in base["base"].items()},
+               "range": point["quality_range"]}
+    market = {name: point[name] for name in MARKET_PARAMS}
+    scenario = {"market": point["market"], "quality": point["quality"]}
+    rng = np.random.default_rng(np.random.SeedSequence(int(digest({"test_id": point["test_id"], "seed": seed}), 16)))
+    quality = generate_quality_batch(point["quality"], draws, rng, profile=profile)
+    offchain = calculate_offchain_params_batch(scenario, quality, rng, market=market)
+    seller = generate_trader_params_batch("seller", point["market"], offchain["P_off"], rng)
+    buyer = generate_trader_params_batch("buyer", point["market"], offchain["P_off"], rng)
+    return {**offchain, **seller, **buyer}
+
+
+def point_metrics(columns, out):
+    """单个 (参数点, 模式) 的成功率、回滚率与 PDR/SDF/ECE 均值及95%置信区间半宽（指标口径与 run_matching 一致）"""
+    success = out["dealSuccess"]
+    P_on = out["dealPrice"][success] / 10000
+    P_off = columns["P_off"][success]
+    P_res_s, P_res_b = columns["P_res_s"][success] / 10000, columns["P_res_b"][success] / 10000
+    p0_s, p0_b = columns["p0_s"][success] / 10000, columns["p0_b"][success] / 10000
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pdr = np.where(P_off != 0, np.abs(P_on - P_off) / P_off, 0.0)
+        sdf = np.where(P_res_b != P_res_s, 1 - np.abs((P_on - P_res_s) / (P_res_b - P_res_s) - 0.5), 1.0)
+        ece = np.where(p0_s != p0_b, 1 - (np.abs(p0_s - P_on) + np.abs(p0_b - P_on)) / np.abs(p0_s - p0_b), 1.0)
+    row = {"revert_rate": float(out["reverted"].mean()), "P_off_mean": float(columns["P_off"].mean())}
+    for metric, values in zip(METRICS, (success.astype(np.float64), pdr, sdf, ece)):
+        row[f"{metric}_n"] = values.size
+        row[f"{metric}_mean"] = float(values.mean()) if values.size else math.nan
+        row[f"{metric}_ci"] = ci_half_width(float(values.std(ddof=1)) if values.size > 1 else math.nan, values.size)
+    return row
+
+
+def evaluate_point(point, modes, draws, seed=0):
+    """对一个参数点在各定价模式下撮合 draws 对买卖家，返回每个模式一行"""
+    point_json = json.dumps(point, sort_keys=True, ensure_ascii=False)
+    columns = _sample_point(point_json, draws, seed)
+    point_id = digest(point)[:12]
+    rows = []
+    for mode in modes:
+        out = priceEngine.match_from_params(mode, columns["P_off"], columns["Q_p"], columns, columns)
+        rows.append({"point_id": point_id, **point, "mode": mode, "draws": draws, **point_metrics(columns, out)})
+    return rows
+
+
+def _evaluate_chunk(points, modes, draws, seed):
+    return [row for point in points for row in evaluate_point(point, modes, draws, seed)]
+
+
+def run_sweep(points, modes=tuple(run_counts), draws=1000, seed=0, workers=None, chunk_size=None):
+    """
+    在进程池中评估全部参数点，返回整洁结果表（每个 (参数点, 定价模式) 一行）。
+    workers=None 使用全部CPU核；参数点按 chunk_size 分块提交，同一参数点的各模式在同一进程内完成
+    """
+    workers = workers or os.cpu_count() or 1
+    modes = list(modes)
+    if workers == 1 or len(points) <= 1:
+        rows = _evaluate_chunk(points, modes, draws, seed)
+    else:
+        chunk_size = chunk_size or max(1, math.ceil(len(points) / (workers * 4)))
+        chunks = [points[i:i + chunk_size] for i in range(0, len(points), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(_evaluate_chunk, chunks, itertools.repeat(modes), itertools.repeat(draws),
+                             itertools.repeat(seed))
+            rows = [row for part in parts for row in part]
+    return pd.DataFrame(rows)
+
+
+def sensitivity(df, params):
+    """各扫描参数与各指标均值的Spearman秩相关（按基准场景与定价模式分组）"""
+    rows = []
+    for (test_id, mode), group in df.groupby(["test_id", "mode"]):
+        for param in params:
+            if group[param].nunique() < 2:
+                continue
+            row = {"test_id": test_id, "mode": mode, "param": param}
+            for metric in METRICS:
+                values = group[f"{metric}_mean"]
+                # 秩的Pearson相关即Spearman相关（pandas 的 method="spearman" 依赖scipy）；指标不变时为NaN
+                row[metric] = group[param].rank().corr(values.rank()) if values.nunique() > 1 else math.nan
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def save_sweep(df, params, output_dir="output", timestamp=None):
+    """写出 sweep_results_<时间戳>.csv（明细）与 sweep_sensitivity_<时间戳>.csv（秩相关），返回敏感性表"""
+    timestamp = timestamp or time.strftime("%Y%m%d-%H%M%S")
+    os.makedirs(output_dir, exist_ok=True)
+    results_file = os.path.join(output_dir, f"sweep_results_{timestamp}.csv")
+    df.to_csv(results_file, index=False)
+    print(f"参数扫描结果保存至: {results_file}")
+    table = sensitivity(df, params)
+    if not table.empty:
+        table.to_csv(os.path.join(output_dir, f"sweep_sensitivity_{timestamp}.csv"), index=False)
+        print("\n参数敏感性（Spearman秩相关）:")
+        print(table.round(3).to_string(index=False))
+    return table
+
+
+if __name__ == "__main__":
+    SWEEP = "lhs"  # 展开方式：grid（网格）| lhs（拉丁超立方）
+    # 网格取值
+    GRID = {"λ_p": [0.8, 1.0, 1.2, 1.5], "ζ_p": [3, 4, 5, 7], "quality_scale": [0.9, 1.0, 1.1]}
+    # 拉丁超立方取值范围与每个基准场景的采样点数
+    LHS_RANGES = {"D": (60, 200), "S": (15, 40), "ζ_p": (3, 8), "λ_p": (0.6, 1.6), "quality_range": (0.03, 0.2)}
+    LHS_SAMPLES = 100
+    DRAWS = 2000  # 每个参数点撮合的买卖对数
+    SEED = 0
+    WORKERS = None  # None = 使用全部CPU核
+
+    if SWEEP == "grid":
+        params, points = list(GRID), grid_points(GRID)
+    else:
+        params, points = list(LHS_RANGES), lhs_points(LHS_RANGES, LHS_SAMPLES, seed=SEED)
+    start_time = time.time()
+    print(f"参数扫描: {len(points)}个参数点 × {len(run_counts)}种定价模式，每点{DRAWS}次撮合")
+    results = run_sweep(points, run_counts.keys(), DRAWS, SEED, WORKERS)
+    save_sweep(results, params)
+    print(f"\n总耗时: {time.time() - start_time:.2f}秒")
@@ -0,0 +1,27 @@
+"""pytest 公共配置：模块位于 truffle-project 根目录（按脚本方式导入），测试在临时目录中运行，缓存与输出不写入仓库"""
+import os
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARTIFACT_PATH = os.path.join(PROJECT_DIR, "build", "contracts", "DataPrice.json")
+
+sys.path.insert(0, PROJECT_DIR)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """各模块默认的 output/ 相对路径落在临时目录"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope="module")
+def tester_runner(tmp_path_factory):
+    """eth-tester 进程内链上部署 build/contracts/DataPrice.json 的 ContractRunner（快照隔离）"""
+    pytest.importorskip("eth_tester")
+    from web3DataPrice import ContractRunner
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(tmp_path_factory.mktemp("chain"))
+        yield ContractRunner(None, ARTIFACT_PATH, None, backend="eth-tester", isolation="snapshot")
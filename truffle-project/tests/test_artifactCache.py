@@ -0,0 +1,76 @@
+"""编译产物精简缓存与产物/源码一致性检查"""
+import hashlib
+import json
+import os
+
+import artifactCache
+from artifactCache import load_artifact, stale_functions
+
+SOURCE = """
+pragma solidity ^0.8.0;
+contract Demo {
+    uint256 public batchSize = 1;
+    // function commentedOut() public {}
+    /* function blockComment() external {} */
+    function addItem(string memory id,
+                     uint256 price) public {}
+    function addItems(string[] memory ids, uint256[] calldata prices) external {}
+    function quote(uint mode) external pure returns (uint256) { return mode; }
+    function _helper(uint256 a) internal pure returns (uint256) { return a; }
+    function scan() private view {}
+}
+"""
+
+
+def _project(tmp_path, abi_functions):
+    os.makedirs(tmp_path / "contracts")
+    os.makedirs(tmp_path / "build" / "contracts")
+    (tmp_path / "contracts" / "Demo.sol").write_text(SOURCE, encoding="utf-8")
+    artifact = {
+        "contractName": "Demo",
+        "abi": [{"type": "function", "name": name, "inputs": []} for name in abi_functions],
+        "bytecode": "0x6000",
+        "ast": {"large": "unused"},
+    }
+    path = tmp_path / "build" / "contracts" / "Demo.json"
+    path.write_text(json.dumps(artifact), encoding="utf-8")
+    return str(path), artifact
+
+
+def test_stale_functions_lists_public_functions_missing_from_abi(tmp_path):
+    path, artifact = _project(tmp_path, ["addItem", "batchSize"])
+    assert stale_functions(path, artifact) == ["addItems", "quote"]
+
+
+def test_up_to_date_artifact_is_not_stale(tmp_path, capsys):
+    path, artifact = _project(tmp_path, ["addItem", "addItems", "quote", "batchSize"])
+    assert stale_functions(path, artifact) == []
+    load_artifact(path, cache_dir=str(tmp_path / "cache"))
+    assert "truffle compile" not in capsys.readouterr().out
+
+
+def test_load_artifact_warns_about_stale_build(tmp_path, capsys):
+    path, _ = _project(tmp_path, ["addItem"])
+    load_artifact(path, cache_dir=str(tmp_path / "cache"))
+    out = capsys.readouterr().out
+    assert "addItems, quote" in out and "truffle compile" in out
+
+
+def test_trimmed_copy_is_keyed_by_artifact_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifactCache, "_loaded", {})
+    path, _ = _project(tmp_path, ["addItem", "addItems", "quote"])
+    cache_dir = tmp_path / "cache"
+    artifact = load_artifact(path, cache_dir=str(cache_dir))
+    assert set(artifact) == {"contractName", "abi", "bytecode"}
+    with open(path, "rb") as file:
+        key = hashlib.sha256(file.read()).hexdigest()
+    assert os.listdir(cache_dir) == [f"{key}.json"]
+
+    # 重新编译后哈希变化，不会读到旧的精简副本
+    monkeypatch.setattr(artifactCache, "_loaded", {})
+    data = json.loads(open(path, encoding="utf-8").read())
+    data["bytecode"] = "0x6001"
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    assert load_artifact(path, cache_dir=str(cache_dir))["bytecode"] == "0x6001"
+    assert len(os.listdir(cache_dir)) == 2
@@ -0,0 +1,136 @@
+"""performMatching 基准：batchSize 支持检测、gas耗尽与普通回滚的区分"""
+import json
+
+import pytest
+
+pytest.importorskip("eth_tester")
+
+import benchDataPrice  # noqa: E402
+from conftest import ARTIFACT_PATH  # noqa: E402
+from benchDataPrice import (  # noqa: E402
+    compare_verbosity, drive_matching, gas_exhausted, populate_market, run_benchmark, supported_batch_sizes,
+)
+from web3DataPrice import TEST_SCENARIOS  # noqa: E402
+
+
+def _pair(runner, buyer_reserve, seller_reserve, seller_initial):
+    fns = runner.contract.functions
+    runner.isolate()
+    runner._send_transaction(fns.addProduct, "p", 1_000_000, 8000, 0)
+    runner._send_transaction(fns.addSeller, "s", seller_reserve, seller_initial, 5000, 20000, "p", 5)
+    runner._send_transaction(fns.addBuyer, "b", buyer_reserve, 800_000, 5000, 20000, 3000)
+
+
+def test_gas_exhausted_messages():
+    assert gas_exhausted("VM Exception while processing transaction: out of gas")
+    assert gas_exhausted("exceeds block gas limit")
+    assert not gas_exhausted("execution reverted: Invalid mode")
+
+
+def test_out_of_gas_counts_as_block_limit(tester_runner):
+    _pair(tester_runner, 1_200_000, 800_000, 900_000)
+    (batch,) = drive_matching(tester_runner, gas_limit=60_000)
+    assert not batch[4] and batch[6]
+
+
+def test_revert_is_not_block_limit(tester_runner):
+    # 快照中为默认的 BASELINE 模式：均衡价格分支中 1e8 - b·s 下溢，交易回滚但未耗尽gas
+    _pair(tester_runner, 1_200_000, 900_000, 1_100_000)
+    (batch,) = drive_matching(tester_runner, gas_limit=8_000_000)
+    assert not batch[4] and not batch[6]
+    assert batch[5] == "performMatching reverted"
+
+
+def test_unsupported_batch_sizes_are_skipped(tester_runner, workdir, capsys):
+    current = tester_runner.contract.functions.batchSize().call()
+    usable, skipped = supported_batch_sizes(tester_runner, [current, current + 4])
+    if hasattr(tester_runner.contract.functions, "setBatchSize"):
+        assert usable == [current, current + 4] and skipped == []
+        return
+    assert usable == [current] and skipped == [current + 4]
+    assert "setBatchSize" in capsys.readouterr().out
+
+    rows = run_benchmark(tester_runner, [(2, 2, 1)], [current, current + 4], output_dir=str(workdir))
+    assert [row["batch_size"] for row in rows] == [current]
+    assert not rows[0]["hit_block_limit"] and rows[0]["extrapolated_max_batch_size"] > 0
+    (summary_path,) = workdir.glob("bench_matching_*.json")
+    assert json.loads(summary_path.read_text(encoding="utf-8"))["skipped_batch_sizes"] == [current + 4]
+    assert "est_max_batch_size" not in benchDataPrice.BENCH_FIELDS
+
+
+BULK = ("addProducts", "addSellers", "addBuyers")
+
+
+def test_populate_market_reports_per_item_fallback(tester_runner, monkeypatch, capsys):
+    if all(tester_runner.has_function(name) for name in BULK):
+        pytest.skip("ABI 已包含批量注册函数")
+    monkeypatch.setattr(benchDataPrice, "_per_item_warned", set())
+    fns = tester_runner.contract.functions
+    for _ in range(2):
+        tester_runner.isolate()
+        gas = populate_market(tester_runner, 3, 2, 1, TEST_SCENARIOS["S1"])
+        assert len(fns.getAllSellers().call()) == 2 and all(value > 0 for value in gas.values())
+    # 回退到逐条注册时明确提示，且每个合约只提示一次；显式要求批量注册时报错
+    assert capsys.readouterr().out.count("addProducts/addSellers/addBuyers") == 1
+    with pytest.raises(RuntimeError, match="truffle compile"):
+        populate_market(tester_runner, 3, 2, 1, TEST_SCENARIOS["S1"], bulk=True)
+
+
+def test_bulk_registration_matches_per_item(tester_runner):
+    if not all(tester_runner.has_function(name) for name in BULK):
+        pytest.skip("build/contracts/DataPrice.json 缺少批量注册函数，需先执行 truffle compile")
+    fns = tester_runner.contract.functions
+    market = benchDataPrice.generate_market(12, 10, 4, TEST_SCENARIOS["S1"], seed=3)
+    states, gas = {}, {}
+    for bulk in (False, True):
+        tester_runner.isolate()
+        gas[bulk] = populate_market(tester_runner, 12, 10, 4, TEST_SCENARIOS["S1"], bulk=bulk, market=market)
+        receipt = tester_runner._send_transaction(fns.performMatching)
+        states[bulk] = (fns.getAllSellers().call(), [e["price"] for e in tester_runner.events.matched(receipt)])
+    # 批量注册写入的状态与逐条注册一致，且每个条目的gas更低（省去每笔交易的21000基础gas）
+    assert states[True] == states[False]
+    assert all(gas[True][name] < gas[False][name] for name in gas[False])
+
+
+def test_compare_verbosity_reports_skipped_levels(workdir):
+    rows = compare_verbosity(ARTIFACT_PATH, [(4, 4, 2)], output_dir=str(workdir))
+    gas = {row["label"]: row["matching_gas"] for row in rows}
+    (summary_path,) = workdir.glob("bench_verbosity_*.json")
+    skipped = json.loads(summary_path.read_text(encoding="utf-8"))["skipped_levels"]
+    assert gas["FULL"] > 0 and set(gas) | set(skipped) == {"FULL", "MATCHES", "OFF"}
+
+
+def test_lower_verbosity_saves_matching_gas(tester_runner, workdir):
+    if not tester_runner.has_function("setEventVerbosity"):
+        pytest.skip("build/contracts/DataPrice.json 缺少 setEventVerbosity，需先执行 truffle compile")
+    rows = compare_verbosity(ARTIFACT_PATH, [(4, 4, 2), (8, 8, 4)], output_dir=str(workdir))
+    for size in ((4, 4, 2), (8, 8, 4)):
+        gas = {row["label"]: row["matching_gas"] for row in rows if (row["n_buyers"], row["m_sellers"]) == size[:2]}
+        # 低于 FULL 时不再逐对发出 MatchedDetail，OFF 时也不发出 Matched
+        assert gas["OFF"] < gas["MATCHES"] < gas["FULL"], size
+
+
+@pytest.mark.parametrize("level", ["MATCHES", "OFF"])
+def test_verbosity_controls_emitted_events(tester_runner, level):
+    if not tester_runner.has_function("setEventVerbosity"):
+        pytest.skip("build/contracts/DataPrice.json 缺少 setEventVerbosity，需先执行 truffle compile")
+    from web3DataPrice import ContractRunner
+    runner = ContractRunner(None, ARTIFACT_PATH, None, backend="eth-tester", event_verbosity=level)
+    assert runner.contract.functions.eventVerbosity().call() == runner.verbosity_map[level]
+    _pair(runner, 1_200_000, 800_000, 900_000)
+    runner.set_mode("NASH")
+    receipt = runner._send_transaction(runner.contract.functions.performMatching)
+    assert receipt.status == 1 and runner.events.matched_detail(receipt) == []
+    assert len(runner.events.matched(receipt)) == (1 if level == "MATCHES" else 0)
+
+
+@pytest.mark.parametrize("isolation", [None, "snapshot"])
+def test_cli_bench_uses_configured_isolation(monkeypatch, workdir, isolation):
+    import cli
+    seen = {}
+    monkeypatch.setattr(benchDataPrice, "run_benchmark", lambda runner, *args, **kwargs: seen.update(
+        isolation=runner.isolation))
+    argv = ["bench", "--backend", "eth-tester", "--abi-path", ARTIFACT_PATH]
+    assert cli.main(argv + (["--isolation", isolation] if isolation else [])) == 0
+    # 与 run 一致：未指定时使用 DEFAULTS["isolation"]（reset）
+    assert seen["isolation"] == (isolation or cli.DEFAULTS["isolation"])
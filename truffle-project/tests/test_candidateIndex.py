@@ -0,0 +1,71 @@
+"""候选卖家索引：前置条件剪枝与成交上限，以及定向撮合与全量撮合的一致性"""
+import numpy as np
+import pytest
+
+from candidateIndex import CandidateIndex
+from priceEngine import PRICING_MODES
+
+PRODUCTS = [("p", 1_000_000, 8000, 0), ("low", 1_000_000, 2000, 0)]
+SELLERS = [
+    # (id, 保留价, 初始报价, 信任, 损失厌恶, 产品, 成交上限)
+    ("above", 900_000, 1_100_000, 5000, 60_000, "p", 5),   # 保留价高于买家；ρ>5 时 priceRange 下限下溢
+    ("ok", 500_000, 1_100_000, 5000, 20_000, "p", 5),
+    ("quality", 500_000, 1_100_000, 5000, 20_000, "low", 5),  # 产品质量低于买家阈值
+    ("full", 500_000, 1_100_000, 5000, 20_000, "p", 0),    # 已达成交上限
+]
+BUYER = ("b", 800_000, 700_000, 5000, 20_000, 3000)
+
+
+def test_prefilter_keeps_only_feasible_sellers():
+    index = CandidateIndex(PRODUCTS, SELLERS)
+    assert index.feasible(BUYER).tolist() == [1]
+    for mode in [None] + list(PRICING_MODES):
+        assert index.candidates(BUYER, mode).tolist() == [1]
+    assert index.plan([BUYER], "NASH", start=3) == [(3, [1])]
+
+
+def test_saturated_sellers_are_dropped():
+    index = CandidateIndex(PRODUCTS, SELLERS)
+    index.record_matches(["ok"] * 4)
+    assert index.plan([BUYER]) == [(0, [1])]
+    index.record_matches(["ok"])
+    assert index.plan([BUYER]) == []
+
+
+def test_pruned_pair_is_never_evaluated():
+    # 被剪除的买卖对在全量撮合的FULL级别下会因 priceRange 下溢而回滚；定向撮合不评估它，因而不会回滚
+    import priceEngine
+    args = [np.array([value]) for value in (1_000_000, 8000, 800_000, 700_000, 5000, 20_000, 3000,
+                                            900_000, 1_100_000, 5000, 60_000)]
+    assert priceEngine.calculate_match("NASH", *args, detailed_events=True)["reverted"][0]
+    assert not priceEngine.calculate_match("NASH", *args, detailed_events=False)["reverted"][0]
+    assert 0 not in CandidateIndex(PRODUCTS, SELLERS).candidates(BUYER, "NASH").tolist()
+
+
+@pytest.mark.parametrize("verbosity", ["FULL", "MATCHES"])
+def test_candidates_match_full_scan_on_chain(tester_runner, verbosity):
+    from benchDataPrice import generate_market, populate_market
+    from candidateIndex import clear_with_candidates
+    from conftest import ARTIFACT_PATH
+    from web3DataPrice import ContractRunner, TEST_SCENARIOS
+    if not (tester_runner.has_function("performMatchingWithCandidates")
+            and tester_runner.has_function("setEventVerbosity")):
+        pytest.skip("build/contracts/DataPrice.json 缺少定向撮合/事件级别函数，需先执行 truffle compile")
+    runner = ContractRunner(None, ARTIFACT_PATH, None, backend="eth-tester", event_verbosity=verbosity)
+    market = generate_market(6, 8, 2, TEST_SCENARIOS["S1"], seed=5)
+    results = {}
+    for prefilter in (False, True):
+        runner.isolate()
+        runner.set_batch_size(6)
+        populate_market(runner, 6, 8, 2, TEST_SCENARIOS["S1"], market=market)
+        if prefilter:
+            rounds, error = clear_with_candidates(runner, CandidateIndex.from_market(market), market["buyers"],
+                                                  batch_size=6)
+            assert not error
+            results[prefilter] = [price for r in rounds for price in r["prices"]]
+            # 剪枝后评估的买卖对少于 N×M
+            assert sum(r["pairs"] for r in rounds) < 6 * 8
+        else:
+            receipt = runner._send_transaction(runner.contract.functions.performMatching)
+            results[prefilter] = [event["price"] for event in runner.events.matched(receipt)]
+    assert sorted(results[True]) == sorted(results[False])
@@ -0,0 +1,95 @@
+"""ContractRunner 在 eth-tester 上的行为：测试隔离方式、紧凑布局的ID长度检查、引擎复现结果的来源标记"""
+import pytest
+
+from conftest import ARTIFACT_PATH
+
+pytest.importorskip("eth_tester")
+
+from web3DataPrice import ContractRunner  # noqa: E402
+
+
+def test_reset_is_default_isolation():
+    import inspect
+    import cli
+    from web3DataPrice import run_experiment
+    assert cli.DEFAULTS["isolation"] == "reset"
+    assert inspect.signature(run_experiment).parameters["isolation"].default == "reset"
+    runner = ContractRunner(None, ARTIFACT_PATH, None, backend="eth-tester")
+    assert runner.isolation == "reset"
+    assert runner.isolate()
+
+
+def test_snapshot_falls_back_to_reset_without_node_support(monkeypatch):
+    def no_snapshot(self, method, params):
+        raise RuntimeError(f"the method {method} does not exist/is not available")
+
+    monkeypatch.setattr(ContractRunner, "_rpc", no_snapshot)
+    runner = ContractRunner(None, ARTIFACT_PATH, None, backend="eth-tester", isolation="snapshot")
+    assert runner.isolation == "reset"
+    fns = runner.contract.functions
+    runner._send_transaction(fns.addProduct, "p", 1_000_000, 8000, 0)
+    assert runner.isolate()
+    assert runner.contract.functions.getAllSellers().call() == []
+
+
+def test_snapshot_restores_clean_state(tester_runner):
+    fns = tester_runner.contract.functions
+    tester_runner.isolate()
+    tester_runner._send_transaction(fns.addProduct, "p", 1_000_000, 8000, 0)
+    tester_runner._send_transaction(fns.addSeller, "s", 900_000, 1_100_000, 5000, 20000, "p", 5)
+    assert len(fns.getAllSellers().call()) == 1
+    assert tester_runner.isolate()
+    assert fns.getAllSellers().call() == []
+
+
+def test_packed_layout_rejects_long_ids(tester_runner, monkeypatch):
+    abi = [{"type": "function", "name": "getAllSellers", "inputs": [], "outputs": [
+        {"name": "", "type": "tuple[]", "components": [{"name": "id", "type": "bytes32"}]}]}]
+    assert ContractRunner._packed_id_bytes(abi) == 32
+    assert tester_runner.max_id_bytes is None
+
+    monkeypatch.setattr(tester_runner, "max_id_bytes", 32)
+    fns = tester_runner.contract.functions
+    tester_runner.isolate()
+    nonce = tester_runner.w3.eth.get_transaction_count(tester_runner.account)
+    with pytest.raises(ValueError, match="32"):
+        tester_runner._send_transaction(fns.addProduct, "产品" * 6, 1_000_000, 8000, 0)
+    with pytest.raises(ValueError, match="addSeller"):
+        tester_runner._send_transaction(fns.addSeller, "s" * 33, 900_000, 1_100_000, 5000, 20000, "p", 5)
+    assert tester_runner.w3.eth.get_transaction_count(tester_runner.account) == nonce
+    assert tester_runner._send_transaction(fns.addProduct, "p" * 32, 1_000_000, 8000, 0).status == 1
+
+
+def test_layout_cells_use_sample_cell():
+    from layoutCompare import cell_inputs
+    from phaseTimer import PhaseTimer
+    from web3DataPrice import TEST_SCENARIOS, sample_cell
+    product, seller, buyer = cell_inputs("S1", 3, "NASH", TEST_SCENARIOS["S1"])
+    cell = sample_cell("S1", 3, "NASH", TEST_SCENARIOS["S1"], PhaseTimer())
+    assert product == ("S1_NASH_3", int(cell["P_off"] * 10000), int(cell["Q_p"] * 10000), cell["period_enum"])
+    assert seller == ContractRunner._seller_args(cell["seller_id"], cell["seller_params"], cell["product_id"])
+    assert buyer == ContractRunner._buyer_args(cell["buyer_id"], cell["buyer_params"])
+
+
+class _NoEvents:
+    """OFF 级别的收据：没有 Matched，也不应读取 MatchedDetail"""
+    def matched(self, receipt):
+        return []
+
+    def matched_detail(self, receipt):
+        raise AssertionError("非FULL级别不解析 MatchedDetail")
+
+
+def test_engine_filled_rows_are_marked(tester_runner):
+    from phaseTimer import PhaseTimer
+    from web3DataPrice import TEST_SCENARIOS, matching_result, sample_cell
+    # FULL 级别：结论来自链上事件
+    assert tester_runner.run_matching("S1", 0, "NASH", TEST_SCENARIOS["S1"])["source"] == "chain"
+
+    # OFF 级别：match_success 与诊断字段由链下引擎复现，不能记作链上结果
+    cell = sample_cell("S1", 0, "NASH", TEST_SCENARIOS["S1"], PhaseTimer())
+    matched, detail, source = ContractRunner._decode_matching(_NoEvents(), "OFF", PhaseTimer(), None, "NASH", cell)
+    assert source == "engine" and matched == []
+    result = matching_result("S1", 0, "NASH", TEST_SCENARIOS["S1"], cell, 0, 0.0, matched, detail, source)
+    assert result["source"] == "engine"
+    assert result["match_success"] == int(detail[0]["dealSuccess"])
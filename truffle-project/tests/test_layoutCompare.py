@@ -0,0 +1,37 @@
+"""存储布局对比：compare_layouts/summarize 在 eth-tester 上逐单元记录gas并比较成交价"""
+import os
+
+import pytest
+
+pytest.importorskip("eth_tester")
+
+from conftest import ARTIFACT_PATH, PROJECT_DIR  # noqa: E402
+from layoutCompare import FUNCTIONS, compare_layouts, summarize  # noqa: E402
+from web3DataPrice import TEST_SCENARIOS, build_test_cells  # noqa: E402
+
+COMPACT_PATH = os.path.join(PROJECT_DIR, "build", "contracts", "DataPriceCompact.json")
+CELLS = build_test_cells({"S1": TEST_SCENARIOS["S1"], "M2": TEST_SCENARIOS["M2"]}, {"BASELINE": 1, "NASH": 1})
+
+
+def test_identical_artifacts_report_no_saving():
+    detail = compare_layouts({"DataPrice": ARTIFACT_PATH, "copy": ARTIFACT_PATH}, CELLS)
+    assert len(detail) == 2 * len(CELLS)
+    assert "error" not in detail or detail["error"].isna().all()
+    gas, mismatches = summarize(detail, "DataPrice")
+    assert mismatches == 0
+    assert list(gas.index) == list(FUNCTIONS)
+    assert (gas["DataPrice"] > 0).all() and (gas["copy_saving"] == 0).all()
+
+
+def test_missing_artifact_is_reported():
+    with pytest.raises(FileNotFoundError, match="truffle compile"):
+        compare_layouts({"DataPrice": ARTIFACT_PATH, "missing": ARTIFACT_PATH + ".missing"}, CELLS)
+
+
+@pytest.mark.skipif(not os.path.exists(COMPACT_PATH), reason="缺少 DataPriceCompact.json，需先执行 truffle compile")
+def test_compact_layout_saves_gas_with_same_prices():
+    detail = compare_layouts({"DataPrice": ARTIFACT_PATH, "DataPriceCompact": COMPACT_PATH}, CELLS)
+    assert "error" not in detail or detail["error"].isna().all()
+    gas, mismatches = summarize(detail, "DataPrice")
+    assert mismatches == 0
+    assert (gas["DataPriceCompact_saving"] > 0).all()
@@ -0,0 +1,200 @@
+"""priceEngine 与合约的逐位一致性：对照 DataPrice.sol 的逐行标量移植，以及 eth-tester 上的实际字节码"""
+import numpy as np
+import pytest
+
+import priceEngine
+from priceEngine import PRICING_MODES, QUOTE_FIELDS, calculate_match
+
+
+class Revert(Exception):
+    """合约回滚（require 失败或 uint256 下溢）"""
+
+
+def _sub(a, b):
+    if b > a:
+        raise Revert("uint256 underflow")
+    return a - b
+
+
+def _first_price(initial, benchmark, trust):
+    # calculateBuyerPrice / calculateSellerPrice
+    if benchmark >= initial:
+        return initial + trust * (benchmark - initial) // 10000
+    return _sub(initial, trust * (initial - benchmark) // 10000)
+
+
+def _bound(value, low, high):
+    if value < low:
+        return low + _sub(high, low) // 10
+    if value > high:
+        return _sub(high, _sub(high, low) // 10)
+    return value
+
+
+def _behavioral(reserve, first, loss_aversion, diff):
+    denominator = abs(reserve - first) + diff
+    return 1 if denominator == 0 else loss_aversion * diff // denominator
+
+
+def _equilibrium(buyer_offer, seller_bid, buyer_behavioral, seller_behavioral):
+    buyer_behavioral = max(buyer_behavioral, 1)
+    seller_behavioral = max(seller_behavioral, 1)
+    numerator = _sub(seller_bid, buyer_offer) * _sub(10000, buyer_behavioral) * 10000
+    denominator = _sub(100000000, buyer_behavioral * seller_behavioral)
+    if denominator == 0:
+        return 1
+    return buyer_offer + numerator // denominator
+
+
+def _lower(reserve, loss_aversion):
+    return _sub(reserve, reserve * loss_aversion // 50000)
+
+
+def _upper(reserve, loss_aversion):
+    return reserve + reserve * loss_aversion // 50000
+
+
+def scalar_match(mode, bench, quality, b_res, b_init, b_trust, b_la, b_qre, s_res, s_init, s_trust, s_la,
+                 detailed=True):
+    """addBuyer + addProduct + addSeller + _evaluatePair 的逐行标量移植；回滚时抛出 Revert"""
+    if not (b_res > 0 and b_init > 0):
+        raise Revert("Prices must be positive")
+    if not (s_res > 0 and s_init > 0):
+        raise Revert("Prices must be positive")
+    if bench == 0:
+        raise Revert("Product not found")
+    first_bid = _first_price(s_init, bench, s_trust)
+
+    price = 0
+    if quality > b_qre and b_res > s_res:
+        if mode == PRICING_MODES["STATIC"]:
+            candidate = bench
+        elif mode == PRICING_MODES["NASH"]:
+            candidate = (s_res + b_res) // 2
+        else:
+            buyer_offer = _first_price(b_init, bench, b_trust)
+            seller_bid = _bound(first_bid, s_res, b_res)
+            buyer_offer = _bound(buyer_offer, s_res, b_res)
+            diff = abs(b_res - s_res)
+            if seller_bid <= buyer_offer:
+                candidate = (seller_bid + buyer_offer) // 2
+            else:
+                candidate = _equilibrium(buyer_offer, seller_bid,
+                                         _behavioral(b_res, buyer_offer, b_la, diff),
+                                         _behavioral(s_res, seller_bid, s_la, diff))
+        if not (candidate <= _lower(s_res, s_la) or candidate >= _upper(b_res, b_la)):
+            price = candidate
+    # MatchedDetail 只在 FULL 级别发出，此时 priceRange 对每一对都会求值
+    price_range = (price > _lower(s_res, s_la) and price < _upper(b_res, b_la)) if detailed else None
+    return {
+        "qualityPassed": quality > b_qre,
+        "reservePriceValid": b_res > s_res,
+        "priceRange": price_range,
+        "dealSuccess": price > 0,
+        "dealPrice": price,
+    }
+
+
+def random_inputs(n, seed):
+    """覆盖各回滚分支的随机定点输入：含0值、相等值以及超过 SCALE 的损失厌恶系数"""
+    rng = np.random.default_rng(seed)
+    inputs = {
+        "benchmarkPrice": rng.integers(0, 2_000_000, n),
+        "qualityFactor": rng.integers(0, 10_000, n),
+        "buyerReserve": rng.integers(0, 2_000_000, n),
+        "buyerInitial": rng.integers(0, 2_000_000, n),
+        "buyerTrust": rng.integers(0, 12_000, n),
+        "buyerLossAversion": rng.integers(0, 120_000, n),
+        "buyerQualityRequest": rng.integers(0, 10_000, n),
+        "sellerReserve": rng.integers(0, 2_000_000, n),
+        "sellerInitial": rng.integers(0, 2_000_000, n),
+        "sellerTrust": rng.integers(0, 12_000, n),
+        "sellerLossAversion": rng.integers(0, 120_000, n),
+    }
+    for name in ("benchmarkPrice", "buyerReserve", "buyerInitial", "sellerReserve", "sellerInitial"):
+        inputs[name][rng.random(n) < 0.02] = 0
+    # 边界相等：P_off = p_0、P_res^b = P_res^s、Q_p = Q_re
+    for left, right in (("sellerInitial", "benchmarkPrice"), ("buyerInitial", "benchmarkPrice"),
+                        ("buyerReserve", "sellerReserve"), ("qualityFactor", "buyerQualityRequest")):
+        tie = rng.random(n) < 0.05
+        inputs[left][tie] = inputs[right][tie]
+    # 保留价区间较窄的样本更常进入 BASELINE 均衡价格分支
+    near = rng.random(n) < 0.5
+    inputs["buyerReserve"][near] = inputs["sellerReserve"][near] + rng.integers(0, 200_000, near.sum())
+    return inputs
+
+
+def _scalar_rows(mode, inputs, detailed):
+    rows = []
+    for values in zip(*(inputs[name].tolist() for name in QUOTE_FIELDS)):
+        try:
+            rows.append(scalar_match(mode, *values, detailed=detailed))
+        except Revert:
+            rows.append(None)
+    return rows
+
+
+def _assert_same(engine, rows, detailed):
+    reverted = np.array([row is None for row in rows])
+    np.testing.assert_array_equal(engine["reverted"], reverted)
+    ok = ~reverted
+    fields = ["qualityPassed", "reservePriceValid", "dealSuccess", "dealPrice"] + (["priceRange"] if detailed else [])
+    for name in fields:
+        expected = np.array([row[name] for row in rows if row is not None])
+        np.testing.assert_array_equal(engine[name][ok], expected, err_msg=name)
+
+
+@pytest.mark.parametrize("detailed", [True, False])
+@pytest.mark.parametrize("mode", list(PRICING_MODES))
+def test_matches_scalar_port(mode, detailed):
+    inputs = random_inputs(20_000, seed=PRICING_MODES[mode] * 2 + detailed)
+    engine = calculate_match(mode, *(inputs[name] for name in QUOTE_FIELDS), detailed_events=detailed)
+    rows = _scalar_rows(PRICING_MODES[mode], inputs, detailed)
+    _assert_same(engine, rows, detailed)
+    # 样本需同时覆盖成交、未成交与回滚
+    assert engine["dealSuccess"].any() and (~engine["dealSuccess"] & ~engine["reverted"]).any()
+    assert engine["reverted"].any()
+
+
+@pytest.mark.parametrize("field", ["buyerReserve", "buyerInitial", "sellerReserve", "sellerInitial", "benchmarkPrice"])
+def test_zero_price_reverts(field):
+    inputs = {name: 5000 for name in QUOTE_FIELDS}
+    inputs.update(benchmarkPrice=1_000_000, buyerReserve=1_200_000, buyerInitial=900_000,
+                  sellerReserve=800_000, sellerInitial=1_100_000, qualityFactor=8000, buyerQualityRequest=3000)
+    assert not calculate_match("NASH", *(inputs[name] for name in QUOTE_FIELDS))["reverted"]
+    inputs[field] = 0
+    result = calculate_match("NASH", *(inputs[name] for name in QUOTE_FIELDS))
+    assert result["reverted"] and result["dealPrice"] == 0
+
+
+def test_rejects_out_of_range_inputs():
+    with pytest.raises(ValueError):
+        priceEngine.calculate_match("NASH", *([-1] + [1] * (len(QUOTE_FIELDS) - 1)))
+
+
+@pytest.mark.parametrize("mode", list(PRICING_MODES))
+def test_matches_deployed_bytecode(tester_runner, mode):
+    """同一组输入在链上逐对执行 addProduct/addSeller/addBuyer/performMatching，与引擎结果逐字段比较"""
+    runner = tester_runner
+    fns = runner.contract.functions
+    inputs = random_inputs(12, seed=100 + PRICING_MODES[mode])
+    engine = calculate_match(mode, *(inputs[name] for name in QUOTE_FIELDS))
+    for k, values in enumerate(zip(*(inputs[name].tolist() for name in QUOTE_FIELDS))):
+        q = dict(zip(QUOTE_FIELDS, values))
+        runner.isolate()
+        runner.set_mode(mode)
+        receipts = [
+            runner._send_transaction(fns.addProduct, "p", q["benchmarkPrice"], q["qualityFactor"], 0),
+            runner._send_transaction(fns.addSeller, "s", q["sellerReserve"], q["sellerInitial"], q["sellerTrust"],
+                                     q["sellerLossAversion"], "p", 5),
+            runner._send_transaction(fns.addBuyer, "b", q["buyerReserve"], q["buyerInitial"], q["buyerTrust"],
+                                     q["buyerLossAversion"], q["buyerQualityRequest"]),
+            runner._send_transaction(fns.performMatching),
+        ]
+        reverted = any(receipt.status == 0 for receipt in receipts)
+        assert engine["reverted"][k] == reverted, q
+        if reverted:
+            continue
+        (detail,) = runner.events.matched_detail(receipts[-1])
+        for name in ("qualityPassed", "reservePriceValid", "priceRange", "dealSuccess", "dealPrice"):
+            assert detail[name] == engine[name][k], (name, q)
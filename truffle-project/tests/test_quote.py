@@ -0,0 +1,76 @@
+"""quote_many：ABI编解码、旧产物的提示，以及链上 quote() 与 priceEngine 的逐对一致性"""
+import numpy as np
+import pytest
+
+pytest.importorskip("eth_tester")
+
+from eth_abi import decode, encode  # noqa: E402
+
+from priceEngine import PRICING_MODES, QUOTE_FIELDS, calculate_match  # noqa: E402
+from test_priceEngine import Revert, random_inputs, scalar_match  # noqa: E402
+
+QUOTE_TYPES = ["uint256", "(" + ",".join(["uint256"] * len(QUOTE_FIELDS)) + ")"]
+
+
+def _fake_node(datas, batch_size=500):
+    """按ABI解码每个调用并用标量移植求值，模拟部署了新版合约的节点"""
+    outputs = []
+    for data in datas:
+        raw = bytes.fromhex(data[2:])
+        mode, q = decode(QUOTE_TYPES, raw[4:])
+        try:
+            row = scalar_match(mode, *q)
+        except Revert:
+            outputs.append(None)
+            continue
+        outputs.append(encode(["uint256", "bool", "bool", "bool"], [
+            row["dealPrice"], row["qualityPassed"], row["reservePriceValid"], row["priceRange"]]))
+    return outputs
+
+
+def _assert_same(onchain, offchain):
+    # 回滚的调用没有返回值，只比较回滚标记
+    np.testing.assert_array_equal(onchain["reverted"], offchain["reverted"])
+    ok = ~offchain["reverted"]
+    for name in ("qualityPassed", "reservePriceValid", "priceRange", "dealSuccess", "dealPrice"):
+        np.testing.assert_array_equal(onchain[name][ok], offchain[name][ok], err_msg=name)
+    assert offchain["reverted"].any() and offchain["dealSuccess"][ok].any()
+
+
+def test_missing_quote_asks_for_recompile(tester_runner):
+    if tester_runner.has_function("quote"):
+        pytest.skip("ABI 已包含 quote")
+    with pytest.raises(RuntimeError, match="truffle compile"):
+        tester_runner.quote_many("NASH", {name: 1 for name in QUOTE_FIELDS})
+
+
+@pytest.mark.parametrize("mode", list(PRICING_MODES))
+def test_encoding_and_decoding(tester_runner, monkeypatch, mode):
+    monkeypatch.setattr(tester_runner, "_function", lambda name: None)
+    monkeypatch.setattr(tester_runner, "_batch_eth_call", _fake_node)
+    inputs = random_inputs(300, seed=200 + PRICING_MODES[mode])
+    onchain = tester_runner.quote_many(mode, inputs)
+    offchain = calculate_match(mode, *(inputs[name] for name in QUOTE_FIELDS))
+    _assert_same(onchain, offchain)
+
+
+def test_selector_matches_eth_abi(tester_runner, monkeypatch):
+    from web3 import Web3
+    sent = []
+    monkeypatch.setattr(tester_runner, "_function", lambda name: None)
+    monkeypatch.setattr(tester_runner, "_batch_eth_call", lambda datas, batch_size: sent.extend(datas) or [None])
+    q = {name: k + 1 for k, name in enumerate(QUOTE_FIELDS)}
+    tester_runner.quote_many("NASH", q)
+    selector = Web3.keccak(text="quote(" + ",".join(QUOTE_TYPES) + ")")[:4]
+    assert sent == ["0x" + (selector + encode(QUOTE_TYPES, [2, tuple(q.values())])).hex()]
+
+
+@pytest.mark.parametrize("mode", list(PRICING_MODES))
+def test_quote_matches_deployed_bytecode(tester_runner, mode):
+    """300 组随机参数经 eth-tester 上的 quote() 求值，与 priceEngine 逐字段一致（含回滚）"""
+    if not tester_runner.has_function("quote"):
+        pytest.skip("build/contracts/DataPrice.json 缺少 quote，需先执行 truffle compile")
+    inputs = random_inputs(300, seed=300 + PRICING_MODES[mode])
+    onchain = tester_runner.quote_many(mode, inputs)
+    offchain = calculate_match(mode, *(inputs[name] for name in QUOTE_FIELDS))
+    _assert_same(onchain, offchain)
@@ -0,0 +1,78 @@
+"""结果缓存：键的稳定性与各组成部分的区分，以及读写往返"""
+import json
+import os
+import subprocess
+import sys
+
+from conftest import PROJECT_DIR
+from resultCache import ResultCache, digest
+from web3DataPrice import TEST_SCENARIOS, backend_identity, cell_seed
+
+BACKEND = {"backend": "eth-tester", "client": "EthereumTester/0.14.0", "hardfork": "prague"}
+BASE = dict(test_id="S1", mode="NASH", repeat_idx=0, seed=12345, code_hash="0xabc", event_verbosity="FULL",
+            backend=BACKEND)
+
+
+def test_digest_ignores_key_order():
+    assert digest({"a": 1, "b": [1, "平衡"]}) == digest({"b": [1, "平衡"], "a": 1})
+
+
+def test_key_changes_with_every_component():
+    base = ResultCache.key(**BASE)
+    assert base == ResultCache.key(**BASE)
+    changes = [("test_id", "S2"), ("mode", "STATIC"), ("repeat_idx", 1), ("seed", 54321), ("code_hash", "0xdef"),
+               ("event_verbosity", "MATCHES"), ("backend", {**BACKEND, "backend": "ganache"}),
+               ("backend", {**BACKEND, "hardfork": "cancun"})]
+    keys = {base} | {ResultCache.key(**{**BASE, name: value}) for name, value in changes}
+    assert len(keys) == len(changes) + 1
+
+
+def test_backend_identity_reads_hardfork_from_block_header():
+    # ganache 7（london）与 ganache 2（muirGlacier）的区块头字段不同
+    assert backend_identity("ganache", "Ganache/v7.9.1", {"baseFeePerGas": 7})["hardfork"] == "london"
+    assert backend_identity("ganache", "EthereumJS TestRPC/v2.13.2", {"number": 0})["hardfork"] == "pre-london"
+    assert backend_identity("eth-tester", "EthereumTester/0.14.0",
+                            {"baseFeePerGas": 7, "withdrawalsRoot": "0x", "blobGasUsed": 0})["hardfork"] == "cancun"
+
+
+def test_key_is_stable_across_processes():
+    # 不依赖内置 hash()，PYTHONHASHSEED 不同的子进程得到相同的键与种子
+    code = ("from resultCache import ResultCache; from web3DataPrice import TEST_SCENARIOS, cell_seed; "
+            f"print(ResultCache.key(**{BASE!r}), cell_seed('S1', 'NASH', 0, TEST_SCENARIOS['S1']))")
+    env = dict(os.environ, PYTHONHASHSEED="7")
+    out = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_DIR, env=env, capture_output=True,
+                         text=True, check=True).stdout.split()
+    assert out == [ResultCache.key(**BASE), str(cell_seed("S1", "NASH", 0, TEST_SCENARIOS["S1"]))]
+
+
+def test_cell_seed_follows_scenario_parameters():
+    seed = cell_seed("S1", "NASH", 0, TEST_SCENARIOS["S1"])
+    assert seed != cell_seed("S1", "NASH", 1, TEST_SCENARIOS["S1"])
+    other = next(s for s in TEST_SCENARIOS.values() if s != TEST_SCENARIOS["S1"])
+    assert seed != cell_seed("S1", "NASH", 0, other)
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = ResultCache.key(**BASE)
+    assert cache.get(key) is None
+    cache.put(key, {"test_id": "S1", "P_off": 100.5, "failure_reason": "质量不达标"})
+    assert cache.get(key) == {"test_id": "S1", "P_off": 100.5, "failure_reason": "质量不达标"}
+    assert os.listdir(tmp_path / key[:2]) == [f"{key}.json"]
+
+
+def test_hit_blanks_timing_columns(tmp_path):
+    # 命中的单元没有重新执行，旧的耗时不作为本次测量
+    cache = ResultCache(str(tmp_path))
+    key = ResultCache.key(**BASE)
+    cache.put(key, {"test_id": "S1", "total_gas": 500000, "offchain_time": 0.01, "match_time": 0.2})
+    assert cache.get(key) == {"test_id": "S1", "total_gas": 500000, "offchain_time": None, "match_time": None}
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = ResultCache.key(**BASE)
+    cache.put(key, {"test_id": "S1"})
+    with open(cache._path(key), "w", encoding="utf-8") as file:
+        file.write(json.dumps({"test_id": "S1"})[:5])
+    assert cache.get(key) is None
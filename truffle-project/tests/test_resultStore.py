@@ -0,0 +1,97 @@
+"""列式结果存储：与逐行构造的普通DataFrame在取值、缺失值与 groupby 结果上一致，DataFrame不回写存储"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from resultStore import ResultStore
+from resultWriter import RESULT_FIELDS
+
+VALUES = ["P_off", "total_gas", "match_success", "PDR"]
+
+
+def sample_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    markets = ["平衡", "买方市场", "卖方市场"]
+    rows = []
+    for k in range(n):
+        success = int(rng.random() < 0.6)
+        rows.append({
+            "test_id": f"S{rng.integers(1, 6)}",
+            "mode": ["STATIC", "NASH", "BASELINE"][rng.integers(0, 3)],
+            "repeat_idx": k % 7,
+            "scenario": f'{{"market": "{markets[rng.integers(0, 3)]}"}}',
+            "P_off": float(rng.uniform(50, 150)) if success else None,
+            "total_gas": int(rng.integers(200_000, 900_000)),
+            "match_success": success,
+            "PDR": float(rng.random()),
+            "failure_reason": "" if success else ["质量不达标", "保留价无交集"][rng.integers(0, 2)],
+        })
+    return rows
+
+
+def plain_frame(rows):
+    df = pd.DataFrame([{name: row.get(name) for name in RESULT_FIELDS} for row in rows], columns=RESULT_FIELDS)
+    df["failure_reason"] = df["failure_reason"].replace("", None)
+    return df
+
+
+def test_groupby_matches_plain_strings():
+    rows = sample_rows(5000)
+    store = ResultStore(capacity=16, chunk_size=700).extend(rows)
+    df = store.to_frame()
+    plain = plain_frame(rows)
+    assert df["mode"].dtype == "category" and df["scenario"].dtype == "category"
+    for keys in (["mode"], ["test_id", "mode"], ["scenario", "mode"]):
+        got = df.groupby(keys, observed=True)[VALUES].mean().reset_index()
+        expected = plain.groupby(keys)[VALUES].mean().reset_index()
+        # 仅比较分组键的取值，不比较 category 与字符串列的dtype
+        got[keys], expected[keys] = got[keys].astype(str), expected[keys].astype(str)
+        pd.testing.assert_frame_equal(got, expected)
+    counts = df["failure_reason"].value_counts().sort_index()
+    assert counts.to_dict() == plain["failure_reason"].value_counts().sort_index().to_dict()
+
+
+def test_rows_round_trip():
+    rows = sample_rows(300, seed=1)
+    store = ResultStore(chunk_size=64)
+    for row in rows:
+        store.append(row)
+    assert len(store) == 300
+    for k in (0, 63, 64, 299):
+        expected = {name: value for name, value in rows[k].items() if value not in (None, "")}
+        assert store.row(k) == expected
+    assert store[-1] == store.row(299)
+
+
+def test_csv_strings_and_missing_ints():
+    store = ResultStore().extend([{"test_id": "S1", "repeat_idx": "3", "total_gas": "", "PDR": "0.5"},
+                                  {"test_id": "S1", "repeat_idx": "4", "total_gas": "1000", "PDR": "x"}])
+    df = store.to_frame()
+    assert df["repeat_idx"].dtype == "int64" and df["repeat_idx"].tolist() == [3, 4]
+    assert np.isnan(df["total_gas"][0]) and df["total_gas"][1] == 1000
+    assert df["PDR"][0] == 0.5 and np.isnan(df["PDR"][1])
+
+
+def test_row_lookup_does_not_rebuild_categories():
+    rows = [{"test_id": f"S{k}", "mode": "NASH", "repeat_idx": k} for k in range(2000)]
+    store = ResultStore().extend(rows)
+    assert [store.row(k)["test_id"] for k in (0, 1234, 1999)] == ["S0", "S1234", "S1999"]
+    assert store._values["test_id"][:3] == ["S0", "S1", "S2"]
+    assert all(store._values["test_id"][code] == value for value, code in store._categories["test_id"].items())
+
+
+def test_frame_mutation_does_not_write_through():
+    rows = sample_rows(50, seed=2)
+    store = ResultStore(capacity=64).extend(rows)
+    df = store.to_frame()
+    # 零拷贝列为只读：原地修改报错，而不是悄悄改写存储
+    for name in ("PDR", "total_gas"):
+        with pytest.raises(ValueError):
+            df.loc[0, name] = -1
+    df["PDR"] = df["PDR"] * 0
+    df["total_gas"] += 1
+    assert store.row(0)["PDR"] == rows[0]["PDR"] and store.row(0)["total_gas"] == rows[0]["total_gas"]
+    # 存储本身仍可继续追加，已取出的DataFrame不受影响
+    store.extend(sample_rows(30, seed=3))
+    assert len(store) == 80 and len(df) == 50
+    assert store.to_frame()["PDR"].tolist()[:50] == [row["PDR"] for row in rows]
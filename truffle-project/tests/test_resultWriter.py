@@ -0,0 +1,93 @@
+"""流式结果写出：残行处理、续跑判断（completed）、分片合并与 load()"""
+import json
+
+import pytest
+
+from resultWriter import RESULT_FIELDS, ResultWriter, cell_key
+
+
+def result(test_id="S1", mode="NASH", repeat_idx=0, **fields):
+    row = {"test_id": test_id, "mode": mode, "repeat_idx": repeat_idx, "scenario": '{"market": "平衡"}',
+           "P_off": 100.5, "total_gas": 500000, "match_success": 1, "PDR": 0.25}
+    row.update(fields)
+    return row
+
+
+@pytest.fixture(params=["jsonl", "csv"])
+def fmt(request):
+    return request.param
+
+
+def test_truncated_last_line_is_ignored_and_terminated(tmp_path, fmt):
+    writer = ResultWriter.for_run(str(tmp_path), "run", fmt)
+    writer.write(result(repeat_idx=0))
+    writer.write(result(repeat_idx=1))
+    # 模拟写第三行时进程被杀：末行只写了一半且没有换行
+    with open(writer.path, "a", encoding="utf-8") as file:
+        file.write('{"test_id": "S1", "mode": "NASH", "repeat_i' if fmt == "jsonl" else "S1,2,NASH")
+    assert len(ResultWriter.for_run(str(tmp_path), "run", fmt)._read_rows()) == 2
+
+    # 续跑：重新打开时补上换行，新结果不会与残行拼接
+    resumed = ResultWriter.for_run(str(tmp_path), "run", fmt)
+    resumed.write(result(repeat_idx=2))
+    with open(resumed.path, "rb") as file:
+        assert file.read().endswith(b"\n")
+    assert resumed.completed() == {cell_key("S1", "NASH", k) for k in range(3)}
+
+
+def test_completed_skips_errors_and_keeps_latest_row(tmp_path, fmt):
+    writer = ResultWriter.for_run(str(tmp_path), "run", fmt)
+    writer.write(result(repeat_idx=0))
+    writer.write(result(repeat_idx=1, error="Snapshot revert failed"))
+    writer.write(result(repeat_idx=2, error="timeout"))
+    writer.write(result(repeat_idx=2, total_gas=640000))
+    assert writer.completed() == {cell_key("S1", "NASH", 0), cell_key("S1", "NASH", 2)}
+    df = writer.load()
+    assert len(df) == 3
+    assert df.set_index("repeat_idx").loc[2, "total_gas"] == 640000
+
+
+def test_cell_key_matches_values_read_back(tmp_path):
+    # CSV读回的 repeat_idx 为字符串，键统一为字符串后可与内存中的值比较
+    writer = ResultWriter.for_run(str(tmp_path), "run", "csv")
+    writer.write(result(repeat_idx=7))
+    assert cell_key("S1", "NASH", 7) in writer.completed()
+
+
+def test_shards_are_merged(tmp_path, fmt):
+    writer = ResultWriter.for_run(str(tmp_path), "run", fmt)
+    writer.write(result(test_id="S1"))
+    writer.shard(0).write(result(test_id="S2"))
+    writer.shard(1).write(result(test_id="S3", error="boom"))
+    assert writer.completed() == {cell_key("S1", "NASH", 0), cell_key("S2", "NASH", 0)}
+    assert sorted(writer.load()["test_id"]) == ["S1", "S2", "S3"]
+
+
+def test_load_types_match_in_memory_results(tmp_path, fmt):
+    writer = ResultWriter.for_run(str(tmp_path), "run", fmt)
+    rows = [result(repeat_idx=k, PDR=k / 3, failure_reason="" if k else "质量不达标") for k in range(4)]
+    for row in rows:
+        writer.write(row)
+    df = writer.load()
+    assert list(df.columns) == RESULT_FIELDS
+    assert df["repeat_idx"].dtype == "int64" and df["total_gas"].dtype == "int64"
+    assert df["PDR"].tolist() == [row["PDR"] for row in rows]
+    assert df["failure_reason"].isna().tolist() == [False, True, True, True]
+
+
+def test_empty_run_loads_empty_frame(tmp_path):
+    writer = ResultWriter.for_run(str(tmp_path), "run", "jsonl")
+    df = writer.load()
+    assert df.empty and list(df.columns) == RESULT_FIELDS
+
+
+def test_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        ResultWriter(str(tmp_path / "results.txt"))
+
+
+def test_jsonl_rows_are_plain_json(tmp_path):
+    writer = ResultWriter.for_run(str(tmp_path), "run", "jsonl")
+    writer.write(result())
+    with open(writer.path, encoding="utf-8") as file:
+        assert json.loads(file.readline())["scenario"] == '{"market": "平衡"}'
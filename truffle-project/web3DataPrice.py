@@ -2,9 +2,19 @@ import json
 import time
 import math
 import os
-import pandas as pd
-from web3 import Web3, HTTPProvider
+import numpy as np
+from web3 import Web3, HTTPProvider, EthereumTesterProvider
 import random
+import threading
+
+from adaptiveScheduler import AdaptiveScheduler
+from artifactCache import load_artifact
+from logDecoder import EventDecoder
+from phaseTimer import PhaseTimer
+from priceEngine import QUOTE_FIELDS, match_from_params
+from resultCache import ResultCache, digest
+from resultStore import ResultStore
+from resultWriter import ResultWriter, cell_key
 # ========================= 实验参数配置 =========================
 # 测试场景矩阵
 TEST_SCENARIOS = {
@@ -125,59 +135,381 @@ def calculate_offchain_params(scenario, quality_params):
         "Q_p": Q_p,
         "P_off": P_off
     }
+
+def cell_seed(test_id, mode, repeat_idx, scenario):
+    """
+    实验单元的稳定种子：对单元键与该场景实际使用的参数配置取摘要，
+    跨进程、跨运行一致，场景参数改动后种子随之变化
+    """
+    payload = {
+        "cell": [test_id, mode, repeat_idx],
+        "scenario": scenario,
+        "market": MARKET_SCENARIOS[scenario["market"]],
+        "quality": QUALITY_PROFILES[scenario["quality"]],
+        "trader": TRADER_PARAMS,
+    }
+    return int(digest(payload)[:8], 16)
+
+# ======================= 批量参数生成 =========================
+# 与上面的标量生成函数分布一致，按列返回 NumPy 数组；每个场景使用独立的随机流，互不共享全局random状态
+# 交易者保留价的市场场景调整系数
+RESERVE_ADJUST = {"供过于求": 0.9, "高波动": 1.1}
+
+def scenario_rng(test_id, scenario, seed=0):
+    """场景专属随机流：由场景ID、场景参数与种子的摘要派生，结果与各场景的执行顺序无关"""
+    payload = {
+        "test_id": test_id,
+        "scenario": scenario,
+        "market": MARKET_SCENARIOS[scenario["market"]],
+        "quality": QUALITY_PROFILES[scenario["quality"]],
+        "trader": TRADER_PARAMS,
+        "seed": seed,
+    }
+    return np.random.default_rng(np.random.SeedSequence(int(digest(payload), 16)))
+
+def generate_quality_batch(quality_type, n, rng, profile=None):
+    """批量生成n组质量指标：{指标名: 长度n的数组}；profile 可替换 QUALITY_PROFILES 中的配置（参数扫描用）"""
+    profile = profile or QUALITY_PROFILES[quality_type]
+    low, high = 1 - profile["range"], 1 + profile["range"]
+    return {
+        k: np.clip(v * rng.uniform(low, high, n), 0.1, 1.0)
+        for k, v in profile["base"].items()
+    }
+
+def generate_trader_params_batch(role, market_scenario, P_off, rng):
+    """批量生成交易者参数，P_off 为参考价数组（每个元素对应一个交易者），字段名与 generate_trader_params 一致"""
+    P_off = np.asarray(P_off, dtype=np.float64)
+    n = P_off.size
+    ranges = TRADER_PARAMS[role]
+    adjust = RESERVE_ADJUST.get(market_scenario, 1.0)
+    if role == "seller":
+        P_res_s = P_off * rng.uniform(0.5, 1.05, n) * adjust
+        return {
+            "P_res_s": P_res_s,
+            "p0_s": P_res_s * rng.uniform(1.05, 1.7, n),
+            "ρ_s": rng.uniform(*ranges["ρ_s"], n),
+            "λ_cre_s": rng.uniform(*ranges["λ_cre_s"], n)
+        }
+    P_res_b = P_off * rng.uniform(0.95, 1.5, n) * adjust
+    return {
+        "P_res_b": P_res_b,
+        "p0_b": P_res_b * rng.uniform(0.3, 0.95, n),
+        "ρ_b": rng.uniform(*ranges["ρ_b"], n),
+        "λ_cre_b": rng.uniform(*ranges["λ_cre_b"], n),
+        "Q_re": np.full(n, 0.3)
+    }
+
+def calculate_offchain_params_batch(scenario, quality_params, rng, market=None):
+    """
+    批量计算链下定价参数（M_d / Q_p / P_off），quality_params 为 generate_quality_batch 的输出；
+    market 可替换 MARKET_SCENARIOS 中的市场参数（扰动幅度仍按 scenario["market"] 的类型确定）
+    """
+    market = market or MARKET_SCENARIOS[scenario["market"]]
+    n = len(next(iter(quality_params.values())))
+    spread = 0.10 if scenario["market"] == "高波动" else 0.05
+    adjusted_d = market["D"] * (1 + rng.uniform(-spread, spread, n))
+    supply_ratio = adjusted_d / (market["ζ_p"] * market["S"])
+    S_scar = np.log(math.e - 1 + supply_ratio)
+    M_d = market["λ_p"] * market["P̄"] * S_scar
+    # Q_p = ∏(S_i^0.2)，固定等权重
+    Q_p = np.prod([quality_params[k] ** 0.2 for k in ("S_rep", "S_trans", "S_comp", "S_proc", "S_user")], axis=0)
+    return {"M_d": M_d, "Q_p": Q_p, "P_off": M_d * Q_p}
+
+def sample_scenario(test_id, scenario, n, seed=0):
+    """
+    为场景生成n组完整的单次实验参数（质量 → 链下价格 → 一个卖家 + 一个买家），按列返回。
+    买卖家列可直接传入 priceEngine.match_from_params 做批量分析，或经 column_rows 拆成逐行字典交给链上运行器
+    """
+    rng = scenario_rng(test_id, scenario, seed)
+    quality = generate_quality_batch(scenario["quality"], n, rng)
+    offchain = calculate_offchain_params_batch(scenario, quality, rng)
+    seller = generate_trader_params_batch("seller", scenario["market"], offchain["P_off"], rng)
+    buyer = generate_trader_params_batch("buyer", scenario["market"], offchain["P_off"], rng)
+    return {**quality, **offchain, **seller, **buyer}
+
+def column_rows(columns, keys=None):
+    """列式数组 → 逐行字典列表（值为Python浮点数），keys 指定需要的字段"""
+    keys = list(keys or columns)
+    return [dict(zip(keys, values)) for values in zip(*(np.asarray(columns[k]).tolist() for k in keys))]
+def sample_cell(test_id, repeat_idx, mode, scenario, timer):
+    """
+    按实验单元种子生成单次测试的链下参数（质量 → M_d/Q_p/P_off → 买卖家参数）与链上ID，
+    抽样顺序与种子确定了结果，run_matching 与 asyncRunner 共用
+    """
+    random.seed(cell_seed(test_id, mode, repeat_idx, scenario))
+    with timer.span("offchain", "quality"):
+        quality_params = generate_quality(scenario["quality"])
+    # 计算链下参数（微秒级耗时，保留纳秒精度）
+    start_time = time.perf_counter_ns()
+    offchain_data = calculate_offchain_params(scenario, quality_params)
+    elapsed_ns = time.perf_counter_ns() - start_time
+    timer.record("offchain", "offchain_params", elapsed_ns)
+    P_off = offchain_data["P_off"]
+    with timer.span("offchain", "trader_params"):
+        seller_params = generate_trader_params("seller", scenario["market"], P_off)
+        buyer_params = generate_trader_params("buyer", scenario["market"], P_off)
+    return {
+        "P_off": P_off,
+        "Q_p": offchain_data["Q_p"],
+        "period_enum": PERIOD_ENUM_MAP[scenario["market"]],
+        "offchain_time": elapsed_ns / 1e9,
+        "seller_params": seller_params,
+        "buyer_params": buyer_params,
+        "product_id": f"{test_id}_{mode}_{repeat_idx}",
+        "seller_id": f"seller_{test_id}_{repeat_idx}",
+        "buyer_id": f"buyer_{test_id}_{repeat_idx}",
+    }
 # ===================== 智能合约交互模块 =======================
+def connect_backend(backend, ganache_url=None):
+    """
+    创建链连接：ganache 通过HTTP连接外部节点；eth-tester 在进程内启动自动出块的py-evm链
+    （需安装 eth-tester[py-evm]）
+    """
+    if backend == "ganache":
+        return Web3(HTTPProvider(ganache_url))
+    if backend == "eth-tester":
+        return Web3(EthereumTesterProvider())
+    raise ValueError(f"未知的链后端: {backend}")
+
+# 区块头中随硬分叉引入的字段（由新到旧），用于识别链后端所处的硬分叉
+HARDFORK_FIELDS = [("requestsHash", "prague"), ("blobGasUsed", "cancun"), ("withdrawalsRoot", "shanghai"),
+                   ("baseFeePerGas", "london")]
+
+def backend_identity(backend, client_version, block):
+    """链后端标识（后端类型、客户端版本、由最新区块头推断的硬分叉），作为结果缓存键的一部分"""
+    hardfork = next((name for field, name in HARDFORK_FIELDS if field in block), "pre-london")
+    return {"backend": backend, "client": client_version, "hardfork": hardfork}
+
+def deploy_contract(w3, artifact_path, account):
+    """使用truffle编译产物中的字节码部署一个新的DataPrice实例，返回合约地址"""
+    contract_data = load_artifact(artifact_path)
+    factory = w3.eth.contract(abi=contract_data['abi'], bytecode=contract_data['bytecode'])
+    tx_hash = factory.constructor().transact({'from': account})
+    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    return receipt['contractAddress']
+
+class NonceManager:
+    """本地nonce分配器：只在首次使用或出错后向节点同步一次，其余均在本地递增"""
+    def __init__(self, w3, account):
+        self.w3 = w3
+        self.account = account
+        self._next_nonce = None
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """从节点重新同步nonce（包含pending交易）"""
+        with self._lock:
+            self._next_nonce = self.w3.eth.get_transaction_count(self.account, 'pending')
+
+    def allocate(self):
+        """分配下一个nonce"""
+        if self._next_nonce is None:
+            self.sync()
+        with self._lock:
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
 class ContractRunner:
-    def __init__(self, contract_address, abi_path, ganache_url):
-        # 连接Ganache本地链
-        self.w3 = Web3(HTTPProvider(ganache_url)) 
+    mode_map = {"BASELINE": 0, "STATIC": 1, "NASH": 2}
+    verbosity_map = {"OFF": 0, "MATCHES": 1, "FULL": 2}
+
+    def __init__(self, contract_address, abi_path, ganache_url, pipelined=False, account=None, isolation="reset",
+                 backend="ganache", event_verbosity="FULL", writer=None, cache=None, timer=None):
+        # 连接链后端（默认Ganache本地链）
+        self.backend = backend
+        self.w3 = connect_backend(backend, ganache_url)
         # 检查连接
         if not self.w3.is_connected():
             raise ConnectionError("无法连接到Ganache节点")       
-        # 设置默认账户
-        self.account = self.w3.eth.accounts[2] # 使用第3个解锁账户   
+        # 分阶段耗时统计（build / nonce / send / receipt / decode 及链下计算）
+        self.timer = timer or PhaseTimer()
+        # 设置默认账户（并行运行时每个worker使用独立账户）
+        self.account = account or self.w3.eth.accounts[2] # 默认使用第3个解锁账户   
+        # 进程内链上没有已部署的合约，直接使用编译产物中的字节码部署
+        if contract_address is None:
+            contract_address = deploy_contract(self.w3, abi_path, self.account)
         # 加载合约ABI
-        with open(abi_path, 'r', encoding='utf-8') as file:
-            contract_data = json.load(file)
-        abi = contract_data['abi']
+        abi = load_artifact(abi_path)['abi']
         self.contract = self.w3.eth.contract(address=contract_address, abi=abi)
-        # 实验数据收集器
-        self.results = []
+        self.events = EventDecoder(self.contract)
+        # 紧凑布局以bytes32存储ID，超长ID在发送前拒绝
+        self.max_id_bytes = self._packed_id_bytes(abi)
+        # 链上实际部署的运行时字节码哈希，作为结果缓存键的一部分
+        self.code_hash = Web3.to_hex(Web3.keccak(self.w3.eth.get_code(contract_address)))
+        self.backend_id = backend_identity(backend, self.w3.client_version, self.w3.eth.get_block("latest"))
+        self.cache = cache
+        # 实验数据收集器（列式存储；指定writer时结果逐条落盘，不在内存中累积）
+        self.results = ResultStore()
+        self.writer = writer
+        # 流水线模式：本地分配nonce，连续发送交易后批量收取收据
+        self.pipelined = pipelined
+        self.nonces = NonceManager(self.w3, self.account)
+        self._pending = []
+        # 测试隔离方式："snapshot" 使用 evm_snapshot/evm_revert，"reset" 使用 resetAll + resetMatchingState
+        self.isolation = isolation
+        self._snapshot_id = None
+        # 事件详细程度需在拍摄快照前设置，回滚快照后保持不变
+        self.event_verbosity = event_verbosity
+        self.set_event_verbosity(event_verbosity)
+        if isolation == "snapshot":
+            self.prepare_snapshot()
     
-    def _send_transaction(self, func, *args, **kwargs):
-        """发送交易并等待收据"""
-        txn = func(*args, **kwargs).build_transaction({
-            'from': self.account,
-            'nonce': self.w3.eth.get_transaction_count(self.account),
-            'gas': 8000000,  # 足够大的gas限制
-            'gasPrice': self.w3.to_wei('10', 'gwei')
-        })
+    def _build_transaction(self, func, *args, nonce=None, gas=8000000, **kwargs):
+        """构建交易（nonce为空时向节点查询）"""
+        if nonce is None:
+            with self.timer.span(func.fn_name, "nonce"):
+                nonce = self.w3.eth.get_transaction_count(self.account)
+        with self.timer.span(func.fn_name, "build"):
+            return func(*args, **kwargs).build_transaction({
+                'from': self.account,
+                'nonce': nonce,
+                'gas': gas,  # 默认足够大的gas限制
+                'gasPrice': self.w3.to_wei('10', 'gwei')
+            })
+
+    def _allocate_nonce(self, operation):
+        """流水线模式下的本地nonce分配（计入nonce阶段）"""
+        with self.timer.span(operation, "nonce"):
+            return self.nonces.allocate()
+
+    def _raw_send(self, txn):
+        """发送交易，超出区块gas上限时降低gas重试"""
         # Ganache特有：直接发送未签名交易
         try:
-            tx_hash = self.w3.eth.send_transaction(txn)
-            return self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            return self.w3.eth.send_transaction(txn)
         except Exception as e:
             if "exceeds block gas limit" in str(e):
                 txn['gas'] = 3000000
-                tx_hash = self.w3.eth.send_transaction(txn)
-                return self.w3.eth.wait_for_transaction_receipt(tx_hash)
-            raise   
+                return self.w3.eth.send_transaction(txn)
+            raise
+
+    @staticmethod
+    def _packed_id_bytes(abi):
+        """Seller.id 为bytes32时（DataPriceCompact）返回ID的字节上限，string ID返回None"""
+        for item in abi:
+            if item.get("name") == "getAllSellers":
+                for component in item["outputs"][0].get("components", []):
+                    if component["name"] == "id" and component["type"] == "bytes32":
+                        return 32
+        return None
+
+    def _check_ids(self, func, args):
+        """紧凑布局下超过32字节的ID会使合约回滚（Id longer than 32 bytes），在分配nonce前直接报错"""
+        if self.max_id_bytes is None:
+            return
+        for arg in args:
+            for value in (arg if isinstance(arg, (list, tuple)) else [arg]):
+                if isinstance(value, str) and len(value.encode("utf-8")) > self.max_id_bytes:
+                    raise ValueError(f"{func.fn_name}: ID {value!r} 超过{self.max_id_bytes}字节（UTF-8），"
+                                     f"紧凑布局以bytes32存储ID")
+
+    def _send_transaction(self, func, *args, **kwargs):
+        """发送交易并等待收据"""
+        self._check_ids(func, args)
+        nonce = self._allocate_nonce(func.fn_name) if self.pipelined else None
+        txn = self._build_transaction(func, *args, nonce=nonce, **kwargs)
+        try:
+            with self.timer.span(func.fn_name, "send"):
+                tx_hash = self._raw_send(txn)
+        except Exception:
+            if self.pipelined:
+                self.nonces.sync()
+            raise
+        with self.timer.span(func.fn_name, "receipt"):
+            return self.w3.eth.wait_for_transaction_receipt(tx_hash)
+
+    def _submit_transaction(self, func, *args, tag=None, **kwargs):
+        """流水线发送：使用本地nonce发送交易但不等待收据，收据由collect_receipts统一收取"""
+        self._check_ids(func, args)
+        txn = self._build_transaction(func, *args, nonce=self._allocate_nonce(func.fn_name), **kwargs)
+        try:
+            with self.timer.span(func.fn_name, "send"):
+                tx_hash = self._raw_send(txn)
+        except Exception:
+            # 未进入交易池的nonce需要重新同步，避免后续交易卡住
+            self.nonces.sync()
+            raise
+        self._pending.append((tag, tx_hash, func.fn_name))
+        return tx_hash
+
+    def collect_receipts(self, timeout=120):
+        """
+        批量收取已发送交易的收据。
+        返回 [(tag, receipt, error)]，失败（回滚或超时）的交易error非空，便于归因到发送它的测试
+        """
+        pending, self._pending = self._pending, []
+        collected = []
+        for tag, tx_hash, operation in pending:
+            try:
+                with self.timer.span(operation, "receipt"):
+                    receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+                error = None if receipt['status'] == 1 else f"Transaction reverted: {self.w3.to_hex(tx_hash)}"
+            except Exception as e:
+                receipt, error = None, str(e)
+            collected.append((tag, receipt, error))
+        return collected
 
     def set_mode(self, mode_name):
         """设置合约定价模式"""
-        mode_map = {"BASELINE": 0, "STATIC": 1, "NASH": 2}
         self._send_transaction(
             self.contract.functions.setPricingMode,
-            mode_map[mode_name]
+            self.mode_map[mode_name]
         ) 
 
+    def set_batch_size(self, batch_size):
+        """设置每次 performMatching 处理的买家数（与链上一致时不发送交易）"""
+        fns = self.contract.functions
+        if batch_size == fns.batchSize().call():
+            return None
+        if not hasattr(fns, "setBatchSize"):
+            raise RuntimeError("当前ABI缺少setBatchSize，请先执行 truffle compile 更新 build/contracts/DataPrice.json")
+        return self._send_transaction(fns.setBatchSize, batch_size)
+
+    def set_event_verbosity(self, level):
+        """设置合约事件详细程度：OFF / MATCHES / FULL（合约默认FULL，与链上一致时不发送交易）"""
+        if not self.has_function("setEventVerbosity") and level == "FULL":
+            return None
+        setter = self._function("setEventVerbosity")
+        if self.contract.functions.eventVerbosity().call() == self.verbosity_map[level]:
+            return None
+        return self._send_transaction(setter, self.verbosity_map[level])
+
+    @staticmethod
+    def _product_args(product_id, P_off, Q_p, period_enum):
+        """addProduct 调用参数"""
+        return (product_id, int(P_off), int(Q_p), period_enum)
+
+    @staticmethod
+    def _seller_args(seller_id, params, product_id, max_match_count=5):
+        """addSeller 调用参数"""
+        return (
+            seller_id,
+            int(params["P_res_s"] * 10000),
+            int(params["p0_s"] * 10000),
+            int(params["ρ_s"] * 10000),
+            int(params["λ_cre_s"] * 10000),
+            product_id,
+            max_match_count  # N_limit
+        )
+
+    @staticmethod
+    def _buyer_args(buyer_id, params):
+        """addBuyer 调用参数"""
+        return (
+            buyer_id,
+            int(params["P_res_b"] * 10000),
+            int(params["p0_b"] * 10000),
+            int(params["ρ_b"] * 10000),
+            int(params["λ_cre_b"] * 10000),
+            int(params.get("Q_re", 0.3) * 10000)  # 默认质量阈值
+        )
+
     def add_product(self, product_id, P_off, Q_p, period_enum):
         """添加产品数据到链上"""
         tx_receipt = self._send_transaction(
             self.contract.functions.addProduct,
-            product_id,
-            int(P_off),
-            int(Q_p),
-            period_enum
+            *self._product_args(product_id, P_off, Q_p, period_enum)
         )
         return tx_receipt
     
@@ -185,13 +517,7 @@ class ContractRunner:
         """添加卖家（使用随机参数）"""
         tx_receipt = self._send_transaction(
             self.contract.functions.addSeller,
-            seller_id,
-            int(params["P_res_s"] * 10000),
-            int(params["p0_s"] * 10000),
-            int(params["ρ_s"] * 10000),
-            int(params["λ_cre_s"] * 10000),
-            product_id,
-            5  # N_limit
+            *self._seller_args(seller_id, params, product_id)
         )
         return tx_receipt
     
@@ -199,15 +525,159 @@ class ContractRunner:
         """添加买家（使用随机参数）"""
         tx_receipt = self._send_transaction(
             self.contract.functions.addBuyer,
-            buyer_id,
-            int(params["P_res_b"] * 10000),
-            int(params["p0_b"] * 10000),
-            int(params["ρ_b"] * 10000),
-            int(params["λ_cre_b"] * 10000),
-            int(params.get("Q_re", 0.3) * 10000)  # 默认质量阈值
+            *self._buyer_args(buyer_id, params)
         )
         return tx_receipt
     
+    @staticmethod
+    def _columns(rows):
+        """逐条调用参数转为批量函数所需的平行数组"""
+        return [list(column) for column in zip(*rows)]
+
+    def send_many(self, calls, gas=8000000, tag=None):
+        """
+        按顺序发送一组交易 [(func, args)]，流水线模式下连续发送后批量收取收据。
+        任一交易回滚时抛出异常；返回收据列表
+        """
+        if self.pipelined:
+            for func, args in calls:
+                self._submit_transaction(func, *args, tag=tag, gas=gas)
+            collected = self.collect_receipts()
+        else:
+            collected = []
+            for func, args in calls:
+                receipt = self._send_transaction(func, *args, gas=gas)
+                collected.append((tag, receipt, None if receipt['status'] == 1 else "Transaction reverted"))
+        for call_tag, _, error in collected:
+            if error:
+                raise RuntimeError(f"{call_tag or 'batch'} failed: {error}")
+        return [receipt for _, receipt, _ in collected]
+
+    def match_candidates(self, plan, gas=8000000):
+        """
+        定向撮合：plan 为 [(买家下标, [卖家下标...])]（卖家下标严格递增，见 CandidateIndex.plan），
+        合约只对给出的买卖对重新校验并撮合，返回交易收据
+        """
+        func = self._function("performMatchingWithCandidates")
+        buyer_indices = [int(buyer) for buyer, _ in plan]
+        candidates = [[int(seller) for seller in sellers] for _, sellers in plan]
+        return self._send_transaction(func, buyer_indices, candidates, gas=gas)
+
+    def has_function(self, name):
+        """合约ABI是否包含该函数（旧编译产物缺少新增的函数）"""
+        return hasattr(self.contract.functions, name)
+
+    def _function(self, name):
+        """按名称取合约函数，ABI中没有时提示重新编译"""
+        if not self.has_function(name):
+            raise RuntimeError(f"当前ABI缺少{name}，请先执行 truffle compile 更新 build/contracts/DataPrice.json")
+        return getattr(self.contract.functions, name)
+
+    def _bulk_chunk_size(self, func, rows, gas_limit, target=0.8):
+        """用少量样本估算单条目gas，推算一笔批量交易在区块gas上限内可容纳的条目数"""
+        sample = rows[:8]
+        estimate = func(*self._columns(sample)).estimate_gas({'from': self.account})
+        per_item = max(1, (estimate - 21000) / len(sample))
+        return max(1, int((gas_limit * target - 21000) // per_item))
+
+    def _send_bulk(self, func, rows, tag):
+        """按区块gas上限将条目切块，每块一笔批量交易"""
+        if not rows:
+            return []
+        gas_limit = self.w3.eth.get_block('latest')['gasLimit']
+        size = self._bulk_chunk_size(func, rows, gas_limit)
+        calls = [(func, self._columns(rows[i:i + size])) for i in range(0, len(rows), size)]
+        return self.send_many(calls, gas=gas_limit, tag=tag)
+
+    def add_products(self, products):
+        """批量添加产品：products 为 [(product_id, P_off, Q_p, period_enum)]"""
+        return self._send_bulk(
+            self._function("addProducts"),
+            [self._product_args(*product) for product in products],
+            "addProducts"
+        )
+
+    def add_sellers(self, sellers):
+        """批量添加卖家：sellers 为 [(seller_id, params, product_id[, max_match_count])]，对应产品需已上链"""
+        return self._send_bulk(
+            self._function("addSellers"),
+            [self._seller_args(*seller) for seller in sellers],
+            "addSellers"
+        )
+
+    def add_buyers(self, buyers):
+        """批量添加买家：buyers 为 [(buyer_id, params)]"""
+        return self._send_bulk(
+            self._function("addBuyers"),
+            [self._buyer_args(*buyer) for buyer in buyers],
+            "addBuyers"
+        )
+
+    def _batch_eth_call(self, datas, batch_size=500):
+        """
+        以JSON-RPC批量请求发送一组 eth_call（每批 batch_size 个），返回每个调用的返回数据（bytes），回滚的调用为None。
+        不支持批量请求的provider（如进程内eth-tester）逐个调用
+        """
+        provider = self.w3.provider
+        request = {"from": self.account, "to": self.contract.address}
+        outputs = []
+        for start in range(0, len(datas), batch_size):
+            calls = [("eth_call", [dict(request, data=data), "latest"]) for data in datas[start:start + batch_size]]
+            with self.timer.span("quote", "rpc"):
+                if isinstance(provider, HTTPProvider):
+                    responses = provider.make_batch_request(calls)
+                    if isinstance(responses, dict):
+                        # 整批被节点拒绝时返回单个错误响应
+                        raise RuntimeError(f"批量eth_call失败: {responses.get('error')}")
+                else:
+                    responses = []
+                    for method, params in calls:
+                        try:
+                            responses.append(provider.make_request(method, params))
+                        except Exception as e:
+                            responses.append({"error": str(e)})
+            for response in responses:
+                result = response.get("result")
+                if "error" in response or result is None:
+                    outputs.append(None)
+                else:
+                    outputs.append(Web3.to_bytes(hexstr=result) if isinstance(result, str) else bytes(result))
+        return outputs
+
+    def quote_many(self, mode, quotes, batch_size=500):
+        """
+        通过合约的 view 函数 quote 批量报价，不发送交易。
+        quotes 为以 QUOTE_FIELDS 为键的定点整数（标量或等长数组，可由 priceEngine.fixed_inputs 生成）；
+        返回与 priceEngine.calculate_match 同名字段的数组字典，reverted 标记链上会回滚的参数组合
+        """
+        self._function("quote")
+        with self.timer.span("quote", "encode"):
+            columns = np.broadcast_arrays(*(np.asarray(quotes[name], dtype=np.int64) for name in QUOTE_FIELDS))
+            words = np.column_stack([np.full(columns[0].size, self.mode_map[mode], dtype=np.int64)]
+                                    + [column.ravel() for column in columns])
+            if words.size and words.min() < 0:
+                raise ValueError("报价参数必须为非负定点整数")
+            # QuoteInput 全部为静态uint256字段，ABI编码即为按序排列的32字节大端字
+            encoded = np.zeros(words.shape + (32,), dtype=np.uint8)
+            encoded[:, :, 24:] = words.astype(">u8").view(np.uint8).reshape(words.shape + (8,))
+            selector = bytes(Web3.keccak(text=f"quote(uint256,({','.join(['uint256'] * len(QUOTE_FIELDS))}))"))[:4].hex()
+            datas = ["0x" + selector + row.tobytes().hex() for row in encoded]
+        outputs = self._batch_eth_call(datas, batch_size)
+        with self.timer.span("quote", "decode"):
+            reverted = np.array([output is None for output in outputs], dtype=bool)
+            decoded = np.zeros((len(outputs), 4), dtype=np.int64)
+            for i, output in enumerate(outputs):
+                if output is not None:
+                    decoded[i] = [int.from_bytes(output[k * 32:(k + 1) * 32], "big") for k in range(4)]
+        return {
+            "qualityPassed": decoded[:, 1].astype(bool),
+            "reservePriceValid": decoded[:, 2].astype(bool),
+            "priceRange": decoded[:, 3].astype(bool),
+            "dealSuccess": decoded[:, 0] > 0,
+            "dealPrice": decoded[:, 0],
+            "reverted": reverted,
+        }
+
     def reset_contract(self):   
         """调用合约的resetAll方法重置状态"""
         try:
@@ -230,67 +700,199 @@ class ContractRunner:
         except Exception as e:
             print(f"匹配状态重置失败: {str(e)}")
             return False
+    def _rpc(self, method, params):
+        """发送节点自定义RPC请求（evm_*），出错时抛出异常"""
+        response = self.w3.provider.make_request(method, params)
+        if response.get('error'):
+            raise RuntimeError(f"{method} failed: {response['error']}")
+        return response['result']
+
+    def prepare_snapshot(self):
+        """
+        快照隔离初始化：先用重置交易清空一次合约状态，再记录链快照作为每次测试的起点。
+        节点不支持快照时回退到重置交易方式
+        """
+        if not (self.reset_contract() and self.reset_matching_state()):
+            raise RuntimeError("快照前的合约重置失败")
+        try:
+            self._snapshot_id = self._rpc("evm_snapshot", [])
+            print(f"已记录链快照: {self._snapshot_id}")
+        except Exception as e:
+            print(f"节点不支持快照，回退到重置交易: {str(e)}")
+            self.isolation = "reset"
+
+    def revert_snapshot(self):
+        """回滚到干净快照；Ganache的快照回滚后即失效，需立即重新记录"""
+        try:
+            if self._rpc("evm_revert", [self._snapshot_id]) is False:
+                raise RuntimeError(f"evm_revert returned false for {self._snapshot_id}")
+            self._snapshot_id = self._rpc("evm_snapshot", [])
+        except Exception as e:
+            print(f"快照回滚失败: {str(e)}")
+            return False
+        # 回滚后账户nonce随链状态一起回退
+        self.nonces.sync()
+        return True
+
+    def isolate(self):
+        """恢复到干净的合约状态：快照模式回滚快照，否则发送重置交易"""
+        if self.isolation == "snapshot":
+            return self.revert_snapshot()
+        return self.reset_contract() and self.reset_matching_state()
+
+    def _record(self, result):
+        """收集单次测试结果：写出到流式writer，未指定时保留在内存"""
+        if self.writer is not None:
+            self.writer.write(result)
+        else:
+            self.results.append(result)
+        return result
+
+    @staticmethod
+    def _offchain_detail(mode, P_off, Q_p, seller_params, buyer_params, buyer_id, seller_id):
+        """按 MatchedDetail 的字段格式返回链下引擎的计算结果（indexed string 同样以keccak哈希表示）"""
+        detail = {name: value.item() for name, value in
+                  match_from_params(mode, P_off, Q_p, seller_params, buyer_params, detailed_events=False).items()}
+        detail.update(buyerId=Web3.to_hex(Web3.keccak(text=buyer_id)), sellerId=Web3.to_hex(Web3.keccak(text=seller_id)))
+        return detail
+
+    def _submit_matching_pipeline(self, test_id, repeat_idx, mode, product_args, seller_args, buyer_args):
+        """
+        流水线模式：连续发送一次测试的重置、建仓与撮合交易，再批量收取收据。
+        任一交易失败时抛出异常并注明所属测试与步骤；返回 (各步骤收据, 撮合耗时)
+        """
+        fns = self.contract.functions
+        steps = []
+        if self.isolation == "reset":
+            steps += [
+                ("resetAll", fns.resetAll, ()),
+                ("resetMatchingState", fns.resetMatchingState, ("",)),  # 全局重置
+            ]
+        steps += [
+            ("setPricingMode", fns.setPricingMode, (self.mode_map[mode],)),
+            ("addProduct", fns.addProduct, product_args),
+            ("addSeller", fns.addSeller, seller_args),
+            ("addBuyer", fns.addBuyer, buyer_args),
+        ]
+        steps.append(("performMatching", fns.performMatching, ()))
+        start_match = time.perf_counter_ns()
+        for step, func, args in steps:
+            if step == "performMatching":
+                start_match = time.perf_counter_ns()
+            try:
+                self._submit_transaction(func, *args, tag=(test_id, repeat_idx, step))
+            except Exception as e:
+                # 清空本测试已发送的交易，避免混入下一次测试的收据
+                self.collect_receipts()
+                raise RuntimeError(f"{test_id}-{repeat_idx} {step} failed: {e}") from e
+        receipts = {}
+        for tag, receipt, error in self.collect_receipts():
+            if error:
+                raise RuntimeError(f"{tag[0]}-{tag[1]} {tag[2]} failed: {error}")
+            receipts[tag[2]] = receipt
+        return receipts, (time.perf_counter_ns() - start_match) / 1e9
+
+    @staticmethod
+    def _cell_args(cell):
+        """sample_cell 的结果 → (addProduct, addSeller, addBuyer) 的合约参数"""
+        return (
+            ContractRunner._product_args(cell["product_id"], int(cell["P_off"] * 10000), int(cell["Q_p"] * 10000),
+                                         cell["period_enum"]),
+            ContractRunner._seller_args(cell["seller_id"], cell["seller_params"], cell["product_id"]),
+            ContractRunner._buyer_args(cell["buyer_id"], cell["buyer_params"]),
+        )
+
+    @staticmethod
+    def _decode_matching(events, event_verbosity, timer, receipt, mode, cell):
+        """
+        解析撮合收据中的 Matched / MatchedDetail；非FULL级别合约不发出MatchedDetail，由链下引擎复现该买卖对的诊断字段。
+        返回 (matched_logs, matched_detail_logs, detail_source)，detail_source 为 "chain" 或 "engine"
+        """
+        with timer.span("performMatching", "decode"):
+            matched_logs = events.matched(receipt)
+            matched_detail_logs = events.matched_detail(receipt) if event_verbosity == "FULL" else None
+        if matched_detail_logs is not None:
+            return matched_logs, matched_detail_logs, "chain"
+        with timer.span("offchain", "engine_detail"):
+            matched_detail_logs = [ContractRunner._offchain_detail(
+                mode, cell["P_off"], cell["Q_p"], cell["seller_params"], cell["buyer_params"],
+                cell["buyer_id"], cell["seller_id"])]
+        return matched_logs, matched_detail_logs, "engine"
+
     def run_matching(self, test_id, repeat_idx, mode, scenario):
         """执行单次匹配测试"""
-        # 重置合约状态
-        if not self.reset_contract():
-            return {
-                "test_id": test_id,
-                "repeat_idx": repeat_idx,
-                "error": "Contract reset failed"
-            }
-        if not self.reset_matching_state():  # 不传参数 = 全局重置
-            return {"error": "Matching state reset failed"}
-        # 设置实验种子
-        deterministic_seed = hash((test_id, mode, repeat_idx)) % (2**32)
-        random.seed(deterministic_seed)
+        # 设置实验种子；缓存命中时跳过全部链上操作
+        deterministic_seed = cell_seed(test_id, mode, repeat_idx, scenario)
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(test_id, mode, repeat_idx, deterministic_seed, self.code_hash,
+                                       self.event_verbosity, self.backend_id)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"Test {test_id}-{repeat_idx} served from cache. Success: {cached.get('match_success')}")
+                return self._record(cached)
+        # 重置合约状态（快照模式回滚快照；流水线模式下重置交易随其余交易一并发送）
+        if self.isolation == "snapshot":
+            if not self.revert_snapshot():
+                return self._record({
+                    "test_id": test_id,
+                    "repeat_idx": repeat_idx,
+                    "mode": mode,
+                    "error": "Snapshot revert failed"
+                })
+        elif not self.pipelined:
+            if not self.reset_contract():
+                return self._record({
+                    "test_id": test_id,
+                    "repeat_idx": repeat_idx,
+                    "mode": mode,
+                    "error": "Contract reset failed"
+                })
+            if not self.reset_matching_state():  # 不传参数 = 全局重置
+                return self._record({
+                    "test_id": test_id,
+                    "repeat_idx": repeat_idx,
+                    "mode": mode,
+                    "error": "Matching state reset failed"
+                })
+        P_off, offchain_time, gas_log = 0.0, 0.0, {}
+        start_match = time.perf_counter_ns()
         try:
-            # 1. 生成随机参数
-            quality_params = generate_quality(scenario["quality"])
-
-            # 2. 获取市场类型
-            market_scenario=scenario["market"]
-            period_enum = PERIOD_ENUM_MAP[scenario["market"]]  
-
-            # 3. 计算链下参数
-            start_time = time.time()
-            offchain_data = calculate_offchain_params(scenario, quality_params)
-            P_off = offchain_data["P_off"]
-            Q_p = offchain_data["Q_p"]
-            offchain_time = time.time() - start_time
-
-            # 3.5 生成随机交易者参数
-            seller_params = generate_trader_params("seller",market_scenario,P_off)
-            buyer_params = generate_trader_params("buyer",market_scenario,P_off)
-
-            # 4. 设置定价模式
-            self.set_mode(mode)
-            
-            # 5. 链上添加产品
-            product_id = f"{test_id}_{mode}_{repeat_idx}"
-            receipt = self.add_product(
-                product_id, 
-                int(P_off * 10000), 
-                int(Q_p * 10000),
-                period_enum
-            )
-            add_product_gas = receipt['gasUsed']
-            
-            # 6. 链上添加卖家
-            seller_id = f"seller_{test_id}_{repeat_idx}"
-            receipt = self.add_seller(seller_id, seller_params, product_id)
-            add_seller_gas = receipt['gasUsed']
-            
-            # 7. 链上添加买家
-            buyer_id = f"buyer_{test_id}_{repeat_idx}"
-            receipt = self.add_buyer(buyer_id, buyer_params)
-            add_buyer_gas = receipt['gasUsed']
-            
-            # 8. 链上执行匹配
-            start_match = time.time()
-            receipt = self._send_transaction(self.contract.functions.performMatching)
-            match_time = time.time() - start_match
-            match_gas = receipt['gasUsed']
+            # 1-3.5 按种子生成质量、链下参数与交易者参数
+            cell = sample_cell(test_id, repeat_idx, mode, scenario, self.timer)
+            P_off, offchain_time = cell["P_off"], cell["offchain_time"]
+            product_args, seller_args, buyer_args = self._cell_args(cell)
+            if self.pipelined:
+                # 4-8. 流水线发送全部交易并批量收取收据
+                receipts, match_time = self._submit_matching_pipeline(
+                    test_id, repeat_idx, mode, product_args, seller_args, buyer_args
+                )
+                add_product_gas = receipts["addProduct"]['gasUsed']
+                add_seller_gas = receipts["addSeller"]['gasUsed']
+                add_buyer_gas = receipts["addBuyer"]['gasUsed']
+                receipt = receipts["performMatching"]
+                match_gas = receipt['gasUsed']
+            else:
+                # 4. 设置定价模式
+                self.set_mode(mode)
+                
+                # 5. 链上添加产品
+                receipt = self._send_transaction(self.contract.functions.addProduct, *product_args)
+                add_product_gas = receipt['gasUsed']
+                
+                # 6. 链上添加卖家
+                receipt = self._send_transaction(self.contract.functions.addSeller, *seller_args)
+                add_seller_gas = receipt['gasUsed']
+                
+                # 7. 链上添加买家
+                receipt = self._send_transaction(self.contract.functions.addBuyer, *buyer_args)
+                add_buyer_gas = receipt['gasUsed']
+                
+                # 8. 链上执行匹配
+                start_match = time.perf_counter_ns()
+                receipt = self._send_transaction(self.contract.functions.performMatching)
+                match_time = (time.perf_counter_ns() - start_match) / 1e9
+                match_gas = receipt['gasUsed']
             
             # 9. 收集链上gas日志
             gas_log = {
@@ -301,144 +903,321 @@ class ContractRunner:
             }
             total_gas = sum(gas_log.values())
 
-            # 10. 结果处理，初始化结果字典
-            result = {
-                "test_id": test_id,
-                "repeat_idx": repeat_idx,
-                "mode": mode,
-                "scenario": json.dumps(scenario),
-                "P_off": round(P_off, 2),
-                "P_res_s": seller_params["P_res_s"],
-                "P_res_b": buyer_params["P_res_b"],
-                "p_0_s":seller_params["p0_s"],
-                "p_0_b":buyer_params["p0_b"],
-                "offchain_time": round(offchain_time, 4),
-                "total_gas": total_gas,
-                "match_time": round(match_time, 4),
-                "match_success": 0,  # 默认匹配失败
-                "failure_reason": "No matching event found",  # 默认失败原因
-                "P_on": None,
-                "PDR": None,
-                "SDF": None,
-                "ECE": None,
-            }
-            
-            # 尝试解析匹配事件
-            matched_logs = self.contract.events.Matched().process_receipt(receipt)
-            matched_detail_logs = self.contract.events.MatchedDetail().process_receipt(receipt)
+            # 10. 解析撮合事件并构建结果
+            matched_logs, matched_detail_logs, detail_source = self._decode_matching(
+                self.events, self.event_verbosity, self.timer, receipt, mode, cell)
+            result = matching_result(test_id, repeat_idx, mode, scenario, cell, total_gas, match_time,
+                                     matched_logs, matched_detail_logs, detail_source)
             
-            if matched_logs:
-                # 有匹配成功事件
-                match_event = matched_logs[0]['args']
-                P_on = match_event['price'] / 10000
-                P_res_s = seller_params["P_res_s"] / 10000
-                P_res_b = buyer_params["P_res_b"] / 10000
-                sdf = 1 - abs((P_on - P_res_s) / (P_res_b - P_res_s) - 0.5) if (P_res_b - P_res_s) != 0 else 1.0
-                p0_s = seller_params["p0_s"] / 10000
-                p0_b = buyer_params["p0_b"] / 10000
-                ece = 1 - (abs(p0_s - P_on) + abs(p0_b - P_on))/abs(p0_s - p0_b) if (p0_s - p0_b) != 0 else 1.0
-                result.update({
-                    "match_success": 1,
-                    "P_on": P_on,
-                    "PDR": abs(P_on - P_off) / P_off if P_off != 0 else 0,
-                    "SDF": sdf,
-                    "ECE": ece,
-                    "buyer_addr": match_event['buyerId'],
-                    "seller_addr": match_event['sellerId'],
-                    "failure_reason": ""  
-                })
-            # 处理详细匹配事件
-            elif matched_detail_logs:
-                detail_event = matched_detail_logs[0]['args']
-                
-                # 构建失败原因
-                failure_reasons = []
-                
-                # 1. 质量检查
-                if not detail_event['qualityPassed']:
-                    failure_reasons.append("质量不满足要求")
-                
-                # 2. 保留价检查
-                if not detail_event['reservePriceValid']:
-                    failure_reasons.append("买家保留价低于卖家保留价")
-                
-                # 3. 价格容错
-                if not detail_event['priceRange']:
-                    failure_reasons.append("价格超出容错范围")
-                
-                # 4. 协商失败（当所有前置条件满足但交易失败时）
-                if (detail_event['qualityPassed'] and 
-                    detail_event['reservePriceValid'] and 
-                    not detail_event['dealSuccess']):
-                    failure_reasons.append("价格协商失败")
-                
-                # 组合失败原因
-                if failure_reasons:
-                    result["failure_reason"] = "; ".join(failure_reasons)
-                else:
-                    result["failure_reason"] = "未知失败原因"
-                
-                # 处理交易情况
-                if detail_event['dealSuccess']:
-                    P_on = detail_event['dealPrice'] / 10000
-                    P_res_s = seller_params["P_res_s"] / 10000
-                    P_res_b = buyer_params["P_res_b"] / 10000
-                    sdf = 1 - abs((P_on - P_res_s) / (P_res_b - P_res_s) - 0.5) if (P_res_b - P_res_s) != 0 else 1.0
-                    p0_s = seller_params["p0_s"] / 10000
-                    p0_b = buyer_params["p0_b"] / 10000
-                    ece = 1 - (abs(p0_s - P_on) + abs(p0_b - P_on))/abs(p0_s - p0_b) if (p0_s - p0_b) != 0 else 1.0
-                    result.update({
-                        "match_success": 1,
-                        "P_on": P_on,
-                        "PDR": abs(P_on - P_off) / P_off if P_off != 0 else 0,
-                        "SDF": sdf,
-                        "ECE": ece,
-                        "buyer_addr": detail_event['buyerId'],
-                        "seller_addr": detail_event['sellerId']
-                    })
-            else:
-                # 没有匹配事件，但有交易收据
-                result["failure_reason"] = "交易成功但未找到匹配事件"
-            
-            self.results.append(result)
+            self._record(result)
+            if cache_key is not None:
+                self.cache.put(cache_key, result)
             print(f"Test {test_id}-{repeat_idx} completed. Success: {result['match_success']}")
             return result
             
         except Exception as e:
-            match_time = time.time() - start_match
+            match_time = (time.perf_counter_ns() - start_match) / 1e9
             gas_log['matching'] = 0
             total_gas = sum(gas_log.values())
             
             # 错误处理
-            result = {
-                "test_id": test_id,
-                "repeat_idx": repeat_idx,
-                "error": str(e),
-                "scenario": json.dumps(scenario),
-                "P_off": round(P_off, 2),
-                "offchain_time": round(offchain_time, 4),
-                "total_gas": total_gas,
-                "match_time": round(match_time, 4),
-                "match_success": 0,
-                "failure_reason": f"Transaction failed: {str(e)}"
-            }
+            result = failed_result(test_id, repeat_idx, mode, scenario, e, P_off, offchain_time, total_gas, match_time)
             
-            self.results.append(result)
+            self._record(result)
             print(f"Test {test_id}-{repeat_idx} failed: {str(e)}")
             # 链下再算一遍
 
             return result
+# ======================== 结果输出模块 ========================
+def matching_result(test_id, repeat_idx, mode, scenario, cell, total_gas, match_time, matched_logs, matched_detail_logs,
+                    detail_source="chain"):
+    """
+    由撮合事件构建单次测试的结果字典（run_matching 与 asyncRunner 共用）。
+    source 列标明撮合结论的来源：Matched 事件或链上 MatchedDetail 为 "chain"；
+    未发出 Matched 且诊断字段由链下引擎复现时（OFF / MATCHES 级别）为 "engine"
+    """
+    P_off = cell["P_off"]
+    seller_params, buyer_params = cell["seller_params"], cell["buyer_params"]
+    offchain_time = cell["offchain_time"]
+    # 初始化结果字典
+    result = {
+        "test_id": test_id,
+        "repeat_idx": repeat_idx,
+        "mode": mode,
+        "scenario": json.dumps(scenario),
+        "P_off": round(P_off, 2),
+        "P_res_s": seller_params["P_res_s"],
+        "P_res_b": buyer_params["P_res_b"],
+        "p_0_s":seller_params["p0_s"],
+        "p_0_b":buyer_params["p0_b"],
+        "offchain_time": round(offchain_time, 9),
+        "total_gas": total_gas,
+        "match_time": round(match_time, 4),
+        "match_success": 0,  # 默认匹配失败
+        "failure_reason": "No matching event found",  # 默认失败原因
+        "P_on": None,
+        "PDR": None,
+        "SDF": None,
+        "ECE": None,
+        "source": "chain",
+    }
+
+    if matched_logs:
+        # 有匹配成功事件
+        match_event = matched_logs[0]
+        P_on = match_event['price'] / 10000
+        P_res_s = seller_params["P_res_s"] / 10000
+        P_res_b = buyer_params["P_res_b"] / 10000
+        sdf = 1 - abs((P_on - P_res_s) / (P_res_b - P_res_s) - 0.5) if (P_res_b - P_res_s) != 0 else 1.0
+        p0_s = seller_params["p0_s"] / 10000
+        p0_b = buyer_params["p0_b"] / 10000
+        ece = 1 - (abs(p0_s - P_on) + abs(p0_b - P_on))/abs(p0_s - p0_b) if (p0_s - p0_b) != 0 else 1.0
+        result.update({
+            "match_success": 1,
+            "P_on": P_on,
+            "PDR": abs(P_on - P_off) / P_off if P_off != 0 else 0,
+            "SDF": sdf,
+            "ECE": ece,
+            "buyer_addr": match_event['buyerId'],
+            "seller_addr": match_event['sellerId'],
+            "failure_reason": ""  
+        })
+    # 处理详细匹配事件
+    elif matched_detail_logs:
+        detail_event = matched_detail_logs[0]
+        result["source"] = detail_source
+
+        # 构建失败原因
+        failure_reasons = []
+
+        # 1. 质量检查
+        if not detail_event['qualityPassed']:
+            failure_reasons.append("质量不满足要求")
+
+        # 2. 保留价检查
+        if not detail_event['reservePriceValid']:
+            failure_reasons.append("买家保留价低于卖家保留价")
+
+        # 3. 价格容错
+        if not detail_event['priceRange']:
+            failure_reasons.append("价格超出容错范围")
+
+        # 4. 协商失败（当所有前置条件满足但交易失败时）
+        if (detail_event['qualityPassed'] and 
+            detail_event['reservePriceValid'] and 
+            not detail_event['dealSuccess']):
+            failure_reasons.append("价格协商失败")
+
+        # 组合失败原因
+        if failure_reasons:
+            result["failure_reason"] = "; ".join(failure_reasons)
+        else:
+            result["failure_reason"] = "未知失败原因"
+
+        # 处理交易情况
+        if detail_event['dealSuccess']:
+            P_on = detail_event['dealPrice'] / 10000
+            P_res_s = seller_params["P_res_s"] / 10000
+            P_res_b = buyer_params["P_res_b"] / 10000
+            sdf = 1 - abs((P_on - P_res_s) / (P_res_b - P_res_s) - 0.5) if (P_res_b - P_res_s) != 0 else 1.0
+            p0_s = seller_params["p0_s"] / 10000
+            p0_b = buyer_params["p0_b"] / 10000
+            ece = 1 - (abs(p0_s - P_on) + abs(p0_b - P_on))/abs(p0_s - p0_b) if (p0_s - p0_b) != 0 else 1.0
+            result.update({
+                "match_success": 1,
+                "P_on": P_on,
+                "PDR": abs(P_on - P_off) / P_off if P_off != 0 else 0,
+                "SDF": sdf,
+                "ECE": ece,
+                "buyer_addr": detail_event['buyerId'],
+                "seller_addr": detail_event['sellerId']
+            })
+    else:
+        # 没有匹配事件，但有交易收据
+        result["failure_reason"] = "交易成功但未找到匹配事件"
+
+    return result
+
+def failed_result(test_id, repeat_idx, mode, scenario, error, P_off, offchain_time, total_gas, match_time):
+    """单次测试出错时的结果字典"""
+    return {
+        "test_id": test_id,
+        "repeat_idx": repeat_idx,
+        "mode": mode,
+        "error": str(error),
+        "scenario": json.dumps(scenario),
+        "P_off": round(P_off, 2),
+        "offchain_time": round(offchain_time, 9),
+        "total_gas": total_gas,
+        "match_time": round(match_time, 4),
+        "match_success": 0,
+        "failure_reason": f"Transaction failed: {str(error)}"
+    }
+
+def build_test_cells(test_scenarios, run_counts):
+    """展开实验矩阵：[(test_id, repeat_idx, mode, scenario)]，顺序与主循环一致"""
+    return [
+        (test_id, i, mode, scenario)
+        for test_id, scenario in test_scenarios.items()
+        for mode, count in run_counts.items()
+        for i in range(count)
+    ]
+
+def smoke_test(runner):
+    """冒烟测试：重置合约后以固定参数完成一次建仓与撮合，任一步骤失败时抛出异常"""
+    # 测试重置功能
+    assert runner.reset_contract(), "重置失败"
+    assert runner.reset_matching_state(), "匹配状态重置失败"
+    print("合约重置测试通过")
+
+    # 设置定价模式  
+    runner.set_mode("BASELINE")
+
+    # 测试添加产品
+    receipt = runner.add_product("smoke_test", int(100.0 * 10000), int(0.75 * 10000), PERIOD_ENUM_MAP["高波动"] )
+    print(f"添加产品成功! Gas used: {receipt['gasUsed']}")
+
+    # 测试添加卖家
+    seller_params = {
+        "P_res_s": 80,
+        "p0_s": 100,
+        "ρ_s": 0.5,
+        "λ_cre_s": 0.7
+    }
+    receipt = runner.add_seller("seller_smoke", seller_params, "smoke_test")
+    print(f"添加卖家成功! Gas used: {receipt['gasUsed']}")
+
+    # 测试添加买家
+    buyer_params = {
+        "P_res_b": 120,
+        "p0_b": 90,
+        "ρ_b": 0.6,
+        "λ_cre_b": 0.8,
+        "Q_re": 0.0
+    }
+    receipt = runner.add_buyer("buyer_smoke", buyer_params)
+    print(f"添加买家成功! Gas used: {receipt['gasUsed']}")
+
+    # 测试执行匹配
+    receipt = runner._send_transaction(runner.contract.functions.performMatching)
+    print(f"执行匹配成功! Gas used: {receipt['gasUsed']}")
+
+    # 尝试解析事件
+    matched_logs = runner.events.matched(receipt)
+    if matched_logs:
+        print(f"匹配成功! 价格: {matched_logs[0]['price']/100}")
+    else:
+        print("未捕获匹配事件，请检查合约事件日志")
+
+
+def run_experiment(runner, writer, abi_path, ganache_url, test_scenarios=TEST_SCENARIOS, counts=run_counts,
+                   backend="ganache", pipelined=False, workers=1, isolation="reset", event_verbosity="FULL",
+                   cache=None, use_async=False, async_slots=6, async_inflight=32, adaptive=False,
+                   adaptive_min_repeats=5, adaptive_max_repeats=60, adaptive_budget=None):
+    """
+    执行实验矩阵，结果写入流式 writer（结束时关闭）。
+    adaptive 时按置信区间宽度分配重复次数，否则执行 counts 的固定次数并跳过 writer 中已成功完成的单元；
+    use_async / workers>1 分别交给 asyncRunner / parallelRunner 执行，否则由 runner 顺序执行
+    """
+    if adaptive:
+        # 自适应调度：每轮只给置信区间未收敛的单元追加重复；续跑时已写出的结果计入统计
+        from parallelRunner import run_parallel
+        scheduler = AdaptiveScheduler(test_scenarios, counts.keys(), adaptive_min_repeats,
+                                      adaptive_max_repeats, adaptive_budget)
+        for row in writer.load().to_dict("records"):
+            scheduler.observe(row)
+        print(f"\n开始自适应实验，预算{scheduler.budget}次，结果写入: {writer.path}")
+
+        def execute(batch):
+            if use_async:
+                from asyncRunner import run_async
+                results = run_async(batch, abi_path, ganache_url, slots=async_slots, backend=backend,
+                                    max_inflight=async_inflight, event_verbosity=event_verbosity, cache=cache,
+                                    timer=runner.timer)
+                for result in results:
+                    writer.write(result)
+                return results
+            if workers == 1:
+                return [runner.run_matching(*cell) for cell in batch]
+            # 调度需要读取结果，并行时由主进程统一写出
+            results = run_parallel(batch, abi_path, ganache_url, workers=workers, pipelined=pipelined,
+                                   backend=backend, isolation=isolation, event_verbosity=event_verbosity,
+                                   cache=cache, timer=runner.timer)
+            for result in results:
+                writer.write(result)
+            return results
+
+        summary = scheduler.run(execute)
+        writer.close()
+        print(f"收敛单元: {int(summary['converged'].sum())}/{len(summary)}")
+        return
+
+    # 执行所有测试场景（续跑时跳过结果文件中已成功完成的单元）
+    cells = build_test_cells(test_scenarios, counts)
+    done = writer.completed()
+    pending = [cell for cell in cells if cell_key(cell[0], cell[2], cell[1]) not in done]
+    total_tests = len(cells)
+
+    print(f"\n开始正式实验，共{total_tests}组测试，已完成{total_tests - len(pending)}组，结果写入: {writer.path}")
+
+    if use_async:
+        # 异步测试：单个事件循环内各槽位的测试并发在途，结果逐条写入流式结果文件
+        from asyncRunner import run_async
+        run_async(
+            pending, abi_path, ganache_url, slots=async_slots, backend=backend, max_inflight=async_inflight,
+            event_verbosity=event_verbosity, writer=writer, cache=cache, timer=runner.timer
+        )
+        writer.close()
+    elif workers > 1:
+        # 并行测试：每个worker部署独立合约并使用独立账户，结果写入各自的分片文件
+        from parallelRunner import run_parallel
+        run_parallel(
+            pending, abi_path, ganache_url,
+            workers=workers, pipelined=pipelined, backend=backend, isolation=isolation,
+            event_verbosity=event_verbosity, writer=writer, cache=cache, timer=runner.timer
+        )
+    else:
+        # 测试循环
+        for test_id, i, mode, scenario in pending:
+            # 执行匹配测试（run_matching 内部负责测试隔离与结果落盘）
+            runner.run_matching(test_id, i, mode, scenario)
+        writer.close()
+
 # ======================== 主实验流程 ========================
 if __name__ == "__main__":
     # 配置信息
     CONTRACT_ADDRESS = "0x9303001B46Fd74da139387A746e8bb798e812526"  # 替换为实际合约地址
     ABI_PATH = os.path.join('build', 'contracts', 'DataPrice.json')  # 替换为实际ABI文件路径
     GANACHE_URL = "http://127.0.0.1:7545"  # 默认Ganache URL
+    BACKEND = "ganache"  # 链后端：ganache（HTTP）| eth-tester（进程内EVM，自动部署合约，忽略CONTRACT_ADDRESS）
+    PIPELINED = False  # 流水线发送模式：本地分配nonce，批量收取收据
+    WORKERS = 1  # 并行worker数量（>1时每个worker独立部署合约）
+    ASYNC = False  # 异步运行器：AsyncWeb3 + keep-alive连接池，多个测试的交易同时在途（固定使用重置交易隔离）
+    ASYNC_SLOTS = 6  # 并发槽位数：每个槽位独立部署合约并使用 accounts[3 + k]
+    ASYNC_INFLIGHT = 32  # 连接池大小，同时也是在途收据请求数的上限
+    ISOLATION = "reset"  # 测试隔离方式：reset（resetAll交易）| snapshot（evm_snapshot/evm_revert，节点不支持时回退到reset）
+    EVENT_VERBOSITY = "FULL"  # 合约事件详细程度：FULL | MATCHES（省去MatchedDetail，诊断字段由链下引擎复现）| OFF
+    RUN_NAME = None  # 运行名：None 按时间戳新建；填写已有运行名（如 "20250716-234136"）则跳过已完成的单元续跑
+    RESULT_FORMAT = "jsonl"  # 流式明细格式：jsonl | csv
+    PARQUET = False  # 另外按行组写出Parquet文件（需要 pyarrow）
+    CACHE_DIR = None  # 结果缓存目录（如 os.path.join("output", "cache")）：合约字节码与场景参数未变的单元直接复用结果，命中行的计时列为空；None 关闭缓存
+    ADAPTIVE = False  # 自适应重复：按指标置信区间宽度分配重复次数，替代 run_counts 中的固定次数
+    ADAPTIVE_MIN_REPEATS = 5  # 每个 (场景, 模式) 单元的最少重复次数
+    ADAPTIVE_MAX_REPEATS = 60  # 单元重复次数上限
+    ADAPTIVE_BUDGET = None  # 本次运行的总重复次数预算（None = 各单元平均 (最少+上限)/2 次）
+
+    # 流式结果写出器：每个测试完成即追加到 output/experiment_results_<运行名>.<格式>
+    writer = ResultWriter.for_run("output", RUN_NAME, RESULT_FORMAT, parquet=PARQUET)
+    cache = ResultCache(CACHE_DIR) if CACHE_DIR else None
     
     # 初始化合约运行器
     try:
-        runner = ContractRunner(CONTRACT_ADDRESS, ABI_PATH, GANACHE_URL)
-        print(f"Connected to contract at {CONTRACT_ADDRESS}")
+        runner = ContractRunner(
+            CONTRACT_ADDRESS if BACKEND == "ganache" else None, ABI_PATH, GANACHE_URL,
+            pipelined=PIPELINED, isolation=ISOLATION, backend=BACKEND, event_verbosity=EVENT_VERBOSITY,
+            writer=writer, cache=cache
+        )
+        print(f"Connected to contract at {runner.contract.address}")
         print(f"Block number: {runner.w3.eth.block_number}")
     except Exception as e:
         print(f"初始化失败: {str(e)}")
@@ -447,112 +1226,24 @@ if __name__ == "__main__":
     # 冒烟测试
     print("\n执行冒烟测试...")
     try:
-        # 测试重置功能
-        assert runner.reset_contract(), "重置失败"
-        assert runner.reset_matching_state(), "匹配状态重置失败"
-        print("合约重置测试通过")
-
-        # 设置定价模式  
-        runner.set_mode("BASELINE")
-
-        # 测试添加产品
-        receipt = runner.add_product("smoke_test", int(100.0 * 10000), int(0.75 * 10000), PERIOD_ENUM_MAP["高波动"] )
-        print(f"添加产品成功! Gas used: {receipt['gasUsed']}")
-        
-        # 测试添加卖家
-        seller_params = {
-            "P_res_s": 80,
-            "p0_s": 100,
-            "ρ_s": 0.5,
-            "λ_cre_s": 0.7
-        }
-        receipt = runner.add_seller("seller_smoke", seller_params, "smoke_test")
-        print(f"添加卖家成功! Gas used: {receipt['gasUsed']}")
-        
-        # 测试添加买家
-        buyer_params = {
-            "P_res_b": 120,
-            "p0_b": 90,
-            "ρ_b": 0.6,
-            "λ_cre_b": 0.8,
-            "Q_re": 0.0
-        }
-        receipt = runner.add_buyer("buyer_smoke", buyer_params)
-        print(f"添加买家成功! Gas used: {receipt['gasUsed']}")
-        
-        # 测试执行匹配
-        receipt = runner._send_transaction(runner.contract.functions.performMatching)
-        print(f"执行匹配成功! Gas used: {receipt['gasUsed']}")
-        
-        # 尝试解析事件
-        matched_logs = runner.contract.events.Matched().process_receipt(receipt)
-        if matched_logs:
-            print(f"匹配成功! 价格: {matched_logs[0]['args']['price']/100}")
-        else:
-            print("未捕获匹配事件，请检查合约事件日志")
-        
+        smoke_test(runner)
         print("冒烟测试通过！")
     except Exception as e:
         print(f"冒烟测试失败: {str(e)}")
         exit(1)
     
-    # 执行所有测试场景
-    all_results = []
-    current_test = 0 
-    total_tests = sum(run_counts.values()) * 6
-   
-    print(f"\n开始正式实验，共{total_tests}组测试...")
-    
     start_time = time.time()
-    # 测试循环
-    for test_id, scenario in TEST_SCENARIOS.items():
-        for mode, count in run_counts.items():
-            for i in range(count):
-                # 重置合约状态
-                runner.reset_contract()
-                
-                # 执行匹配测试
-                result = runner.run_matching(test_id, i, mode, scenario)
-                all_results.append(result)
+    run_experiment(
+        runner, writer, ABI_PATH, GANACHE_URL, TEST_SCENARIOS, run_counts,
+        backend=BACKEND, pipelined=PIPELINED, workers=WORKERS, isolation=ISOLATION,
+        event_verbosity=EVENT_VERBOSITY, cache=cache, use_async=ASYNC, async_slots=ASYNC_SLOTS,
+        async_inflight=ASYNC_INFLIGHT, adaptive=ADAPTIVE, adaptive_min_repeats=ADAPTIVE_MIN_REPEATS,
+        adaptive_max_repeats=ADAPTIVE_MAX_REPEATS, adaptive_budget=ADAPTIVE_BUDGET
+    )
                  
-    # 保存实验结果
-    df = pd.DataFrame(all_results)
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    results_file = f"output/experiment_results_{timestamp}.csv"
-    df.to_csv(results_file, index=False)
-    
-    # 生成分析报告
-    if not df.empty and 'match_success' in df.columns:
-        # 场景维度聚合统计（按test_id和mode分组）
-        scenario_stats = df.groupby(['test_id', 'mode']).agg({
-            'match_success': ['mean', 'count'],
-            'PDR': 'mean',
-            'SDF':'mean',
-            'ECE': 'mean',
-            'total_gas': 'mean',
-            'match_time': 'mean'
-        }).reset_index()   
-        # 重命名列（多层索引展平）
-        scenario_stats.columns = [
-            '场景ID', 
-            '定价模式', 
-            '平均成功率', 
-            '测试次数', 
-            '平均价格偏离率', 
-            '平均剩余分配公平度',
-            '平均期望收敛效率',
-            '平均Gas消耗', 
-            '平均匹配时间'
-        ]
-        # 保存场景分析结果
-        scenario_file = f"output/scenario_performance_{timestamp}.csv"
-        scenario_stats.to_csv(scenario_file, index=False)
-        print(f"\n场景分析报告保存至: {scenario_file}")
-        print("\n场景性能摘要:")
-        print(scenario_stats.round(2))
-        # ===========================================
-    else:
-        print("实验完成，但未收集到有效结果")
+    # 保存实验结果（从流式结果文件读回，包含此前运行已完成的单元）
+    from resultReport import save_results
+    save_results(writer.load(), timer=runner.timer)
     
     total_duration = time.time() - start_time
     print(f"\n总耗时: {total_duration:.2f}秒")
\ No newline at end of file